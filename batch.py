@@ -0,0 +1,147 @@
+import os
+import pandas as pd
+import pipeline
+import profiling
+from pipeline import print_log, ensure_directories, collect_sigtap, input_hashes, collect_correction, correction_factors
+from parallel import aggregate_stored_units
+from report import enrich, report_headers, write_report
+from report_cache import input_key, read_part, write_part
+
+# Função que retorna a chave das entradas de uma unidade (hashes dos arquivos e, com correção, o fator aplicado),
+# ou None se algum arquivo não estiver disponível localmente
+def unit_key(unit, factor=1, log=print_log):
+	source_value, uf_value, year_value, month_value = unit
+	hashes = input_hashes(month_value, year_value, source_value, uf_value, log)
+	if hashes is None:
+		return None
+
+	# Sem correção a chave é a mesma de antes, e as partes já salvas continuam válidas
+	if factor != 1:
+		hashes['correction'] = factor
+	return input_key(**hashes)
+
+# Função que retorna as partes já calculadas (uma tabela por CNES) de uma unidade, ou None se alguma
+# não existir ou tiver sido calculada com entradas diferentes das atuais
+def load_unit(unit, cnes_values, log=print_log, factor=1):
+	source_value, uf_value, year_value, month_value = unit
+	key = unit_key(unit, factor, log)
+	if key is None:
+		return None
+
+	directory = os.path.join(pipeline.database_directory, 'reports')
+	partes = {}
+	for cnes_value in cnes_values:
+		partes[cnes_value] = read_part(key, cnes_value, source_value, uf_value, f'{year_value}{month_value}', directory)
+		if partes[cnes_value] is None:
+			return None
+	return partes
+
+# Função para salvar as partes (uma tabela por CNES, inclusive vazias) de uma unidade recém-calculada
+def store_unit(unit, partes, log=print_log, factor=1):
+	source_value, uf_value, year_value, month_value = unit
+	key = unit_key(unit, factor, log)
+	if key is None:
+		return
+
+	directory = os.path.join(pipeline.database_directory, 'reports')
+	for cnes_value, df in partes.items():
+		write_part(df, key, cnes_value, source_value, uf_value, f'{year_value}{month_value}', directory)
+
+# Função que gera as planilhas de vários CNES × meses × anos × fontes, lendo cada arquivo mensal uma vez
+# (uma planilha por CNES ou, com single_workbook, uma planilha com uma aba por CNES)
+# Com workers > 1, os arquivos mensais são processados em paralelo por um pool de processos
+# Com incremental, as partes de cada (CNES, fonte, UF, mês) cujas entradas não mudaram são reaproveitadas
+# e apenas a planilha final é montada novamente
+# output_format escolhe o formato dos arquivos gerados (xlsx, csv ou parquet)
+# correction é a correção monetária dos valores TUNEP/SUS 2008 (fator fixo ou nome do índice, ver collect_correction)
+def run_batch(cnes_values, months, years, sources, uf_value='MG', single_workbook=False, log=print_log, workers=1, incremental=False, output_format='xlsx', correction=None):
+	ensure_directories()
+
+	correcao = collect_correction(correction, log)
+
+	relatorios = {cnes: [] for cnes in cnes_values}
+	competencias = set()
+
+	# Cada arquivo mensal é lido uma única vez, agrupando por (CNES, PROC_REA) em uma só agregação
+	units = [(source_value, uf_value, year_value, month_value) for source_value in sources for year_value in years for month_value in months]
+
+	# Fatores de correção de todas as competências, calculados de uma vez sobre o índice acumulado
+	fatores = correction_factors(correcao, units)
+
+	# Unidades cujas partes já foram calculadas com as mesmas entradas
+	salvas = {}
+	if incremental:
+		for unit in units:
+			partes = load_unit(unit, cnes_values, log, fatores[unit])
+			if partes is not None:
+				salvas[unit] = partes
+	pendentes = [unit for unit in units if unit not in salvas]
+
+	# Os meses já gravados no armazém de fatos são lidos dele; os arquivos dos demais, quando ainda não disponíveis
+	# localmente, são baixados enquanto as unidades anteriores são processadas
+	agregados = aggregate_stored_units(pendentes, cnes_values, workers, log)
+
+	for unit in units:
+		source_value, uf_value, year_value, month_value = unit
+
+		if unit in salvas:
+			log(f"Competência reaproveitada: {source_value} {uf_value} {month_value}/{year_value}")
+			partes = salvas[unit]
+		elif unit in agregados:
+			log(f"\n\nCOLETA DE DADOS - SIGTAP {month_value}/{year_value}\n\n")
+
+			# Competências sem Tabela Unificada são ignoradas
+			try:
+				sigtap = collect_sigtap(month_value, year_value, log)
+			except FileNotFoundError:
+				continue
+
+			if correcao is not None:
+				log(correcao.describe(month_value, year_value))
+
+			with profiling.stage('enrichment', source=source_value, uf=uf_value, competencia=f'{year_value}{month_value}'):
+				df_agrupado = enrich(agregados[unit], sigtap, month_value, year_value, source_value, fatores[unit])
+			partes = {cnes_value: df_agrupado[df_agrupado['CNES'] == cnes_value] for cnes_value in cnes_values}
+			if incremental:
+				store_unit(unit, partes, log, fatores[unit])
+		else:
+			continue
+
+		competencias.add((month_value, year_value))
+
+		for cnes_value, grupo in partes.items():
+			if len(grupo):
+				relatorios[cnes_value].append(grupo)
+
+	# Com uma única competência, os títulos das colunas trazem o mês/ano como na planilha individual
+	headers = report_headers(*next(iter(competencias))) if len(competencias) == 1 else report_headers()
+
+	sheets = {}
+	for cnes_value, partes in relatorios.items():
+		if not partes:
+			log(f"Nenhum registro encontrado para o CNES {cnes_value}.")
+			continue
+		df = pd.concat(partes, ignore_index=True)
+		df.columns = headers
+		sheets[cnes_value] = df
+
+	log("Exportando dados para Planilha do Excel..." if output_format == 'xlsx' else f"Exportando dados para {output_format.upper()}...")
+
+	# Obter o timestamp atual (com o identificador dos arquivos)
+	timestamp = pipeline.output_suffix()
+	caminhos = []
+
+	with profiling.stage('export', format=output_format):
+		if single_workbook:
+			if sheets:
+				caminhos.extend(write_report(os.path.join(pipeline.output_directory, f'lote-{timestamp}'), sheets, output_format))
+		else:
+			for cnes_value, df in sheets.items():
+				caminhos.extend(write_report(os.path.join(pipeline.output_directory, f'{cnes_value}-lote-{timestamp}'), {'Resultados': df}, output_format))
+
+	for caminho_planilha in caminhos:
+		log(f"Planilha exportada com sucesso em \"{caminho_planilha}\".")
+
+	pipeline.enforce_disk_budget(log)
+
+	return caminhos
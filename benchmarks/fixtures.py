@@ -0,0 +1,240 @@
+import os
+import sys
+import time
+import struct
+import zipfile
+import argparse
+import numpy as np
+
+# Diretório do projeto (para usar o TUNEP.csv de sources/)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Layouts oficiais (Coluna, Tamanho, Início, Fim, Tipo) das tabelas geradas
+procedimento_layout = [
+	('CO_PROCEDIMENTO', 10, 'VARCHAR2'),
+	('NO_PROCEDIMENTO', 250, 'VARCHAR2'),
+	('TP_COMPLEXIDADE', 1, 'VARCHAR2'),
+	('TP_SEXO', 1, 'VARCHAR2'),
+	('QT_MAXIMA_EXECUCAO', 4, 'NUMBER'),
+	('QT_DIAS_PERMANENCIA', 4, 'NUMBER'),
+	('QT_PONTOS', 4, 'NUMBER'),
+	('VL_IDADE_MINIMA', 4, 'NUMBER'),
+	('VL_IDADE_MAXIMA', 4, 'NUMBER'),
+	('VL_SH', 10, 'NUMBER'),
+	('VL_SA', 10, 'NUMBER'),
+	('VL_SP', 10, 'NUMBER'),
+	('CO_FINANCIAMENTO', 2, 'VARCHAR2'),
+	('CO_RUBRICA', 6, 'VARCHAR2'),
+	('QT_TEMPO_PERMANENCIA', 4, 'NUMBER'),
+	('DT_COMPETENCIA', 6, 'CHAR')
+]
+origem_layout = [
+	('CO_PROCEDIMENTO', 10, 'VARCHAR2'),
+	('CO_PROCEDIMENTO_SIA_SIH', 10, 'VARCHAR2'),
+	('TP_PROCEDIMENTO', 1, 'VARCHAR2'),
+	('DT_COMPETENCIA', 6, 'CHAR')
+]
+
+# Campos (nome, tipo, tamanho, decimais) dos arquivos de produção gerados
+rd_fields = [
+	('UF_ZI', 'C', 6, 0),
+	('ANO_CMPT', 'C', 4, 0),
+	('MES_CMPT', 'C', 2, 0),
+	('ESPEC', 'C', 2, 0),
+	('CGC_HOSP', 'C', 14, 0),
+	('N_AIH', 'C', 13, 0),
+	('IDENT', 'C', 1, 0),
+	('CEP', 'C', 8, 0),
+	('MUNIC_RES', 'C', 6, 0),
+	('NASC', 'C', 8, 0),
+	('SEXO', 'C', 1, 0),
+	('PROC_SOLIC', 'C', 10, 0),
+	('PROC_REA', 'C', 10, 0),
+	('VAL_SH', 'N', 13, 2),
+	('VAL_SP', 'N', 13, 2),
+	('VAL_TOT', 'N', 14, 2),
+	('DT_INTER', 'C', 8, 0),
+	('DT_SAIDA', 'C', 8, 0),
+	('DIAG_PRINC', 'C', 4, 0),
+	('CNES', 'C', 7, 0)
+]
+pa_fields = [
+	('PA_CODUNI', 'C', 7, 0),
+	('PA_GESTAO', 'C', 6, 0),
+	('PA_CONDIC', 'C', 2, 0),
+	('PA_UFMUN', 'C', 6, 0),
+	('PA_TPUPS', 'C', 2, 0),
+	('PA_MVM', 'C', 6, 0),
+	('PA_CMP', 'C', 6, 0),
+	('PA_PROC_ID', 'C', 10, 0),
+	('PA_CBOCOD', 'C', 6, 0),
+	('PA_CIDPRI', 'C', 4, 0),
+	('PA_SEXO', 'C', 1, 0),
+	('PA_IDADE', 'C', 3, 0),
+	('PA_QTDPRO', 'N', 11, 0),
+	('PA_QTDAPR', 'N', 11, 0),
+	('PA_VALPRO', 'N', 15, 2),
+	('PA_VALAPR', 'N', 15, 2)
+]
+
+# Quantidade de registros gerados por bloco (limita a memória usada na geração)
+chunk_size_padrao = 1000000
+
+# Função para ler os códigos da TUNEP (usados como origens dos procedimentos gerados)
+def tunep_codes(local_tunep):
+	with open(local_tunep, 'r', encoding='ISO-8859-1') as f:
+		next(f)
+		return [linha.split(';')[0].strip() for linha in f if linha.strip()]
+
+# Função para montar o arquivo de layout de uma tabela
+def layout_text(layout):
+	linhas = ['Coluna,Tamanho,Inicio,Fim,Tipo']
+	inicio = 1
+	for nome, tamanho, tipo in layout:
+		linhas.append(f'{nome},{tamanho},{inicio},{inicio + tamanho - 1},{tipo}')
+		inicio += tamanho
+	return '\r\n'.join(linhas) + '\r\n'
+
+# Função para gerar os códigos de procedimento (10 dígitos, ordenados)
+def procedure_codes(procedimentos, seed=0):
+	rng = np.random.default_rng(seed)
+	codigos = np.unique(rng.integers(201010000, 905010000, size=procedimentos * 2))[:procedimentos]
+	return np.array([f'{codigo:010d}' for codigo in codigos])
+
+# Função para gerar um ZIP sintético da Tabela Unificada (tb_procedimento, rl_procedimento_sia_sih e layouts)
+def write_sigtap_zip(caminho, competencia, procedimentos=5000, seed=0, local_tunep=None):
+	rng = np.random.default_rng(seed)
+	codigos = procedure_codes(procedimentos, seed)
+	origens_tunep = tunep_codes(local_tunep or os.path.join(project_directory, 'sources', 'TUNEP.csv'))
+
+	linhas = []
+	relacoes = []
+	for codigo in codigos:
+		valores = rng.integers(0, 500000, size=3)
+		nome = f'PROCEDIMENTO SINTETICO {codigo}'
+		linhas.append(
+			codigo + nome.ljust(250) + 'M' + 'I' + '0001' + '0003' + '0000' + '0000' + '9999'
+			+ ''.join(f'{valor:010d}' for valor in valores) + '06' + '000000' + '0000' + competencia + '\r\n'
+		)
+		for origem in rng.choice(origens_tunep, size=rng.choice([0, 1, 1, 1, 2, 3])):
+			relacoes.append(codigo + origem.ljust(10) + '1' + competencia + '\r\n')
+
+	os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+	with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+		zip_ref.writestr('tb_procedimento.txt', ''.join(linhas).encode('ISO-8859-1'))
+		zip_ref.writestr('tb_procedimento_layout.txt', layout_text(procedimento_layout))
+		zip_ref.writestr('rl_procedimento_sia_sih.txt', ''.join(relacoes).encode('ISO-8859-1'))
+		zip_ref.writestr('rl_procedimento_sia_sih_layout.txt', layout_text(origem_layout))
+	return caminho
+
+# Função para montar o cabeçalho de um arquivo DBF
+def dbf_header(fields, num_records):
+	record_length = 1 + sum(tamanho for nome, tipo, tamanho, decimais in fields)
+	header_length = 32 + 32 * len(fields) + 1
+	data = time.localtime()
+	header = struct.pack('<BBBBIHH20x', 0x03, data.tm_year - 1900, data.tm_mon, data.tm_mday, num_records, header_length, record_length)
+	for nome, tipo, tamanho, decimais in fields:
+		header += struct.pack('<11sc4xBB14x', nome.encode('ascii'), tipo.encode('ascii'), tamanho, decimais)
+	return header + b'\r'
+
+# Função para gerar os valores de um campo numérico (a partir de um conjunto de valores formatados)
+def numeric_pool(rng, tamanho, decimais, maximo, quantidade=20000):
+	valores = rng.integers(0, maximo, size=quantidade)
+	if decimais:
+		return [f'{valor / 10 ** decimais:{tamanho}.{decimais}f}' for valor in valores]
+	return [f'{valor:{tamanho}d}' for valor in valores]
+
+# Função para gerar os códigos CNES (7 dígitos)
+def cnes_codes(cnes_count, seed=0):
+	rng = np.random.default_rng(seed)
+	return [f'{codigo:07d}' for codigo in rng.choice(9999999, size=cnes_count, replace=False)]
+
+# Função para gerar um arquivo de produção sintético (RD do SIH ou PA do SIA) com o número de registros
+# e os CNES informados; os CNES seguem uma distribuição desigual, como os hospitais de uma UF
+def write_production_dbf(caminho, kind, rows, cnes, procedure_pool, competencia, seed=0, chunk_size=chunk_size_padrao):
+	rng = np.random.default_rng(seed)
+	fields = rd_fields if kind == 'RD' else pa_fields
+	cnes_field, proc_field = ('CNES', 'PROC_REA') if kind == 'RD' else ('PA_CODUNI', 'PA_PROC_ID')
+
+	cnes_count = len(cnes)
+	pesos = 1 / np.arange(1, cnes_count + 1)
+	pesos /= pesos.sum()
+
+	# Conjuntos de valores de cada campo (os registros escolhem valores desses conjuntos)
+	conjuntos = {}
+	for nome, tipo, tamanho, decimais in fields:
+		if nome == cnes_field:
+			conjuntos[nome] = cnes
+		elif nome == proc_field or nome == 'PROC_SOLIC':
+			conjuntos[nome] = list(procedure_pool)
+		elif nome in ('ANO_CMPT', 'PA_CMP', 'PA_MVM'):
+			conjuntos[nome] = [competencia[:4] if nome == 'ANO_CMPT' else competencia]
+		elif nome == 'MES_CMPT':
+			conjuntos[nome] = [competencia[4:]]
+		elif tipo == 'N':
+			conjuntos[nome] = numeric_pool(rng, tamanho, decimais, 10 ** 7 if decimais else 100)
+		else:
+			conjuntos[nome] = [''.join(rng.choice(list('0123456789'), size=tamanho)) for _ in range(50)]
+
+	# Textos completados com espaços até o tamanho do campo, como no DBF original
+	for nome, tipo, tamanho, decimais in fields:
+		conjuntos[nome] = np.array([valor.ljust(tamanho) for valor in conjuntos[nome]], dtype=f'S{tamanho}')
+
+	dtype = np.dtype([('deleted', 'S1')] + [(nome, f'S{tamanho}') for nome, tipo, tamanho, decimais in fields])
+
+	os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+	with open(caminho, 'wb') as f:
+		f.write(dbf_header(fields, rows))
+		for inicio in range(0, rows, chunk_size):
+			quantidade = min(chunk_size, rows - inicio)
+			registros = np.empty(quantidade, dtype=dtype)
+			registros['deleted'] = b' '
+			for nome, tipo, tamanho, decimais in fields:
+				if nome == cnes_field:
+					indices = rng.choice(cnes_count, size=quantidade, p=pesos)
+				else:
+					indices = rng.integers(0, len(conjuntos[nome]), size=quantidade)
+				registros[nome] = conjuntos[nome][indices]
+			f.write(registros.tobytes())
+		f.write(b'\x1a')
+
+	return caminho
+
+# Função para gerar o conjunto de arquivos de uma competência: ZIP SIGTAP e arquivo de produção
+# (nomes iguais aos do DATASUS, para que o pipeline os encontre localmente sem acessar o FTP)
+# Com parts > 1, os registros são divididos em arquivos a, b, c..., como os meses dos estados maiores
+def write_fixtures(directory, kind='RD', uf='MG', competencias=('202408',), rows=100000, cnes_count=300, procedimentos=5000, seed=0, parts=1):
+	arquivos = {'sigtap': [], 'production': [], 'cnes': cnes_codes(cnes_count, seed)}
+	codigos = procedure_codes(procedimentos, seed)
+
+	for deslocamento, competencia in enumerate(competencias):
+		arquivos['sigtap'].append(write_sigtap_zip(os.path.join(directory, f'TabelaUnificada_{competencia}_v0000000000.zip'), competencia, procedimentos, seed + deslocamento))
+		if parts <= 1:
+			arquivos['production'].append(write_production_dbf(os.path.join(directory, f'{kind}{uf}{competencia[2:]}.dbf'), kind, rows, arquivos['cnes'], codigos, competencia, seed + deslocamento))
+			continue
+		for indice in range(parts):
+			registros = rows // parts + (1 if indice < rows % parts else 0)
+			caminho = os.path.join(directory, f'{kind}{uf}{competencia[2:]}{chr(ord("a") + indice)}.dbf')
+			arquivos['production'].append(write_production_dbf(caminho, kind, registros, arquivos['cnes'], codigos, competencia, (seed + deslocamento) * 100 + indice))
+
+	return arquivos
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Gera arquivos sintéticos (Tabela Unificada e RD/PA) para os benchmarks, sem acessar o FTP.")
+	parser.add_argument('directory', help="Diretório dos arquivos gerados")
+	parser.add_argument('--kind', choices=['RD', 'PA'], default='RD', help="RD (SIH) ou PA (SIA)")
+	parser.add_argument('--uf', default='MG')
+	parser.add_argument('--competencias', default='202408', help="Competências (AAAAMM) separadas por vírgula")
+	parser.add_argument('--rows', type=float, default=1e5, help="Registros por arquivo de produção (ex.: 1e5, 5e7)")
+	parser.add_argument('--cnes', type=int, default=300, help="Quantidade de CNES distintos")
+	parser.add_argument('--procedimentos', type=int, default=5000, help="Procedimentos na Tabela Unificada")
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--parts', type=int, default=1, help="Arquivos (a, b, c...) em que cada mês é dividido")
+	args = parser.parse_args(argv)
+
+	arquivos = write_fixtures(args.directory, args.kind, args.uf, args.competencias.split(','), int(args.rows), args.cnes, args.procedimentos, args.seed, args.parts)
+	for caminho in arquivos['sigtap'] + arquivos['production']:
+		print(caminho)
+
+if __name__ == '__main__':
+	sys.exit(main())
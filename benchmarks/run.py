@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+# Diretório do projeto (os módulos do recsus são importados a partir dele)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_directory)
+
+import numpy as np
+import pandas as pd
+import pipeline
+import downloads
+import profiling
+from batch import run_batch
+from fixtures import write_fixtures
+
+# Arquivo com o histórico dos resultados (uma linha JSON por execução)
+history_path_padrao = os.path.join(project_directory, 'benchmarks', 'results', 'history.jsonl')
+
+# Etapas cuja vazão (linhas/s) é registrada
+throughput_stages = ('sigtap_parse', 'tunep_join', 'dbf_read', 'filter_groupby')
+
+# Função que retorna a versão do código medida (commit do git, quando disponível)
+def code_version():
+	try:
+		return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_directory, capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+# Função para resumir o relatório de uma execução: tempo de cada etapa, vazão e pico de memória
+def summarize(relatorio):
+	etapas = {}
+	for nome, total in relatorio['totals'].items():
+		etapas[nome] = {'wall_time': round(total['wall_time'], 4), 'cpu_time': round(total['cpu_time'], 4), 'rows_read': total['rows_read']}
+		if nome in throughput_stages and total['wall_time'] > 0:
+			etapas[nome]['rows_per_second'] = round(total['rows_read'] / total['wall_time'])
+
+	return {
+		'wall_time': round(relatorio['wall_time'], 4),
+		'peak_rss': max([relatorio['peak_rss'] or 0] + [etapa['peak_rss'] or 0 for etapa in relatorio['stages']]),
+		'stages': etapas
+	}
+
+# Contexto que impede acessos à rede durante a medição (o benchmark usa apenas os arquivos sintéticos):
+# cada resolução de nome ou conexão falha como uma rede indisponível e o endereço é registrado na lista retornada
+@contextmanager
+def no_network():
+	tentativas = []
+	getaddrinfo = socket.getaddrinfo
+	connect = socket.socket.connect
+
+	def recusar_nome(host, port, *args, **kwargs):
+		tentativas.append((host, port))
+		raise socket.gaierror(f"Acesso à rede durante o benchmark: {host}:{port}")
+
+	def recusar_conexao(sock, address):
+		tentativas.append(address)
+		raise OSError(f"Conexão de rede durante o benchmark: {address}")
+
+	socket.getaddrinfo = recusar_nome
+	socket.socket.connect = recusar_conexao
+	try:
+		yield tentativas
+	finally:
+		socket.getaddrinfo = getaddrinfo
+		socket.socket.connect = connect
+
+# Função para executar o pipeline sobre os arquivos sintéticos, medindo cada etapa
+# A primeira repetição é "fria" (converte os DBF para o cache colunar); as seguintes usam o cache
+def run_benchmark(workspace, params, repeat=2, workers=1, output_format='xlsx', report_cnes=10):
+	downloads_directory = os.path.join(workspace, 'downloads')
+	competencias = params['competencias']
+
+	source = params.get('source', 'SIH')
+	arquivos = write_fixtures(downloads_directory, downloads.file_types[source], params['uf'], competencias, params['rows'], params['cnes'], params['procedimentos'], params['seed'], params.get('parts', 1))
+
+	pipeline.database_directory = os.path.join(workspace, 'data')
+	pipeline.downloads_directory = downloads_directory
+	pipeline.sources_directory = os.path.join(project_directory, 'sources')
+	pipeline.output_directory = os.path.join(workspace, 'results')
+	pipeline.manifest = None
+	pipeline.fact_store = None
+	downloads.listings_directory = os.path.join(workspace, 'data', 'listings')
+
+	cnes_values = arquivos['cnes'][:report_cnes]
+	months = sorted({competencia[4:] for competencia in competencias})
+	years = sorted({competencia[:4] for competencia in competencias})
+
+	execucoes = []
+	with no_network() as tentativas:
+		for repeticao in range(repeat):
+			profiling.start_run()
+			run_batch(cnes_values, months, years, [source], params['uf'], log=lambda message: None, workers=workers, output_format=output_format)
+			relatorio = profiling.finish_run()
+			execucoes.append({'run': 'cold' if repeticao == 0 else 'warm', **summarize(relatorio.to_dict())})
+
+	if tentativas:
+		raise RuntimeError(f"O benchmark tentou acessar a rede: {', '.join(str(endereco) for endereco in tentativas)}")
+	return execucoes
+
+# Função para mostrar o resultado, comparando com a execução anterior com os mesmos parâmetros
+def print_results(resultado, anterior=None):
+	for execucao in resultado['runs']:
+		print(f"\n[{execucao['run']}] total {execucao['wall_time']:.2f}s, pico de memória {execucao['peak_rss'] / 1024 / 1024:.0f} MB")
+		base = None
+		if anterior:
+			base = next((item for item in anterior['runs'] if item['run'] == execucao['run']), None)
+		for nome, etapa in execucao['stages'].items():
+			linha = f"  {nome:<18} {etapa['wall_time']:>9.3f}s"
+			if 'rows_per_second' in etapa:
+				linha += f" {etapa['rows_per_second']:>12,} linhas/s"
+			if base and nome in base['stages'] and base['stages'][nome]['wall_time'] > 0:
+				linha += f"  ({etapa['wall_time'] / base['stages'][nome]['wall_time']:.2f}x vs {anterior['version']})"
+			print(linha)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Mede o pipeline com arquivos sintéticos (sem acessar o FTP do DATASUS).")
+	parser.add_argument('--rows', type=float, default=1e5, help="Registros por mês (ex.: 1e5, 5e7)")
+	parser.add_argument('--cnes', type=int, default=300, help="Quantidade de CNES distintos nos arquivos")
+	parser.add_argument('--report-cnes', type=int, default=10, help="Quantidade de CNES incluídos nas planilhas")
+	parser.add_argument('--competencias', default='202408', help="Competências (AAAAMM) separadas por vírgula")
+	parser.add_argument('--uf', default='MG')
+	parser.add_argument('--source', choices=sorted(downloads.file_types), default='SIH', help="Fonte dos arquivos sintéticos (SIH = RD, SIA = PA)")
+	parser.add_argument('--parts', type=int, default=1, help="Arquivos (a, b, c...) em que cada mês é dividido")
+	parser.add_argument('--procedimentos', type=int, default=5000, help="Procedimentos na Tabela Unificada sintética")
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--repeat', type=int, default=2, help="Repetições (a primeira sem cache)")
+	parser.add_argument('--workers', type=int, default=1)
+	parser.add_argument('--format', default='xlsx', help="Formato de saída (xlsx, csv, parquet)")
+	parser.add_argument('--workspace', default=None, help="Diretório de trabalho (padrão: temporário, removido ao final)")
+	parser.add_argument('--history', default=history_path_padrao, help="Arquivo JSONL com o histórico dos resultados")
+	args = parser.parse_args(argv)
+
+	params = {
+		'rows': int(args.rows),
+		'cnes': args.cnes,
+		'report_cnes': args.report_cnes,
+		'competencias': args.competencias.split(','),
+		'uf': args.uf,
+		'procedimentos': args.procedimentos,
+		'seed': args.seed,
+		'workers': args.workers,
+		'format': args.format
+	}
+
+	# Parâmetros novos entram apenas quando diferentes do padrão, para comparar com o histórico anterior
+	if args.source != 'SIH':
+		params['source'] = args.source
+	if args.parts != 1:
+		params['parts'] = args.parts
+
+	workspace = args.workspace or tempfile.mkdtemp(prefix='recsus-bench-')
+	try:
+		execucoes = run_benchmark(workspace, params, args.repeat, args.workers, args.format, args.report_cnes)
+	finally:
+		if not args.workspace:
+			shutil.rmtree(workspace, ignore_errors=True)
+
+	resultado = {
+		'timestamp': time.time(),
+		'version': code_version(),
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'pandas': pd.__version__,
+		'platform': platform.platform(),
+		'params': params,
+		'runs': execucoes
+	}
+
+	# Última execução com os mesmos parâmetros, para comparação
+	anterior = None
+	if os.path.exists(args.history):
+		with open(args.history, 'r', encoding='utf-8') as f:
+			for linha in f:
+				registro = json.loads(linha)
+				if registro['params'] == params:
+					anterior = registro
+
+	print_results(resultado, anterior)
+
+	os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+	with open(args.history, 'a', encoding='utf-8') as f:
+		f.write(json.dumps(resultado) + '\n')
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+# Diretório do projeto (o recsus.py é executado a partir dele)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Arquivo com o histórico dos resultados (uma linha JSON por execução)
+history_path_padrao = os.path.join(project_directory, 'benchmarks', 'results', 'startup.jsonl')
+
+# Módulos pesados que não devem ser importados ao abrir a janela
+heavy_modules = ('pandas', 'numpy', 'pyarrow', 'datasus_dbc', 'dbfread', 'PIL', 'ftplib')
+
+# Script executado em um processo novo: mede a importação do recsus.py e, havendo display,
+# o tempo até a janela ser desenhada (o mainloop é substituído para fechar a janela em seguida)
+probe = '''
+import sys, time, json, runpy
+inicio = time.perf_counter()
+resultado = {}
+runpy.run_path('recsus.py', run_name='recsus_startup')
+resultado['import_time'] = time.perf_counter() - inicio
+resultado['modules'] = [nome for nome in %r if nome in sys.modules]
+
+import tkinter
+def mainloop(self, n=0):
+	self.update()
+	resultado['window_time'] = time.perf_counter() - inicio
+	self.destroy()
+tkinter.Misc.mainloop = mainloop
+try:
+	runpy.run_path('recsus.py', run_name='__main__')
+except Exception as e:
+	resultado['window_error'] = f'{type(e).__name__}: {e}'
+print(json.dumps(resultado))
+''' % (heavy_modules,)
+
+# Função que retorna a versão do código medida (commit do git, quando disponível)
+def code_version():
+	try:
+		return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_directory, capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+# Função para medir uma abertura do programa em um processo novo
+def measure_startup(python=sys.executable):
+	inicio = time.perf_counter()
+	saida = subprocess.run([python, '-c', probe], cwd=project_directory, capture_output=True, text=True, check=True).stdout
+	total = time.perf_counter() - inicio
+	return {'process_time': total, **json.loads(saida.strip().splitlines()[-1])}
+
+# Função para executar as medições e resumir pela mediana
+def run_startup(repeat=5, python=sys.executable):
+	medicoes = [measure_startup(python) for _ in range(repeat)]
+
+	resumo = {}
+	for chave in ('process_time', 'import_time', 'window_time'):
+		valores = [medicao[chave] for medicao in medicoes if chave in medicao]
+		if valores:
+			resumo[chave] = round(statistics.median(valores), 4)
+	resumo['modules'] = medicoes[-1]['modules']
+	if 'window_error' in medicoes[-1]:
+		resumo['window_error'] = medicoes[-1]['window_error']
+	return resumo
+
+# Função para mostrar o resultado, comparando com a execução anterior no mesmo ambiente
+def print_results(resultado, anterior=None):
+	nomes = {'process_time': "processo completo", 'import_time': "importação", 'window_time': "janela desenhada"}
+	for chave, nome in nomes.items():
+		if chave not in resultado['startup']:
+			continue
+		linha = f"  {nome:<18} {resultado['startup'][chave]:>8.3f}s"
+		if anterior and anterior['startup'].get(chave):
+			linha += f"  ({resultado['startup'][chave] / anterior['startup'][chave]:.2f}x vs {anterior['version']})"
+		print(linha)
+
+	if 'window_error' in resultado['startup']:
+		print(f"  janela não medida ({resultado['startup']['window_error']})")
+	if resultado['startup']['modules']:
+		print(f"  módulos pesados importados na abertura: {', '.join(resultado['startup']['modules'])}")
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Mede o tempo de abertura da interface gráfica (recsus.py).")
+	parser.add_argument('--repeat', type=int, default=5, help="Aberturas medidas (o resultado é a mediana)")
+	parser.add_argument('--python', default=sys.executable, help="Interpretador usado nas medições")
+	parser.add_argument('--history', default=history_path_padrao, help="Arquivo JSONL com o histórico dos resultados")
+	args = parser.parse_args(argv)
+
+	resultado = {
+		'timestamp': time.time(),
+		'version': code_version(),
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'startup': run_startup(args.repeat, args.python)
+	}
+
+	# Última execução no mesmo ambiente, para comparação
+	anterior = None
+	if os.path.exists(args.history):
+		with open(args.history, 'r', encoding='utf-8') as f:
+			for linha in f:
+				registro = json.loads(linha)
+				if registro['python'] == resultado['python'] and registro['platform'] == resultado['platform']:
+					anterior = registro
+
+	print_results(resultado, anterior)
+
+	os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+	with open(args.history, 'a', encoding='utf-8') as f:
+		f.write(json.dumps(resultado) + '\n')
+
+	# Falhar quando um módulo pesado volta a ser importado na abertura (para uso em verificações automáticas)
+	return 1 if resultado['startup']['modules'] else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import argparse
+import profiling
+import pipeline
+import downloads
+import correction
+from pipeline import generate_report
+from batch import run_batch
+from state_report import run_state_report
+from totals_report import run_totals
+from server import ReportServer, host_padrao, port_padrao, workers_padrao, queue_size_padrao, sigtap_cache_padrao
+from parallel import default_workers
+from report import output_formats
+
+# Fontes de dados disponíveis
+sources = ['SIH', 'SIA']
+
+# Função para ler uma lista separada por vírgulas da linha de comando
+def parse_list(valor):
+	return [item.strip() for item in valor.split(',') if item.strip()]
+
+# Função para normalizar o mês informado (1 -> 01)
+def parse_month(valor):
+	mes = valor.strip().zfill(2)
+	if mes not in [f'{i:02d}' for i in range(1, 13)]:
+		raise argparse.ArgumentTypeError(f"Mês inválido: {valor}")
+	return mes
+
+# Função para ler uma lista de meses separada por vírgulas
+def parse_months(valor):
+	return [parse_month(mes) for mes in parse_list(valor)]
+
+# Função para montar os argumentos da linha de comando
+def build_parser():
+	parser = argparse.ArgumentParser(prog='recsus', description="Gera as planilhas de procedimentos SUS (SIGTAP x TUNEP x SIH/SIA) sem interface gráfica.")
+	parser.add_argument('--data-dir', default=pipeline.database_directory, help="Diretório dos caches e índices")
+	parser.add_argument('--downloads-dir', default=pipeline.downloads_directory, help="Diretório dos arquivos baixados")
+	parser.add_argument('--sources-dir', default=pipeline.sources_directory, help="Diretório do TUNEP.csv")
+	parser.add_argument('--output-dir', default=pipeline.output_directory, help="Diretório das planilhas geradas")
+	parser.add_argument('--disk-budget', type=float, default=None, help="Espaço máximo (MB) dos arquivos DBC/DBF baixados; os usados há mais tempo são removidos")
+	parser.add_argument('--stream-dbc-limit', type=float, default=None, help="Tamanho máximo (MB) do DBF descompactado em memória a partir do DBC, sem gravar o DBF (0 = sempre gravar o DBF)")
+	parser.add_argument('--format', choices=output_formats, default='xlsx', help="Formato dos arquivos gerados (csv usa ';' e vírgula decimal)")
+	parser.add_argument('--correction', default=None, help="Correção dos valores TUNEP/SUS 2008: fator fixo (ex.: 1,25) ou nome do índice mensal lido de <sources-dir>/<nome>.csv (ex.: IPCA-E)")
+	parser.add_argument('--correction-base', type=correction.parse_competencia, default=correction.base_padrao, help="Competência (AAAAMM ou MM/AAAA) de origem da correção por índice")
+	parser.add_argument('--run-report', default=None, help="Gravar em JSON o tempo, a CPU, a memória e os contadores de cada etapa")
+	parser.add_argument('--profile', action='store_true', help="Gravar também o cProfile da execução (.prof e resumo .txt ao lado do relatório)")
+	parser.add_argument('--trace-memory', action='store_true', help="Medir com tracemalloc o pico de memória alocada em cada etapa")
+	parser.add_argument('--quiet', action='store_true', help="Não exibir as mensagens de progresso")
+	comandos = parser.add_subparsers(dest='command', required=True)
+
+	report = comandos.add_parser('report', help="Gera a planilha de um CNES em uma competência")
+	report.add_argument('--month', type=parse_month, required=True, help="Mês (01-12)")
+	report.add_argument('--year', required=True, help="Ano (AAAA)")
+	report.add_argument('--cnes', required=True, help="CNES do hospital")
+	report.add_argument('--uf', default='MG', help="UF dos arquivos de produção")
+	report.add_argument('--source', choices=sources, default='SIH', help="Fonte dos dados")
+
+	batch = comandos.add_parser('batch', help="Gera em lote as planilhas de vários CNES, meses, anos e fontes")
+	batch.add_argument('--cnes', type=parse_list, required=True, help="CNES separados por vírgula")
+	batch.add_argument('--months', type=parse_months, required=True, help="Meses (01-12) separados por vírgula")
+	batch.add_argument('--years', type=parse_list, required=True, help="Anos separados por vírgula")
+	batch.add_argument('--sources', type=parse_list, default=['SIH'], help="Fontes (SIH, SIA) separadas por vírgula")
+	batch.add_argument('--uf', default='MG', help="UF dos arquivos de produção")
+	batch.add_argument('--single-workbook', action='store_true', help="Gerar uma única planilha com uma aba por CNES")
+	batch.add_argument('--workers', type=int, default=1, help="Processos em paralelo (0 = um por núcleo)")
+	batch.add_argument('--incremental', action='store_true', help="Reaproveitar as competências cujas entradas (SIGTAP, TUNEP, arquivo do mês) não mudaram")
+
+	state = comandos.add_parser('state', help="Gera o resumo de todos os hospitais de uma UF, ordenado pelo valor total TUNEP")
+	state.add_argument('--months', type=parse_months, required=True, help="Meses (01-12) separados por vírgula")
+	state.add_argument('--years', type=parse_list, required=True, help="Anos separados por vírgula")
+	state.add_argument('--sources', type=parse_list, default=['SIH'], help="Fontes (SIH, SIA) separadas por vírgula")
+	state.add_argument('--uf', default='MG', help="UF dos arquivos de produção")
+	state.add_argument('--detail-cnes', type=parse_list, default=[], help="CNES (separados por vírgula) com aba de detalhe dos procedimentos")
+	state.add_argument('--workers', type=int, default=1, help="Processos em paralelo (0 = um por núcleo)")
+
+	totals = comandos.add_parser('totals', help="Gera os totais por CNES (frequência e valor aprovado) de vários meses a partir do armazém de fatos")
+	totals.add_argument('--months', type=parse_months, required=True, help="Meses (01-12) separados por vírgula")
+	totals.add_argument('--years', type=parse_list, required=True, help="Anos separados por vírgula")
+	totals.add_argument('--sources', type=parse_list, default=['SIH'], help="Fontes (SIH, SIA) separadas por vírgula")
+	totals.add_argument('--uf', default='MG', help="UF dos arquivos de produção")
+	totals.add_argument('--cnes', type=parse_list, default=[], help="CNES comparados, separados por vírgula (padrão: todos da UF)")
+	totals.add_argument('--by-month', action='store_true', help="Uma linha por CNES e competência em vez do acumulado do período")
+	totals.add_argument('--workers', type=int, default=1, help="Processos em paralelo para os meses ainda não gravados (0 = um por núcleo)")
+
+	serve = comandos.add_parser('serve', help="Mantém um serviço local (HTTP) com as tabelas SIGTAP/TUNEP em memória, atendendo a pedidos de vários usuários")
+	serve.add_argument('--host', default=host_padrao, help="Endereço do serviço")
+	serve.add_argument('--port', type=int, default=port_padrao, help="Porta do serviço")
+	serve.add_argument('--workers', type=int, default=workers_padrao, help="Pedidos executados ao mesmo tempo")
+	serve.add_argument('--queue-size', type=int, default=queue_size_padrao, help="Pedidos aguardando na fila (os excedentes são recusados)")
+	serve.add_argument('--sigtap-cache', type=int, default=sigtap_cache_padrao, help="Competências SIGTAP mantidas em memória")
+
+	return parser
+
+def main(argv=None):
+	args = build_parser().parse_args(argv)
+
+	pipeline.database_directory = args.data_dir
+	pipeline.downloads_directory = args.downloads_dir
+	pipeline.sources_directory = args.sources_dir
+	pipeline.output_directory = args.output_dir
+	downloads.listings_directory = os.path.join(args.data_dir, 'listings')
+	if args.disk_budget is not None:
+		pipeline.disk_budget = int(args.disk_budget * 1024 * 1024)
+	if args.stream_dbc_limit is not None:
+		downloads.stream_dbc_max_size = int(args.stream_dbc_limit * 1024 * 1024)
+	correction.base_padrao = args.correction_base
+
+	log = (lambda message: None) if args.quiet else pipeline.print_log
+
+	if args.command == 'serve':
+		try:
+			ReportServer(args.host, args.port, args.workers, args.queue_size, args.sigtap_cache, log).serve_forever()
+		except KeyboardInterrupt:
+			pass
+		return 0
+
+	# Relatório da execução: pedido diretamente ou implícito em --profile/--trace-memory
+	run_report = args.run_report
+	if run_report is None and (args.profile or args.trace_memory):
+		run_report = os.path.join(args.output_dir, f'run-{int(time.time())}.json')
+	if run_report:
+		profiling.start_run(args.profile, args.trace_memory)
+
+	try:
+		if args.command == 'report':
+			caminhos = [generate_report(args.month, args.year, args.cnes, args.source, args.uf, log, args.format, args.correction)]
+		elif args.command == 'totals':
+			caminhos = run_totals(args.months, args.years, args.sources, args.uf, args.cnes, args.by_month, log, args.workers or default_workers(), args.format)
+		elif args.command == 'state':
+			caminhos = run_state_report(args.months, args.years, args.sources, args.uf, args.detail_cnes, log, args.workers or default_workers(), args.format, args.correction)
+		else:
+			caminhos = run_batch(args.cnes, args.months, args.years, args.sources, args.uf, args.single_workbook, log, args.workers or default_workers(), args.incremental, args.format, args.correction)
+	except (FileNotFoundError, ValueError) as e:
+		print(f"Erro: {e}", file=sys.stderr)
+		return 1
+	finally:
+		if run_report:
+			profiling.finish_run(run_report)
+			print(f"Relatório da execução: {run_report}", file=sys.stderr)
+
+	# Caminhos das planilhas geradas, um por linha (para uso em scripts)
+	for caminho in caminhos:
+		print(caminho)
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,145 @@
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+
+# Competência padrão dos valores TUNEP/SUS 2008 (a correção é acumulada a partir dela)
+base_padrao = '200801'
+
+# Codificação dos arquivos com as séries de índices (a mesma da TUNEP.csv)
+encoding_padrao = 'ISO-8859-1'
+
+# Séries já lidas, pelo caminho e pela assinatura (tamanho e data de modificação) do arquivo
+loaded_indexes = {}
+loaded_lock = threading.Lock()
+
+# Função para converter uma competência (AAAAMM) em um número de meses
+def month_number(competencia):
+	return int(competencia[:4]) * 12 + int(competencia[4:6]) - 1
+
+# Função para exibir um número de meses como mês/ano (MM/AAAA)
+def format_month(numero):
+	return f'{numero % 12 + 1:02d}/{numero // 12:04d}'
+
+# Função para normalizar a competência de uma linha da série (AAAAMM, AAAA-MM ou MM/AAAA) para AAAAMM
+def parse_competencia(valor):
+	valor = valor.strip()
+	encontrado = re.fullmatch(r'(\d{4})-?(\d{2})', valor)
+	if encontrado:
+		return encontrado.group(1) + encontrado.group(2)
+	encontrado = re.fullmatch(r'(\d{2})/(\d{4})', valor)
+	if encontrado:
+		return encontrado.group(2) + encontrado.group(1)
+	raise ValueError(f"Competência inválida na série do índice: {valor}")
+
+# Classe com uma série mensal de um índice de preços (IPCA-E, INPC...) e o índice acumulado, calculado uma vez,
+# de onde sai o fator entre quaisquer duas competências com uma consulta ao array e uma divisão
+class CorrectionIndex:
+	def __init__(self, name, competencias, variacoes):
+		meses = np.array([month_number(competencia) for competencia in competencias], dtype=np.int64)
+		if not len(meses):
+			raise ValueError(f"Série do índice {name} vazia.")
+		ordem = np.argsort(meses, kind='stable')
+		meses = meses[ordem]
+		variacoes = np.asarray(variacoes, dtype=np.float64)[ordem]
+
+		# A série precisa ser contínua: um mês ausente deixaria todos os fatores seguintes errados
+		saltos = np.flatnonzero(np.diff(meses) != 1)
+		if len(saltos):
+			raise ValueError(f"Série do índice {name} incompleta ou repetida após {format_month(int(meses[saltos[0]]))}.")
+
+		self.name = name
+		self.first = int(meses[0])
+		self.last = int(meses[-1])
+
+		# Índice acumulado: na posição i, o produto das variações mensais até o mês i (inclusive)
+		self.cumulative = np.cumprod(1 + variacoes / 100)
+
+	# Função que retorna a posição de cada competência no índice acumulado
+	# (competências posteriores ao último mês publicado usam o último mês disponível)
+	def positions(self, competencias):
+		meses = np.array([month_number(competencia) for competencia in competencias], dtype=np.int64)
+		if len(meses) and meses.min() < self.first:
+			raise ValueError(f"Série do índice {self.name} começa em {format_month(self.first)}, depois de {format_month(int(meses.min()))}.")
+		return np.minimum(meses, self.last) - self.first
+
+	# Função que retorna os fatores de correção de cada competência de origem até a de destino
+	# (variações dos meses seguintes à origem até o destino, inclusive)
+	def factors(self, origens, destinos):
+		return self.cumulative[self.positions(destinos)] / self.cumulative[self.positions(origens)]
+
+# Função para ler a série de um índice de um CSV com as colunas competência e variação mensal (%),
+# separadas por ';' e com vírgula decimal, como a TUNEP.csv (a primeira linha é o cabeçalho)
+def read_index(caminho, encoding=encoding_padrao):
+	serie = pd.read_csv(caminho, sep=';', encoding=encoding, header=None, skiprows=1, usecols=[0, 1], names=['competencia', 'variacao'], dtype=str, keep_default_na=False)
+	serie = serie[serie['competencia'].str.strip() != '']
+
+	competencias = [parse_competencia(valor) for valor in serie['competencia']]
+	variacoes = serie['variacao'].str.strip().str.replace('.', '', regex=False).str.replace(',', '.', regex=False).astype(np.float64)
+	return CorrectionIndex(os.path.splitext(os.path.basename(caminho))[0], competencias, variacoes)
+
+# Função que retorna a série de um índice, lendo o arquivo novamente apenas quando ele muda
+def load_index(caminho):
+	info = os.stat(caminho)
+	assinatura = (info.st_size, info.st_mtime_ns)
+	with loaded_lock:
+		registro = loaded_indexes.get(caminho)
+		if registro is None or registro[0] != assinatura:
+			registro = (assinatura, read_index(caminho))
+			loaded_indexes[caminho] = registro
+		return registro[1]
+
+# Classe com a correção aplicada aos valores TUNEP/SUS 2008: um fator fixo (ex.: 1,25) ou um índice mensal
+# acumulado da competência base até a competência de cada linha
+class Correction:
+	def __init__(self, fixed=None, index=None, base=None):
+		self.fixed = fixed
+		self.index = index
+		self.base = base or base_padrao
+
+	# Função que retorna os fatores de várias competências (AAAAMM) de uma só vez, em um dicionário
+	def factors(self, competencias):
+		competencias = list(competencias)
+		if self.index is None:
+			return {competencia: self.fixed for competencia in competencias}
+		fatores = self.index.factors([self.base] * len(competencias), competencias)
+		return dict(zip(competencias, fatores.tolist()))
+
+	# Função que retorna o fator de uma competência
+	def factor(self, month_value, year_value):
+		return self.factors([f'{year_value}{month_value}'])[f'{year_value}{month_value}']
+
+	# Função que descreve a correção de uma competência (para as mensagens de progresso)
+	def describe(self, month_value, year_value):
+		fator = f"{self.factor(month_value, year_value):.6f}".replace('.', ',')
+		if self.index is None:
+			return f"Correção dos valores TUNEP/SUS 2008: fator fixo {fator}"
+
+		destino = min(month_number(f'{year_value}{month_value}'), self.index.last)
+		descricao = f"Correção dos valores TUNEP/SUS 2008: fator {fator} ({self.index.name} de {format_month(month_number(self.base))} a {format_month(destino)})"
+		if destino < month_number(f'{year_value}{month_value}'):
+			descricao += " - índice ainda não publicado para a competência, usado o último mês disponível"
+		return descricao
+
+# Função que interpreta a correção pedida (texto da interface ou da linha de comando): um número é um fator fixo
+# e um nome (ex.: IPCA-E, INPC) é a série lida de <directory>/<nome>.csv; retorna None sem correção (vazio ou 1)
+def parse_correction(valor, directory, base=None):
+	if valor is None or isinstance(valor, Correction):
+		return valor
+
+	texto = str(valor).strip()
+	if not texto:
+		return None
+
+	try:
+		fator = float(texto.replace(',', '.'))
+	except ValueError:
+		caminho = os.path.join(directory, f'{texto}.csv')
+		if not os.path.exists(caminho):
+			raise FileNotFoundError(f"Série do índice {texto} não encontrada em \"{caminho}\".")
+		return Correction(index=load_index(caminho), base=base)
+
+	if fator <= 0:
+		raise ValueError(f"Fator de correção inválido: {texto}")
+	return None if fator == 1 else Correction(fixed=fator)
@@ -0,0 +1,132 @@
+import struct
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Quantidade padrão de registros lidos por vez
+chunk_size_padrao = 100000
+
+# Codificação usada pelos arquivos do DATASUS
+encoding_padrao = 'ISO-8859-1'
+
+# Tipos de campo DBF convertidos para número
+tipos_numericos = ('N', 'F')
+
+# Classe com as informações do cabeçalho de um arquivo DBF
+class DBFHeader:
+	def __init__(self, num_records, header_length, record_length, fields):
+		self.num_records = num_records
+		self.header_length = header_length
+		self.record_length = record_length
+		# Dicionário nome -> (tipo, deslocamento no registro, tamanho, casas decimais)
+		self.fields = fields
+
+# Função para ler exatamente "size" bytes de um arquivo ou stream
+def read_exact(arquivo, size):
+	partes = []
+	restante = size
+	while restante > 0:
+		parte = arquivo.read(restante)
+		if not parte:
+			break
+		partes.append(parte)
+		restante -= len(parte)
+	return b''.join(partes)
+
+# Função para ler o cabeçalho e a descrição dos campos do DBF
+def read_header(arquivo):
+	inicio = read_exact(arquivo, 32)
+	if len(inicio) < 32:
+		raise ValueError("Arquivo DBF inválido: cabeçalho incompleto.")
+
+	num_records, header_length, record_length = struct.unpack('<IHH', inicio[4:12])
+	descricao = read_exact(arquivo, header_length - 32)
+
+	fields = {}
+	# O primeiro byte de cada registro é a marca de exclusão
+	deslocamento = 1
+	for i in range(0, len(descricao), 32):
+		campo = descricao[i:i + 32]
+		if campo[:1] == b'\r' or len(campo) < 32:
+			break
+		nome = campo[:11].split(b'\x00')[0].decode('ascii').strip().upper()
+		tipo = chr(campo[11])
+		tamanho = campo[16]
+		decimais = campo[17]
+		fields[nome] = (tipo, deslocamento, tamanho, decimais)
+		deslocamento += tamanho
+
+	return DBFHeader(num_records, header_length, record_length, fields)
+
+# Função para converter uma coluna de bytes de tamanho fixo em valores Python/NumPy
+def decode_column(raw, tipo, decimais, encoding):
+	if tipo in tipos_numericos:
+		valores = np.char.strip(raw)
+		vazios = valores == b''
+		if vazios.any():
+			valores = np.where(vazios, b'nan', valores)
+			return valores.astype(np.float64)
+		if decimais == 0:
+			return valores.astype(np.int64)
+		return valores.astype(np.float64)
+
+	return pd.Series(raw, copy=False).str.decode(encoding).str.rstrip('\x00 ').to_numpy(dtype=object)
+
+# Função para converter uma coluna de bytes de tamanho fixo em um array Arrow do tipo informado
+# Textos só com caracteres ASCII (códigos, datas) são convertidos pelo próprio Arrow, sem criar um texto Python por registro
+def decode_column_arrow(raw, tipo, decimais, encoding, tipo_arrow):
+	if tipo in tipos_numericos:
+		return pa.array(decode_column(raw, tipo, decimais, encoding), type=tipo_arrow, from_pandas=True)
+
+	if not (raw.view(np.uint8) >= 128).any():
+		binario = pa.FixedSizeBinaryArray.from_buffers(pa.binary(raw.dtype.itemsize), len(raw), [None, pa.py_buffer(raw)])
+		return pc.utf8_rtrim(binario.cast(pa.binary()).cast(pa.string()), characters='\x00 ')
+
+	return pa.array(decode_column(raw, tipo, decimais, encoding), type=tipo_arrow)
+
+# Função que lê o DBF em blocos, retornando os campos do cabeçalho e os bytes (de tamanho fixo) das colunas pedidas
+def iter_raw_chunks(arquivo, columns, chunk_size=chunk_size_padrao):
+	if isinstance(arquivo, (str, bytes)) or hasattr(arquivo, '__fspath__'):
+		with open(arquivo, 'rb') as f:
+			yield from iter_raw_chunks(f, columns, chunk_size)
+		return
+
+	header = read_header(arquivo)
+
+	for coluna in columns:
+		if coluna not in header.fields:
+			raise KeyError(f"Campo {coluna} não encontrado no arquivo DBF.")
+
+	restantes = header.num_records
+	while restantes > 0:
+		quantidade = min(chunk_size, restantes)
+		bloco = read_exact(arquivo, quantidade * header.record_length)
+		quantidade = len(bloco) // header.record_length
+		if quantidade == 0:
+			break
+		restantes -= quantidade
+
+		registros = np.frombuffer(bloco, dtype=np.uint8, count=quantidade * header.record_length)
+		registros = registros.reshape(quantidade, header.record_length)
+
+		# Ignorar registros marcados como excluídos
+		manter = registros[:, 0] != ord('*')
+		if not manter.all():
+			registros = registros[manter]
+
+		brutos = {}
+		for coluna in columns:
+			tipo, deslocamento, tamanho, decimais = header.fields[coluna]
+			brutos[coluna] = np.ascontiguousarray(registros[:, deslocamento:deslocamento + tamanho]).view(f'S{tamanho}').ravel()
+
+		yield header.fields, brutos
+
+# Função que lê o DBF em blocos (tabelas Arrow com o schema informado), sem passar pelo pandas
+def iter_dbf_tables(arquivo, schema, chunk_size=chunk_size_padrao, encoding=encoding_padrao):
+	for fields, brutos in iter_raw_chunks(arquivo, schema.names, chunk_size):
+		colunas = []
+		for coluna, raw in brutos.items():
+			tipo, deslocamento, tamanho, decimais = fields[coluna]
+			colunas.append(decode_column_arrow(raw, tipo, decimais, encoding, schema.field(coluna).type))
+		yield pa.Table.from_arrays(colunas, schema=schema)
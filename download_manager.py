@@ -0,0 +1,155 @@
+import os
+import ftplib
+import queue
+import threading
+from contextlib import contextmanager
+import profiling
+
+# Extensão dos arquivos ainda em download
+partial_suffix = '.part'
+
+# Quantidade padrão de conexões simultâneas por servidor
+max_connections_padrao = 4
+
+# Tempo máximo de espera das operações no FTP (segundos)
+timeout_padrao = 60
+
+# Classe com um conjunto de conexões FTP reutilizáveis para um mesmo servidor
+class FTPSessionPool:
+	def __init__(self, host, port=21, user='anonymous', passwd='', max_connections=max_connections_padrao, timeout=timeout_padrao):
+		self.host = host
+		self.port = port
+		self.user = user
+		self.passwd = passwd
+		self.timeout = timeout
+		self.livres = queue.LifoQueue()
+		self.limite = threading.BoundedSemaphore(max_connections)
+
+	# Função para abrir uma nova conexão autenticada
+	def connect(self):
+		ftp = ftplib.FTP(timeout=self.timeout)
+		ftp.connect(self.host, self.port)
+		ftp.login(user=self.user, passwd=self.passwd)
+		return ftp
+
+	# Função para obter uma conexão do conjunto (reutilizando uma conexão livre quando ainda está ativa)
+	@contextmanager
+	def session(self):
+		self.limite.acquire()
+		ftp = None
+		try:
+			while ftp is None and not self.livres.empty():
+				ftp = self.livres.get_nowait()
+				try:
+					ftp.voidcmd('NOOP')
+				except ftplib.all_errors:
+					self.discard(ftp)
+					ftp = None
+			if ftp is None:
+				ftp = self.connect()
+
+			try:
+				yield ftp
+			except BaseException:
+				# Conexão em estado desconhecido: não devolver ao conjunto
+				self.discard(ftp)
+				raise
+			else:
+				self.livres.put(ftp)
+		finally:
+			self.limite.release()
+
+	# Função para encerrar uma conexão sem propagar erros
+	def discard(self, ftp):
+		try:
+			ftp.close()
+		except ftplib.all_errors:
+			pass
+
+	# Função para encerrar todas as conexões livres
+	def close(self):
+		while not self.livres.empty():
+			ftp = self.livres.get_nowait()
+			try:
+				ftp.quit()
+			except ftplib.all_errors:
+				self.discard(ftp)
+
+# Classe que gerencia os downloads: uma conexão reutilizada por servidor, downloads paralelos,
+# retomada de downloads interrompidos e verificação do tamanho final
+class DownloadManager:
+	def __init__(self, port=21, user='anonymous', passwd='', max_connections=max_connections_padrao, timeout=timeout_padrao):
+		self.port = port
+		self.user = user
+		self.passwd = passwd
+		self.max_connections = max_connections
+		self.timeout = timeout
+		self.pools = {}
+		self.lock = threading.Lock()
+
+	# Função para obter o conjunto de conexões de um servidor
+	def pool(self, host):
+		with self.lock:
+			if host not in self.pools:
+				self.pools[host] = FTPSessionPool(host, self.port, self.user, self.passwd, self.max_connections, self.timeout)
+			return self.pools[host]
+
+	# Função para listar os arquivos de um diretório remoto
+	def list_directory(self, host, remote_directory):
+		with self.pool(host).session() as ftp:
+			ftp.cwd(remote_directory)
+			return ftp.nlst()
+
+	# Função para obter o tamanho de um arquivo remoto (SIZE e, se não suportado, MLSD)
+	def remote_size(self, ftp, nome):
+		try:
+			ftp.voidcmd('TYPE I')
+			size = ftp.size(nome)
+			if size is not None:
+				return size
+		except ftplib.error_perm:
+			pass
+
+		try:
+			for arquivo, fatos in ftp.mlsd(facts=['size']):
+				if arquivo == nome and 'size' in fatos:
+					return int(fatos['size'])
+		except ftplib.error_perm:
+			pass
+
+		return None
+
+	# Função para baixar um arquivo para um temporário (".part"), retomando de onde parou,
+	# e renomeá-lo para o nome final apenas quando o tamanho conferir com o do servidor
+	def download(self, host, remote_directory, nome, local_path, log=None):
+		temporario = local_path + partial_suffix
+
+		with self.pool(host).session() as ftp:
+			ftp.cwd(remote_directory)
+			size = self.remote_size(ftp, nome)
+
+			offset = os.path.getsize(temporario) if os.path.exists(temporario) else 0
+			if size is not None and offset > size:
+				offset = 0
+
+			if offset and log:
+				log(f"Retomando download de {nome} a partir de {offset} bytes...")
+
+			if size is None or offset < size or not os.path.exists(temporario):
+				with open(temporario, 'ab' if offset else 'wb') as f:
+					ftp.retrbinary('RETR ' + nome, f.write, rest=offset or None)
+
+		baixado = os.path.getsize(temporario)
+		if size is not None and baixado != size:
+			raise IOError(f"Download incompleto de {nome}: {baixado} de {size} bytes.")
+		profiling.add('bytes_downloaded', baixado - offset)
+
+		os.replace(temporario, local_path)
+		return local_path
+
+	# Função para encerrar todas as conexões
+	def close(self):
+		with self.lock:
+			for pool in self.pools.values():
+				pool.close()
+			self.pools = {}
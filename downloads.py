@@ -0,0 +1,279 @@
+import os
+import re
+import ftplib
+import datasus_dbc
+import profiling
+from dbf_reader import read_header
+from download_manager import DownloadManager, partial_suffix
+from listing_cache import ListingCache, listings_directory_padrao
+from manifest import KIND_SIGTAP_ZIP, KIND_DBC, KIND_DBF, KIND_COLUMNAR
+
+# Diretório padrão dos arquivos baixados
+downloads_directory_padrao = 'downloads'
+
+# Configurações do FTP da Tabela Unificada (SIGTAP)
+sigtap_ftp_host = 'ftp2.datasus.gov.br'
+sigtap_remote_directory = '/public/sistemas/tup/downloads/'
+
+# Configurações do FTP dos dados SIH/SIA
+dados_ftp_host = 'ftp.datasus.gov.br'
+dados_remote_directory = '/dissemin/publicos/{source}SUS/200801_/Dados/'
+
+# Tipo do arquivo de produção de cada fonte (RD = AIH reduzida do SIH, PA = produção ambulatorial do SIA)
+file_types = {'SIH': 'RD', 'SIA': 'PA'}
+
+# Unidades da federação (os arquivos de produção do DATASUS são separados por UF)
+ufs = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
+
+# Gerenciador de downloads compartilhado (conexões reutilizadas por servidor)
+manager = None
+
+# Diretório das listagens dos diretórios remotos
+listings_directory = listings_directory_padrao
+
+# Tamanho máximo (bytes) do DBF descompactado em memória a partir do DBC (um por arquivo lido ao mesmo tempo);
+# acima disso (ou com 0) o DBF é gravado em disco
+stream_dbc_max_size = 256 * 1024 * 1024
+
+# Listagens dos diretórios remotos, salvas com validade
+listing_cache = None
+
+# Função para obter o gerenciador de downloads compartilhado
+def get_manager():
+	global manager
+	if manager is None:
+		manager = DownloadManager()
+	return manager
+
+# Função para obter o cache de listagens compartilhado
+def get_listing_cache():
+	global listing_cache
+	if listing_cache is None or listing_cache.directory != listings_directory:
+		listing_cache = ListingCache(listings_directory)
+	return listing_cache
+
+# Função para procurar um arquivo local que corresponde ao padrão
+# (downloads incompletos, ainda com a extensão ".part", são ignorados)
+def find_local(arquivo_padrao, directory=downloads_directory_padrao, extensions=None):
+	if not os.path.exists(directory):
+		return None
+	for arquivo in sorted(os.listdir(directory)):
+		if not arquivo.startswith(arquivo_padrao) or arquivo.endswith(partial_suffix):
+			continue
+		if extensions and not arquivo.lower().endswith(extensions):
+			continue
+		return arquivo
+	return None
+
+# Função para procurar localmente um arquivo com o nome exato (sem diferenciar maiúsculas/minúsculas)
+def find_local_exact(nome, directory=downloads_directory_padrao):
+	if not os.path.exists(directory):
+		return None
+	for arquivo in os.listdir(directory):
+		if arquivo.lower() == nome.lower():
+			return arquivo
+	return None
+
+# Função para encontrar no FTP o primeiro arquivo que corresponde ao padrão,
+# usando a listagem salva do diretório (sem consultar o servidor enquanto ela for válida)
+def find_remote(ftp_host, remote_directory, arquivo_padrao):
+	return get_listing_cache().find(ftp_host, remote_directory, arquivo_padrao, lambda: get_manager().list_directory(ftp_host, remote_directory))
+
+# Função para baixar do FTP o primeiro arquivo que corresponde ao padrão
+def download_file(ftp_host, remote_directory, arquivo_padrao, directory, log):
+	arquivo_encontrado = find_remote(ftp_host, remote_directory, arquivo_padrao)
+	if not arquivo_encontrado:
+		return None
+
+	log(f"Arquivo encontrado no FTP: {arquivo_encontrado}")
+
+	log("Baixando dados...")
+
+	# Baixar o arquivo (com retomada e verificação de tamanho) e salvar localmente
+	local_file = get_manager().download(ftp_host, remote_directory, arquivo_encontrado, os.path.join(directory, arquivo_encontrado), log)
+
+	log("Dados baixados com sucesso.")
+
+	return local_file
+
+# Função que retorna o ZIP da Tabela Unificada da competência, baixando-o se necessário
+# (com o manifesto, a busca local é feita pela competência, e não pelo prefixo do nome)
+def fetch_sigtap_zip(year_value, month_value, log=print, directory=downloads_directory_padrao, manifest=None):
+	os.makedirs(directory, exist_ok=True)
+
+	log("Verificando se arquivo já foi baixado...")
+
+	competencia = f'{year_value}{month_value}'
+	local_zip = manifest.lookup(KIND_SIGTAP_ZIP, competencia=competencia) if manifest else None
+
+	# Criar o padrão para o nome do arquivo baseado no ano e mês fornecidos
+	arquivo_padrao = f'TabelaUnificada_{year_value}{month_value}'
+
+	if not local_zip:
+		arquivo_encontrado_localmente = find_local(arquivo_padrao, directory, ('.zip',))
+		if arquivo_encontrado_localmente:
+			local_zip = os.path.join(directory, arquivo_encontrado_localmente)
+			if manifest:
+				manifest.register(KIND_SIGTAP_ZIP, local_zip, competencia=competencia)
+
+	if local_zip:
+		log(f"Arquivo encontrado localmente: {os.path.basename(local_zip)}")
+		return local_zip
+
+	log("Arquivo não encontrado localmente.")
+	log("Conectando ao servidor DATASUS SIGTAP...")
+
+	local_zip = download_file(sigtap_ftp_host, sigtap_remote_directory, arquivo_padrao, directory, log)
+	if not local_zip:
+		log(f"Nenhum arquivo encontrado para o ano {year_value} e mês {month_value}.")
+	elif manifest:
+		manifest.register(KIND_SIGTAP_ZIP, local_zip, competencia=competencia)
+	return local_zip
+
+# Função que retorna o tamanho do DBF descompactado de um DBC, calculado pelo cabeçalho do DBF,
+# que fica sem compressão no início do DBC (tamanho do cabeçalho + registros x tamanho do registro)
+def dbc_decompressed_size(arquivo_dbc):
+	with open(arquivo_dbc, 'rb') as f:
+		cabecalho = read_header(f)
+	return cabecalho.header_length + cabecalho.num_records * cabecalho.record_length
+
+# Função para verificar se o DBC pode ser lido direto da memória (sem gravar o DBF em disco),
+# pelo tamanho do DBF descompactado, que fica inteiro em memória durante a leitura
+def can_stream(arquivo_dbc):
+	if stream_dbc_max_size <= 0:
+		return False
+	try:
+		return dbc_decompressed_size(arquivo_dbc) <= stream_dbc_max_size
+	except ValueError:
+		return False
+
+# Função para montar o padrão do nome do arquivo de produção de uma competência
+def month_file_pattern(source_value, uf_value, year_value, month_value):
+	return f'{file_types[source_value]}{uf_value}{year_value[2:]}{month_value}'  # Exemplo: 'RDMG2408', 'PASP2408'
+
+# Função que retorna a parte ('' para o arquivo único; 'a', 'b', ... nos meses divididos em vários arquivos)
+# de um nome de arquivo da competência, ou None se o nome não for de um arquivo da competência
+def month_file_part(nome, prefixo, extensions=('dbc',)):
+	encontrado = re.fullmatch(re.escape(prefixo) + r'([a-z]?)\.(' + '|'.join(extensions) + ')', nome, re.IGNORECASE)
+	return encontrado.group(1).lower() if encontrado else None
+
+# Função que retorna as partes do arquivo de produção de uma competência (por exemplo, [''] ou ['a', 'b', 'c'])
+# Com partes já disponíveis localmente (pasta de downloads ou manifesto), o FTP não é consultado: apenas a listagem
+# já salva, se houver, completa as partes ainda não baixadas. Sem partes locais, a listagem do FTP é obtida
+# (ou atualizada); sem acesso ao FTP, nenhuma parte é encontrada
+def resolve_month_parts(source_value, uf_value, year_value, month_value, log=print, directory=downloads_directory_padrao, manifest=None):
+	prefixo = month_file_pattern(source_value, uf_value, year_value, month_value)
+	partes = set()
+
+	if os.path.exists(directory):
+		for nome in os.listdir(directory):
+			parte = month_file_part(nome, prefixo, ('dbc', 'dbf'))
+			if parte is not None:
+				partes.add(parte)
+
+	if manifest:
+		competencia = f'{year_value}{month_value}'
+		for kind in (KIND_COLUMNAR, KIND_DBF, KIND_DBC):
+			for registro in manifest.entries(kind, source_value, uf_value, competencia):
+				partes.add(registro['competencia'][len(competencia):])
+
+	remote_directory = dados_remote_directory.format(source=source_value)
+	if partes:
+		listing = get_listing_cache().cached(dados_ftp_host, remote_directory)
+		nomes = listing.find_all(prefixo) if listing else []
+	else:
+		try:
+			nomes = get_listing_cache().find_all(dados_ftp_host, remote_directory, prefixo, lambda: get_manager().list_directory(dados_ftp_host, remote_directory))
+		except ftplib.all_errors as e:
+			log(f"Não foi possível consultar o FTP ({e}).")
+			nomes = []
+
+	for nome in nomes:
+		parte = month_file_part(nome, prefixo)
+		if parte is not None:
+			partes.add(parte)
+
+	return sorted(partes)
+
+# Função para converter o DBC baixado em DBF, removendo o DBC
+def decompress_dbc(arquivo_dbc, log=print, manifest=None, key=None):
+	log(f"Convertendo arquivo DBC...")
+
+	arquivo_dbf = os.path.splitext(arquivo_dbc)[0] + '.dbf'
+
+	# Descompactar em um arquivo temporário, para que uma falha não deixe um DBF incompleto no lugar do arquivo do mês
+	temporario = arquivo_dbf + '.tmp'
+	with profiling.stage('dbc_decompress', arquivo=os.path.basename(arquivo_dbc)):
+		try:
+			datasus_dbc.decompress(arquivo_dbc, temporario)
+		except Exception:
+			if os.path.exists(temporario):
+				os.remove(temporario)
+			raise
+	os.replace(temporario, arquivo_dbf)
+	log(f"DBF gerado com sucesso.")
+
+	if manifest:
+		source_value, uf_value, competencia = key
+		manifest.register(KIND_DBF, arquivo_dbf, source_value, uf_value, competencia, parent=arquivo_dbc)
+		manifest.unregister(arquivo_dbc)
+
+	log(f"Deletando arquivo DBC...")
+	os.remove(arquivo_dbc)
+
+	return arquivo_dbf
+
+# Função para procurar localmente o DBF ou DBC de uma competência (ou de uma das partes do mês)
+# (pelo manifesto ou, para arquivos baixados antes dele, pelo nome exato, nunca por prefixo)
+def find_local_month_file(kind, source_value, uf_value, year_value, month_value, directory=downloads_directory_padrao, manifest=None, part=''):
+	competencia = f'{year_value}{month_value}{part}'
+	if manifest:
+		caminho = manifest.lookup(kind, source_value, uf_value, competencia)
+		if caminho:
+			return caminho
+
+	arquivo = find_local_exact(f'{month_file_pattern(source_value, uf_value, year_value, month_value)}{part}.{kind}', directory)
+	if not arquivo:
+		return None
+
+	caminho = os.path.join(directory, arquivo)
+	if manifest:
+		manifest.register(kind, caminho, source_value, uf_value, competencia)
+	return caminho
+
+# Função que retorna o arquivo SIH/SIA da competência (ou de uma das partes do mês), baixando o DBC se necessário
+# O DBC é retornado sem conversão quando pode ser lido direto da memória; os maiores são convertidos em DBF
+def fetch_month_file(source_value, uf_value, year_value, month_value, log=print, directory=downloads_directory_padrao, manifest=None, part=''):
+	os.makedirs(directory, exist_ok=True)
+
+	log("Verificando se arquivo já foi baixado...")
+
+	key = (source_value, uf_value, f'{year_value}{month_value}{part}')
+
+	arquivo_dbf = find_local_month_file(KIND_DBF, source_value, uf_value, year_value, month_value, directory, manifest, part)
+	if arquivo_dbf:
+		log(f"Arquivo encontrado localmente: {os.path.basename(arquivo_dbf)}")
+		return arquivo_dbf
+
+	# DBC já baixado, mas ainda não convertido
+	arquivo_dbc = find_local_month_file(KIND_DBC, source_value, uf_value, year_value, month_value, directory, manifest, part)
+	if arquivo_dbc:
+		log(f"Arquivo encontrado localmente: {os.path.basename(arquivo_dbc)}")
+		return arquivo_dbc if can_stream(arquivo_dbc) else decompress_dbc(arquivo_dbc, log, manifest, key)
+
+	log("Arquivo não encontrado localmente. Conectando ao FTP...")
+
+	# O ponto após o nome evita que o arquivo único (RDMG2408.dbc) seja confundido com uma parte (RDMG2408a.dbc)
+	remote_directory = dados_remote_directory.format(source=source_value)
+	prefixo = month_file_pattern(source_value, uf_value, year_value, month_value)
+	arquivo_dbc = download_file(dados_ftp_host, remote_directory, f'{prefixo}{part}.', directory, log)
+	if not arquivo_dbc and part:
+		arquivo_dbc = download_file(dados_ftp_host, remote_directory, f'{prefixo}{part.upper()}.', directory, log)
+	if not arquivo_dbc:
+		log(f"Nenhum arquivo encontrado para o ano {year_value} e mês {month_value}.")
+		return None
+
+	if manifest:
+		manifest.register(KIND_DBC, arquivo_dbc, *key)
+
+	return arquivo_dbc if can_stream(arquivo_dbc) else decompress_dbc(arquivo_dbc, log, manifest, key)
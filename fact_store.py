@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import sqlite3
+import pandas as pd
+from schema import compact_codes
+
+# Caminho padrão do armazém de fatos (dentro do diretório de dados)
+fact_store_path_padrao = os.path.join('data', 'facts.sqlite')
+
+# Versão do cálculo dos fatos (alterar invalida todos os meses gravados)
+fact_store_version = 3
+
+# Colunas dos fatos, na ordem em que são retornadas
+fact_columns = ['CNES', 'PROC_REA', 'VAL_TOT', 'FREQ']
+
+# Classe com os fatos mensais já agregados de todos os hospitais: soma do 'VAL_TOT' (em centavos) e frequência por
+# (fonte, UF, competência, CNES, PROC_REA), preenchidos uma vez por mês lido
+class FactStore:
+	def __init__(self, path=fact_store_path_padrao):
+		self.path = path
+		diretorio = os.path.dirname(path)
+		if diretorio:
+			os.makedirs(diretorio, exist_ok=True)
+		with self.connect() as con:
+			# Tabelas de uma versão anterior (com outro formato dos valores) são descartadas e preenchidas de novo
+			if con.execute("PRAGMA user_version").fetchone()[0] != fact_store_version:
+				con.execute("DROP TABLE IF EXISTS facts")
+				con.execute("DROP TABLE IF EXISTS months")
+				con.execute(f"PRAGMA user_version = {fact_store_version}")
+			con.execute("""
+				CREATE TABLE IF NOT EXISTS months (
+					source TEXT NOT NULL,
+					uf TEXT NOT NULL,
+					competencia TEXT NOT NULL,
+					files TEXT NOT NULL,
+					rows INTEGER NOT NULL,
+					created_at REAL NOT NULL,
+					PRIMARY KEY (source, uf, competencia)
+				)
+			""")
+			con.execute("""
+				CREATE TABLE IF NOT EXISTS facts (
+					source TEXT NOT NULL,
+					uf TEXT NOT NULL,
+					competencia TEXT NOT NULL,
+					cnes TEXT NOT NULL,
+					proc_rea TEXT NOT NULL,
+					val_tot INTEGER NOT NULL,
+					freq INTEGER NOT NULL,
+					PRIMARY KEY (source, uf, competencia, cnes, proc_rea)
+				) WITHOUT ROWID
+			""")
+			# Consultas de um hospital em vários meses (acumulado do ano, comparações entre hospitais)
+			con.execute("CREATE INDEX IF NOT EXISTS facts_cnes ON facts (cnes, source, uf, competencia)")
+
+	# Função para abrir uma conexão (uma por operação, para uso seguro entre threads e processos)
+	def connect(self):
+		con = sqlite3.connect(self.path, timeout=30)
+		con.row_factory = sqlite3.Row
+		return con
+
+	# Função que retorna os arquivos de origem com que o mês foi gravado ({parte: {'path', 'sha256', 'size',
+	# 'mtime_ns'}}), ou None se o mês não está gravado; o mês gravado é respondido sem abrir esses arquivos
+	def month_files(self, source, uf, competencia):
+		with self.connect() as con:
+			registro = con.execute("SELECT files FROM months WHERE source = ? AND uf = ? AND competencia = ?", (source, uf, competencia)).fetchone()
+		return None if registro is None else json.loads(registro['files'])
+
+	# Função para gravar (ou substituir) os fatos de um mês a partir da tabela agrupada por (CNES, PROC_REA),
+	# com a lista das partes do mês e o hash e a assinatura do arquivo de origem de cada uma (files)
+	# O mês e seus fatos são gravados em uma única transação: uma gravação interrompida não deixa um mês incompleto
+	def store_month(self, df_agrupado, source, uf, competencia, files):
+		linhas = zip(
+			df_agrupado['CNES'].astype(str).tolist(),
+			df_agrupado['PROC_REA'].astype(str).tolist(),
+			df_agrupado['VAL_TOT'].astype('int64').tolist(),
+			df_agrupado['FREQ'].astype('int64').tolist()
+		)
+		with self.connect() as con:
+			con.execute("DELETE FROM facts WHERE source = ? AND uf = ? AND competencia = ?", (source, uf, competencia))
+			con.executemany(
+				"INSERT INTO facts (source, uf, competencia, cnes, proc_rea, val_tot, freq) VALUES (?, ?, ?, ?, ?, ?, ?)",
+				((source, uf, competencia, cnes, proc_rea, val_tot, freq) for cnes, proc_rea, val_tot, freq in linhas)
+			)
+			con.execute(
+				"INSERT OR REPLACE INTO months (source, uf, competencia, files, rows, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+				(source, uf, competencia, json.dumps(files, sort_keys=True), len(df_agrupado), time.time())
+			)
+
+	# Função que retorna os fatos de um mês, ordenados por (CNES, PROC_REA), apenas dos CNES informados
+	# (códigos como categorias e 'VAL_TOT' em centavos)
+	def month_facts(self, source, uf, competencia, cnes_values=None):
+		consulta = "SELECT cnes AS CNES, proc_rea AS PROC_REA, val_tot AS VAL_TOT, freq AS FREQ FROM facts WHERE source = ? AND uf = ? AND competencia = ?"
+		parametros = [source, uf, competencia]
+		if cnes_values:
+			cnes_values = sorted(set(cnes_values))
+			consulta += f" AND cnes IN ({', '.join('?' for _ in cnes_values)})"
+			parametros.extend(cnes_values)
+		consulta += " ORDER BY cnes, proc_rea"
+
+		with self.connect() as con:
+			df = pd.read_sql_query(consulta, con, params=parametros)
+		return compact_codes(df.astype({'CNES': str, 'PROC_REA': str, 'VAL_TOT': 'int64', 'FREQ': 'int64'}))[fact_columns]
+
+	# Função que retorna os totais por CNES (e por competência, com by_month) de vários meses gravados:
+	# procedimentos distintos, frequência e soma do 'VAL_TOT' (em centavos), do maior para o menor valor
+	def totals(self, source, uf, competencias, cnes_values=None, by_month=False):
+		colunas = 'cnes AS CNES, competencia AS COMPETENCIA' if by_month else 'cnes AS CNES'
+		grupos = 'cnes, competencia' if by_month else 'cnes'
+		consulta = f"SELECT {colunas}, COUNT(DISTINCT proc_rea) AS PROCEDIMENTOS, SUM(freq) AS FREQ, SUM(val_tot) AS VAL_TOT FROM facts WHERE source = ? AND uf = ? AND competencia IN ({', '.join('?' for _ in competencias)})"
+		parametros = [source, uf, *competencias]
+		if cnes_values:
+			consulta += f" AND cnes IN ({', '.join('?' for _ in cnes_values)})"
+			parametros.extend(cnes_values)
+		consulta += f" GROUP BY {grupos} ORDER BY VAL_TOT DESC, {grupos}"
+
+		with self.connect() as con:
+			return pd.read_sql_query(consulta, con, params=parametros)
@@ -0,0 +1,118 @@
+import os
+import re
+import json
+import time
+import bisect
+import threading
+
+# Diretório padrão das listagens salvas
+listings_directory_padrao = os.path.join('data', 'listings')
+
+# Validade padrão de uma listagem (segundos)
+ttl_padrao = 12 * 60 * 60
+
+# Idade mínima da listagem para consultar o servidor novamente quando um arquivo não é encontrado (segundos)
+min_refresh_padrao = 5 * 60
+
+# Classe com a listagem de um diretório remoto, ordenada para busca por prefixo
+class RemoteListing:
+	def __init__(self, names, fetched_at):
+		self.names = sorted(names)
+		self.fetched_at = fetched_at
+
+	# Função para verificar se a listagem ainda está dentro da validade
+	def is_fresh(self, ttl):
+		return time.time() - self.fetched_at < ttl
+
+	# Função que retorna todos os arquivos que começam com o prefixo (busca binária, sem varredura)
+	def find_all(self, prefix):
+		inicio = bisect.bisect_left(self.names, prefix)
+		encontrados = []
+		for nome in self.names[inicio:]:
+			if not nome.startswith(prefix):
+				break
+			encontrados.append(nome)
+		return encontrados
+
+	# Função que retorna o primeiro arquivo que começa com o prefixo
+	def find(self, prefix):
+		inicio = bisect.bisect_left(self.names, prefix)
+		if inicio < len(self.names) and self.names[inicio].startswith(prefix):
+			return self.names[inicio]
+		return None
+
+# Classe que mantém as listagens dos diretórios remotos em memória e em disco, com validade (TTL)
+class ListingCache:
+	def __init__(self, directory=listings_directory_padrao, ttl=ttl_padrao, min_refresh=min_refresh_padrao):
+		self.directory = directory
+		self.ttl = ttl
+		self.min_refresh = min_refresh
+		self.listings = {}
+		self.lock = threading.Lock()
+
+	# Função para montar o caminho do arquivo da listagem de um servidor + diretório
+	def listing_path(self, host, remote_directory):
+		nome = re.sub(r'[^A-Za-z0-9._-]+', '_', f'{host}{remote_directory}').strip('_')
+		return os.path.join(self.directory, f'{nome}.json')
+
+	# Função para ler a listagem salva em disco
+	def read(self, host, remote_directory):
+		caminho = self.listing_path(host, remote_directory)
+		if not os.path.exists(caminho):
+			return None
+		try:
+			with open(caminho, 'r', encoding='utf-8') as f:
+				dados = json.load(f)
+		except (OSError, ValueError):
+			return None
+		return RemoteListing(dados['names'], dados['fetched_at'])
+
+	# Função para salvar a listagem em disco
+	def write(self, host, remote_directory, listing):
+		os.makedirs(self.directory, exist_ok=True)
+		caminho = self.listing_path(host, remote_directory)
+		temporario = caminho + '.tmp'
+		with open(temporario, 'w', encoding='utf-8') as f:
+			json.dump({'host': host, 'directory': remote_directory, 'fetched_at': listing.fetched_at, 'names': listing.names}, f)
+		os.replace(temporario, caminho)
+
+	# Função que retorna a listagem do diretório, consultando o servidor (fetch) apenas
+	# quando não existe listagem válida em memória ou em disco, ou quando refresh é pedido
+	def get(self, host, remote_directory, fetch, refresh=False):
+		chave = (host, remote_directory)
+		with self.lock:
+			listing = None if refresh else self.listings.get(chave)
+			if listing is None and not refresh:
+				listing = self.read(host, remote_directory)
+			if listing is None or not listing.is_fresh(self.ttl):
+				listing = RemoteListing(fetch(), time.time())
+				self.write(host, remote_directory, listing)
+			self.listings[chave] = listing
+			return listing
+
+	# Função que retorna a listagem já conhecida (em memória ou em disco, mesmo fora da validade),
+	# sem consultar o servidor; retorna None se o diretório nunca foi listado
+	def cached(self, host, remote_directory):
+		chave = (host, remote_directory)
+		with self.lock:
+			listing = self.listings.get(chave) or self.read(host, remote_directory)
+			if listing is not None:
+				self.listings[chave] = listing
+			return listing
+
+	# Função que encontra o primeiro arquivo remoto com o prefixo; se a listagem salva não o contiver
+	# (por exemplo, competência publicada depois da última consulta), a listagem é atualizada uma vez
+	def find(self, host, remote_directory, prefix, fetch):
+		listing = self.get(host, remote_directory, fetch)
+		encontrado = listing.find(prefix)
+		if encontrado is None and not listing.is_fresh(self.min_refresh):
+			encontrado = self.get(host, remote_directory, fetch, refresh=True).find(prefix)
+		return encontrado
+
+	# Função que encontra todos os arquivos remotos com o prefixo (atualizando a listagem uma vez, como em find)
+	def find_all(self, host, remote_directory, prefix, fetch):
+		listing = self.get(host, remote_directory, fetch)
+		encontrados = listing.find_all(prefix)
+		if not encontrados and not listing.is_fresh(self.min_refresh):
+			encontrados = self.get(host, remote_directory, fetch, refresh=True).find_all(prefix)
+		return encontrados
@@ -0,0 +1,164 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+# Caminho padrão do manifesto (dentro do diretório de dados)
+manifest_path_padrao = os.path.join('data', 'manifest.sqlite')
+
+# Tipos de arquivo registrados
+KIND_SIGTAP_ZIP = 'sigtap_zip'
+KIND_SIGTAP_INDEX = 'sigtap_index'
+KIND_DBC = 'dbc'
+KIND_DBF = 'dbf'
+KIND_COLUMNAR = 'columnar'
+
+# Tipos de arquivo bruto que podem ser removidos para respeitar o limite de disco
+# (podem ser obtidos novamente e, depois de convertidos, não são mais lidos)
+evictable_kinds = (KIND_DBC, KIND_DBF)
+
+# Tamanho do bloco lido para calcular o hash
+hash_block_size = 1024 * 1024
+
+# Função que retorna o tamanho e a data de modificação (em nanossegundos) de um arquivo
+def file_stat(caminho):
+	info = os.stat(caminho)
+	return info.st_size, info.st_mtime_ns
+
+# Função para calcular o hash SHA-256 de um arquivo
+def file_hash(caminho):
+	sha256 = hashlib.sha256()
+	with open(caminho, 'rb') as f:
+		for bloco in iter(lambda: f.read(hash_block_size), b''):
+			sha256.update(bloco)
+	return sha256.hexdigest()
+
+# Classe com o registro dos arquivos locais (baixados e derivados), indexado por tipo, fonte, UF e competência
+class Manifest:
+	def __init__(self, path=manifest_path_padrao):
+		self.path = path
+		diretorio = os.path.dirname(path)
+		if diretorio:
+			os.makedirs(diretorio, exist_ok=True)
+		with self.connect() as con:
+			con.execute("""
+				CREATE TABLE IF NOT EXISTS artifacts (
+					path TEXT PRIMARY KEY,
+					kind TEXT NOT NULL,
+					source TEXT NOT NULL DEFAULT '',
+					uf TEXT NOT NULL DEFAULT '',
+					competencia TEXT NOT NULL DEFAULT '',
+					size INTEGER NOT NULL,
+					sha256 TEXT,
+					parent TEXT,
+					created_at REAL NOT NULL,
+					last_used REAL NOT NULL
+				)
+			""")
+			# Manifestos anteriores não guardavam a data de modificação: os hashes desses registros são recalculados
+			colunas = [linha['name'] for linha in con.execute("PRAGMA table_info(artifacts)")]
+			if 'mtime_ns' not in colunas:
+				con.execute("ALTER TABLE artifacts ADD COLUMN mtime_ns INTEGER")
+			con.execute("CREATE UNIQUE INDEX IF NOT EXISTS artifacts_key ON artifacts (kind, source, uf, competencia)")
+			con.execute("CREATE INDEX IF NOT EXISTS artifacts_last_used ON artifacts (kind, last_used)")
+
+	# Função para abrir uma conexão (uma por operação, para uso seguro entre threads e processos)
+	def connect(self):
+		con = sqlite3.connect(self.path, timeout=30)
+		con.row_factory = sqlite3.Row
+		return con
+
+	# Função para registrar (ou atualizar) um arquivo
+	def register(self, kind, path, source='', uf='', competencia='', parent=None, with_hash=True):
+		agora = time.time()
+		tamanho, mtime_ns = file_stat(path)
+		with self.connect() as con:
+			# Um único arquivo por chave: o registro anterior é substituído
+			con.execute("DELETE FROM artifacts WHERE kind = ? AND source = ? AND uf = ? AND competencia = ? AND path <> ?", (kind, source or '', uf or '', competencia or '', path))
+			con.execute(
+				"INSERT OR REPLACE INTO artifacts (path, kind, source, uf, competencia, size, mtime_ns, sha256, parent, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(path, kind, source or '', uf or '', competencia or '', tamanho, mtime_ns, file_hash(path) if with_hash else None, parent, agora, agora)
+			)
+		return path
+
+	# Função para remover um registro
+	def unregister(self, path):
+		with self.connect() as con:
+			con.execute("DELETE FROM artifacts WHERE path = ?", (path,))
+
+	# Função que retorna o registro de um arquivo pela chave (tipo, fonte, UF, competência)
+	def get(self, kind, source='', uf='', competencia=''):
+		with self.connect() as con:
+			return con.execute("SELECT * FROM artifacts WHERE kind = ? AND source = ? AND uf = ? AND competencia = ?", (kind, source or '', uf or '', competencia or '')).fetchone()
+
+	# Função que retorna os registros de um tipo cuja competência começa com o valor informado
+	# (por exemplo, as partes 202408a, 202408b de um mês dividido em vários arquivos)
+	def entries(self, kind, source='', uf='', competencia=''):
+		with self.connect() as con:
+			return con.execute("SELECT * FROM artifacts WHERE kind = ? AND source = ? AND uf = ? AND competencia LIKE ? ORDER BY competencia", (kind, source or '', uf or '', f'{competencia}%')).fetchall()
+
+	# Função que retorna o caminho do arquivo registrado para a chave, marcando-o como usado;
+	# registros de arquivos removidos ou alterados fora do programa são descartados
+	def lookup(self, kind, source='', uf='', competencia=''):
+		registro = self.get(kind, source, uf, competencia)
+		if registro is None:
+			return None
+
+		if not os.path.exists(registro['path']) or os.path.getsize(registro['path']) != registro['size']:
+			self.unregister(registro['path'])
+			return None
+
+		self.touch(registro['path'])
+		return registro['path']
+
+	# Função que retorna o hash do conteúdo de um arquivo, reaproveitando o valor registrado quando o arquivo
+	# continua com o mesmo tamanho e a mesma data de modificação (o hash calculado é guardado no registro)
+	# Um arquivo publicado novamente com o mesmo tamanho tem outra data de modificação e é lido de novo
+	def content_hash(self, path):
+		with self.connect() as con:
+			registro = con.execute("SELECT size, mtime_ns, sha256 FROM artifacts WHERE path = ?", (path,)).fetchone()
+		tamanho, mtime_ns = file_stat(path)
+		if registro is not None and registro['sha256'] and registro['size'] == tamanho and registro['mtime_ns'] == mtime_ns:
+			return registro['sha256']
+
+		sha256 = file_hash(path)
+		if registro is not None:
+			with self.connect() as con:
+				con.execute("UPDATE artifacts SET size = ?, mtime_ns = ?, sha256 = ? WHERE path = ?", (tamanho, mtime_ns, sha256, path))
+		return sha256
+
+	# Função para marcar um arquivo como usado agora
+	def touch(self, path):
+		with self.connect() as con:
+			con.execute("UPDATE artifacts SET last_used = ? WHERE path = ?", (time.time(), path))
+
+	# Função que retorna o espaço ocupado pelos arquivos dos tipos informados
+	def total_size(self, kinds=evictable_kinds):
+		with self.connect() as con:
+			marcadores = ', '.join('?' for _ in kinds)
+			return con.execute(f"SELECT COALESCE(SUM(size), 0) FROM artifacts WHERE kind IN ({marcadores})", tuple(kinds)).fetchone()[0]
+
+	# Função que remove os arquivos brutos usados há mais tempo (LRU) até que o espaço ocupado
+	# por eles fique dentro do limite (em bytes); retorna os caminhos removidos
+	def evict(self, budget, kinds=evictable_kinds, log=None):
+		removidos = []
+		total = self.total_size(kinds)
+		if total <= budget:
+			return removidos
+
+		with self.connect() as con:
+			marcadores = ', '.join('?' for _ in kinds)
+			registros = con.execute(f"SELECT path, size FROM artifacts WHERE kind IN ({marcadores}) ORDER BY last_used ASC", tuple(kinds)).fetchall()
+
+		for registro in registros:
+			if total <= budget:
+				break
+			if os.path.exists(registro['path']):
+				os.remove(registro['path'])
+			self.unregister(registro['path'])
+			total -= registro['size']
+			removidos.append(registro['path'])
+			if log:
+				log(f"Arquivo removido para liberar espaço: {registro['path']}")
+
+		return removidos
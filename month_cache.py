@@ -0,0 +1,151 @@
+import io
+import os
+import json
+import datasus_dbc
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import profiling
+from dbf_reader import read_header, iter_dbf_tables, tipos_numericos
+from manifest import KIND_COLUMNAR, file_hash
+
+# Diretório padrão do cache colunar
+cache_directory_padrao = 'data'
+
+# Versão do formato do cache (alterar invalida todas as entradas existentes)
+cache_version = 1
+
+# Função para montar o caminho base (sem extensão) de uma entrada do cache
+def cache_path(source, uf, competencia, directory=cache_directory_padrao):
+	return os.path.join(directory, source, uf, f'{source}_{uf}_{competencia}')
+
+# Função para obter a assinatura (tamanho e data de modificação) do arquivo de origem
+def source_signature(arquivo_origem):
+	info = os.stat(arquivo_origem)
+	return {'size': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+# Função para abrir o arquivo de origem para leitura como DBF
+# (um DBC é descompactado em memória e lido direto do buffer, sem gravar o DBF em disco)
+def open_source(arquivo_origem):
+	if os.path.splitext(arquivo_origem)[1].lower() == '.dbc':
+		with profiling.stage('dbc_decompress', arquivo=os.path.basename(arquivo_origem)):
+			with open(arquivo_origem, 'rb') as f:
+				return io.BytesIO(datasus_dbc.decompress_bytes(f.read()))
+	return open(arquivo_origem, 'rb')
+
+# Função para montar o schema Arrow a partir dos campos do DBF
+def arrow_schema(fields):
+	colunas = []
+	for nome, (tipo, deslocamento, tamanho, decimais) in fields.items():
+		if tipo in tipos_numericos:
+			colunas.append((nome, pa.int64() if decimais == 0 else pa.float64()))
+		else:
+			colunas.append((nome, pa.string()))
+	return pa.schema(colunas)
+
+# Função para ler os metadados de uma entrada do cache, retornando None se a entrada não existir
+def read_meta(source, uf, competencia, directory=cache_directory_padrao):
+	base = cache_path(source, uf, competencia, directory)
+	if not os.path.exists(base + '.feather') or not os.path.exists(base + '.json'):
+		return None
+
+	try:
+		with open(base + '.json', 'r', encoding='utf-8') as f:
+			meta = json.load(f)
+	except (OSError, ValueError):
+		return None
+
+	return meta if meta.get('version') == cache_version else None
+
+# Função para salvar os metadados de uma entrada do cache
+def write_meta(meta, source, uf, competencia, directory=cache_directory_padrao):
+	with open(cache_path(source, uf, competencia, directory) + '.json', 'w', encoding='utf-8') as f:
+		json.dump(meta, f)
+
+# Função para verificar se a entrada do cache existe e corresponde ao arquivo de origem
+def is_cache_valid(arquivo_origem, source, uf, competencia, directory=cache_directory_padrao):
+	meta = read_meta(source, uf, competencia, directory)
+	return meta is not None and meta.get('source') == source_signature(arquivo_origem)
+
+# Função que retorna o hash do conteúdo do arquivo de origem de uma entrada do cache
+# (continua disponível depois que o arquivo de origem é removido para liberar espaço)
+# Retorna None se a entrada não existe ou se o arquivo de origem mudou depois que ela foi criada
+def source_hash(arquivo_origem, source, uf, competencia, directory=cache_directory_padrao):
+	meta = read_meta(source, uf, competencia, directory)
+	if meta is None:
+		return None
+
+	# Arquivo de origem com outra data de modificação, mas com o mesmo conteúdo: a entrada continua valendo
+	origem_existe = arquivo_origem and os.path.exists(arquivo_origem)
+	if origem_existe and meta.get('source') != source_signature(arquivo_origem):
+		if not meta.get('sha256') or file_hash(arquivo_origem) != meta['sha256']:
+			return None
+		meta['source'] = source_signature(arquivo_origem)
+		write_meta(meta, source, uf, competencia, directory)
+
+	# Entradas criadas antes de o hash ser guardado: calcular uma vez, enquanto o arquivo de origem existe
+	if not meta.get('sha256') and origem_existe:
+		meta['sha256'] = file_hash(arquivo_origem)
+		write_meta(meta, source, uf, competencia, directory)
+
+	return meta.get('sha256')
+
+# Função para converter o arquivo DBF (ou DBC) do mês em um arquivo colunar tipado (Feather sem compressão)
+# (sha256 é o hash do conteúdo do arquivo de origem, guardado junto com a entrada quando conhecido)
+def build_cache(arquivo_origem, source, uf, competencia, directory=cache_directory_padrao, sha256=None):
+	base = cache_path(source, uf, competencia, directory)
+	os.makedirs(os.path.dirname(base), exist_ok=True)
+
+	temporario = base + '.feather.tmp'
+
+	with open_source(arquivo_origem) as origem:
+		fields = read_header(origem).fields
+		origem.seek(0)
+		schema = arrow_schema(fields)
+
+		# Escrever bloco a bloco para que a memória dependa do tamanho do bloco
+		with profiling.stage('dbf_read', source=source, uf=uf, competencia=competencia):
+			with pa.OSFile(temporario, 'wb') as sink:
+				with pa.ipc.new_file(sink, schema) as writer:
+					for tabela in iter_dbf_tables(origem, schema):
+						profiling.add('rows_read', tabela.num_rows)
+						writer.write_table(tabela)
+
+	os.replace(temporario, base + '.feather')
+
+	meta = {
+		'version': cache_version,
+		'source_file': os.path.basename(arquivo_origem),
+		'source': source_signature(arquivo_origem),
+		'sha256': sha256
+	}
+	write_meta(meta, source, uf, competencia, directory)
+
+	return base + '.feather'
+
+# Função para ler do cache apenas as colunas necessárias
+# As colunas em codes chegam como categorias (dicionário Arrow): um código inteiro por registro, sem um texto Python por linha
+def read_cache(source, uf, competencia, columns, directory=cache_directory_padrao, codes=None):
+	base = cache_path(source, uf, competencia, directory)
+
+	tabela = feather.read_table(base + '.feather', columns=list(columns), memory_map=True)
+	profiling.add('rows_read', tabela.num_rows)
+
+	for coluna in codes or []:
+		if coluna in tabela.column_names:
+			tabela = tabela.set_column(tabela.column_names.index(coluna), coluna, pc.dictionary_encode(tabela[coluna]))
+	return tabela.to_pandas()
+
+# Função que lê um mês SIH/SIA pelo cache, criando ou recriando a entrada quando necessário
+# (se o arquivo de origem já foi removido para liberar espaço, a entrada existente é usada)
+def read_month(arquivo_origem, source, uf, competencia, columns, directory=cache_directory_padrao, manifest=None, codes=None):
+	if arquivo_origem and os.path.exists(arquivo_origem):
+		if not is_cache_valid(arquivo_origem, source, uf, competencia, directory):
+			caminho = build_cache(arquivo_origem, source, uf, competencia, directory, manifest.content_hash(arquivo_origem) if manifest else None)
+			if manifest:
+				manifest.register(KIND_COLUMNAR, caminho, source, uf, competencia, parent=arquivo_origem, with_hash=False)
+		elif manifest and not manifest.get(KIND_COLUMNAR, source, uf, competencia):
+			manifest.register(KIND_COLUMNAR, cache_path(source, uf, competencia, directory) + '.feather', source, uf, competencia, parent=arquivo_origem, with_hash=False)
+	elif not os.path.exists(cache_path(source, uf, competencia, directory) + '.feather'):
+		raise FileNotFoundError(f"Arquivo {source} não encontrado para {uf} {competencia}.")
+	return read_cache(source, uf, competencia, columns, directory, codes)
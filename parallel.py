@@ -0,0 +1,225 @@
+import os
+import queue
+import importlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import pipeline
+import downloads
+import profiling
+from pipeline import print_log, collect_parts, collect_production, read_production, get_manifest, stored_facts, store_facts
+from downloads import fetch_sigtap_zip
+from download_manager import max_connections_padrao
+from report import aggregate, merge_aggregates
+
+# Unidades obtidas à frente do processamento, além das que estão sendo processadas
+# (limita o espaço em disco e a memória ocupados pelos arquivos que aguardam processamento)
+prefetch_depth = 2
+
+# Unidades baixadas ao mesmo tempo (o mesmo limite de conexões por servidor do gerenciador de downloads)
+fetch_workers = max_connections_padrao
+
+# Função para repassar aos processos filhos os diretórios configurados no processo principal
+def current_settings():
+	return {
+		'pipeline': {
+			'database_directory': pipeline.database_directory,
+			'downloads_directory': pipeline.downloads_directory,
+			'sources_directory': pipeline.sources_directory,
+			'output_directory': pipeline.output_directory,
+			'manifest': None
+		},
+		'downloads': {
+			'listings_directory': downloads.listings_directory,
+			'stream_dbc_max_size': downloads.stream_dbc_max_size
+		},
+		'profiling': {
+			'current': None,
+			'worker_enabled': profiling.current is not None
+		}
+	}
+
+# Função executada ao iniciar cada processo filho
+def configure_worker(settings):
+	for modulo, valores in settings.items():
+		for nome, valor in valores.items():
+			setattr(importlib.import_module(modulo), nome, valor)
+
+# Função que processa uma parte de uma unidade (fonte, UF, ano, mês, parte): obtém o arquivo
+# e agrupa por (CNES, PROC_REA), com todos os hospitais
+# Retorna apenas a tabela agregada (com as mensagens de progresso e as etapas medidas), nunca os registros brutos
+def process_unit(unit):
+	source_value, uf_value, year_value, month_value, part = unit
+	mensagens = []
+
+	with profiling.worker_stages() as etapas:
+		try:
+			arquivo = collect_production(month_value, year_value, source_value, uf_value, mensagens.append, part)
+		except FileNotFoundError as e:
+			mensagens.append(str(e))
+			return unit, None, mensagens, etapas
+
+		with profiling.stage('filter_groupby', source=source_value, uf=uf_value, competencia=f'{year_value}{month_value}{part}'):
+			filtered = read_production(arquivo, source_value, uf_value, f'{year_value}{month_value}{part}', ['CNES', 'PROC_REA', 'VAL_TOT', 'QTD'])
+			df_agrupado = aggregate(filtered, ('CNES', 'PROC_REA'))
+
+	return unit, df_agrupado, mensagens, etapas
+
+# Função que obtém os arquivos de uma parte de uma unidade (SIH/SIA e Tabela Unificada, quando pedida), sem processá-los
+# Erros não interrompem a obtenção das demais partes: o arquivo é pedido novamente ao processar a parte,
+# que informa o erro
+def fetch_unit(unit, sigtap=False, cancelado=None):
+	source_value, uf_value, year_value, month_value, part = unit
+	mensagens = []
+	if cancelado is not None and cancelado.is_set():
+		return unit, mensagens
+
+	try:
+		collect_production(month_value, year_value, source_value, uf_value, mensagens.append, part)
+	except Exception as e:
+		mensagens.append(str(e))
+
+	if sigtap:
+		try:
+			fetch_sigtap_zip(year_value, month_value, mensagens.append, pipeline.downloads_directory, get_manifest())
+		except Exception as e:
+			mensagens.append(str(e))
+
+	return unit, mensagens
+
+# Função que obtém os arquivos das unidades em threads (rede), colocando cada unidade na fila prontas
+# assim que seus arquivos estão disponíveis; uma vaga é ocupada por unidade e devolvida ao final do seu processamento,
+# de modo que os downloads não se adiantam mais do que o número de vagas (a obtenção para quando cancelado é marcado)
+def produce_units(units, prontas, vagas, cancelado):
+	# A Tabela Unificada de cada competência é baixada uma única vez (com a primeira unidade da competência)
+	competencias = set()
+	with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+		for unit in units:
+			while not vagas.acquire(timeout=0.1):
+				if cancelado.is_set():
+					return
+			if cancelado.is_set():
+				vagas.release()
+				return
+
+			source_value, uf_value, year_value, month_value, part = unit
+			sigtap = (year_value, month_value) not in competencias
+			competencias.add((year_value, month_value))
+			executor.submit(fetch_unit, unit, sigtap, cancelado).add_done_callback(lambda futuro: prontas.put(futuro.result()))
+
+# Função que divide as unidades (fonte, UF, ano, mês) nas partes de cada mês (fonte, UF, ano, mês, parte)
+def split_units(units, log=print_log):
+	partes = []
+	for unit in units:
+		source_value, uf_value, year_value, month_value = unit
+		encontradas = collect_parts(month_value, year_value, source_value, uf_value, log)
+		if not encontradas:
+			log(f"Arquivo {source_value} não encontrado para {uf_value} {month_value}/{year_value}.")
+		partes.extend(unit + (part,) for part in encontradas)
+	return partes
+
+# Função que processa várias unidades independentes, em paralelo quando workers > 1,
+# e reúne no processo principal as tabelas agregadas de cada unidade
+# Os meses divididos em vários arquivos (a, b, c) têm cada parte processada como uma unidade independente,
+# e as tabelas agregadas das partes são somadas
+# Os downloads das próximas partes acontecem em threads enquanto as anteriores são processadas
+# (fila limitada: no máximo workers + prefetch_depth partes obtidas e ainda não processadas)
+def aggregate_units(units, workers=1, log=print_log):
+	resultados = {}
+	units = list(units)
+	partes = split_units(units, log)
+	if not partes:
+		return resultados
+
+	# Os processos filhos são criados antes das threads de download: um fork feito enquanto outra thread
+	# segura uma trava (conexões FTP, listagens) deixaria a trava presa no processo filho
+	executor = None
+	if workers > 1 and len(partes) > 1:
+		executor = ProcessPoolExecutor(max_workers=min(workers, len(partes)), initializer=configure_worker, initargs=(current_settings(),))
+		executor.submit(os.getpid).result()
+
+	prontas = queue.Queue()
+	vagas = threading.Semaphore(max(workers, 1) + prefetch_depth)
+	cancelado = threading.Event()
+	produtor = threading.Thread(target=produce_units, args=(partes, prontas, vagas, cancelado), daemon=True)
+	produtor.start()
+
+	try:
+		if executor is None:
+			for _ in partes:
+				unit, mensagens = prontas.get()
+				unit, df_agrupado, mensagens_unidade, etapas = process_unit(unit)
+				vagas.release()
+				for mensagem in mensagens + mensagens_unidade:
+					log(mensagem)
+				if df_agrupado is not None:
+					resultados[unit] = df_agrupado
+		else:
+			futuros = {}
+			for _ in partes:
+				unit, mensagens = prontas.get()
+				futuro = executor.submit(process_unit, unit)
+				futuro.add_done_callback(lambda futuro: vagas.release())
+				futuros[futuro] = mensagens
+
+			for futuro in as_completed(futuros):
+				unit, df_agrupado, mensagens, etapas = futuro.result()
+				source_value, uf_value, year_value, month_value, part = unit
+				log(f"\n{source_value} {uf_value} {month_value}/{year_value}{f' (parte {part})' if part else ''}:")
+				for mensagem in futuros[futuro] + mensagens:
+					log(mensagem)
+				profiling.merge(etapas)
+				if df_agrupado is not None:
+					resultados[unit] = df_agrupado
+	except BaseException:
+		# Interromper os downloads ainda não iniciados e descartar as partes que aguardam processamento
+		# (sem esperar pelos downloads em andamento, que continuam em segundo plano e podem ser retomados depois)
+		cancelado.set()
+		if executor:
+			executor.shutdown(wait=False, cancel_futures=True)
+		raise
+
+	if executor:
+		executor.shutdown()
+	produtor.join()
+
+	# Somar as partes de cada unidade, mantendo a ordem das unidades pedidas
+	# (um mês com alguma parte ausente é descartado, para não gerar totais incompletos)
+	agregados = {}
+	for unit in units:
+		tabelas = [resultados.get(parte) for parte in partes if parte[:4] == unit]
+		if not tabelas:
+			continue
+		if any(tabela is None for tabela in tabelas):
+			source_value, uf_value, year_value, month_value = unit
+			log(f"Competência ignorada (partes incompletas): {source_value} {uf_value} {month_value}/{year_value}")
+			continue
+		agregados[unit] = merge_aggregates(tabelas, ('CNES', 'PROC_REA'))
+	return agregados
+
+# Função que retorna os fatos (procedimentos agrupados por CNES e PROC_REA) de várias unidades, apenas dos CNES informados
+# As unidades já gravadas no armazém de fatos são lidas dele, sem abrir os arquivos do mês; as demais são processadas
+# com todos os hospitais (em paralelo quando workers > 1) e gravadas, para que os próximos relatórios não as leiam de novo
+def aggregate_stored_units(units, cnes_values=None, workers=1, log=print_log):
+	units = list(units)
+	fatos = {}
+	for unit in units:
+		source_value, uf_value, year_value, month_value = unit
+		fatos[unit] = stored_facts(month_value, year_value, source_value, uf_value, cnes_values, log)
+		if fatos[unit] is not None:
+			log(f"Competência encontrada no armazém de fatos: {source_value} {uf_value} {month_value}/{year_value}")
+
+	pendentes = [unit for unit in units if fatos[unit] is None]
+	agregados = aggregate_units(pendentes, workers, log)
+	for unit, df_agrupado in agregados.items():
+		source_value, uf_value, year_value, month_value = unit
+		store_facts(df_agrupado, month_value, year_value, source_value, uf_value, log)
+		if cnes_values:
+			df_agrupado = df_agrupado[df_agrupado['CNES'].isin(cnes_values)].reset_index(drop=True)
+		fatos[unit] = df_agrupado
+
+	# Manter a ordem das unidades pedidas, sem as que não puderam ser processadas
+	return {unit: fatos[unit] for unit in units if fatos[unit] is not None}
+
+# Função para obter o número padrão de processos (um por núcleo)
+def default_workers():
+	return os.cpu_count() or 1
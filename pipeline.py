@@ -0,0 +1,398 @@
+import os
+import time
+import uuid
+import profiling
+from concurrent.futures import ThreadPoolExecutor
+from downloads import fetch_sigtap_zip, fetch_month_file, resolve_month_parts
+from month_cache import read_month, source_hash, source_signature
+from sigtap import load_sigtap
+from report import aggregate, merge_aggregates, enrich, report_headers, write_report
+from manifest import Manifest, KIND_COLUMNAR
+from fact_store import FactStore
+from schema import code_columns
+from correction import parse_correction, format_month
+
+# Diretórios usados pelo processo
+database_directory = 'data'
+downloads_directory = 'downloads'
+sources_directory = 'sources'
+output_directory = 'results'
+
+# Espaço máximo (em bytes) ocupado pelos arquivos brutos baixados (None = sem limite)
+disk_budget = None
+
+# Manifesto dos arquivos locais
+manifest = None
+
+# Armazém dos fatos mensais já agregados por (CNES, PROC_REA)
+fact_store = None
+
+# Colunas dos arquivos de produção de cada fonte, pelos nomes usados na planilha
+# (no SIA, cada registro traz a quantidade aprovada, usada como frequência no lugar do número de registros)
+production_columns = {
+	'SIH': {'CNES': 'CNES', 'PROC_REA': 'PROC_REA', 'VAL_TOT': 'VAL_TOT'},
+	'SIA': {'CNES': 'PA_CODUNI', 'PROC_REA': 'PA_PROC_ID', 'VAL_TOT': 'PA_VALAPR', 'QTD': 'PA_QTDAPR'}
+}
+
+# Função de progresso padrão (sem interface gráfica)
+def print_log(message):
+	print(message, flush=True)
+
+# Função para obter o manifesto dos arquivos locais (dentro do diretório de dados)
+def get_manifest():
+	global manifest
+	caminho = os.path.join(database_directory, 'manifest.sqlite')
+	if manifest is None or manifest.path != caminho:
+		manifest = Manifest(caminho)
+	return manifest
+
+# Função para obter o armazém de fatos mensais (dentro do diretório de dados)
+def get_fact_store():
+	global fact_store
+	caminho = os.path.join(database_directory, 'facts.sqlite')
+	if fact_store is None or fact_store.path != caminho:
+		fact_store = FactStore(caminho)
+	return fact_store
+
+# Função para remover os arquivos brutos usados há mais tempo quando o limite de disco é ultrapassado
+def enforce_disk_budget(log=print_log):
+	if disk_budget is not None:
+		get_manifest().evict(disk_budget, log=log)
+
+# Função para criar os diretórios usados pelo processo
+def ensure_directories():
+	for diretorio in (downloads_directory, sources_directory, output_directory, database_directory):
+		if not os.path.exists(diretorio):
+			os.makedirs(diretorio)
+
+# Função que obtém a tabela SIGTAP da competência, já cruzada com a TUNEP
+def collect_sigtap(month_value, year_value, log=print_log):
+	with profiling.stage('sigtap_fetch', competencia=f'{year_value}{month_value}'):
+		local_zip = fetch_sigtap_zip(year_value, month_value, log, downloads_directory, get_manifest())
+	if not local_zip:
+		raise FileNotFoundError(f"Tabela Unificada não encontrada para {month_value}/{year_value}.")
+
+	log("Coletando informações...")
+
+	# Carregar o índice SIGTAP da competência, já cruzado com a TUNEP
+	# (montado a partir do ZIP e do TUNEP.csv apenas quando ainda não existe ou quando um deles muda)
+	local_tunep = os.path.join(sources_directory, "TUNEP.csv")
+	sigtap = load_sigtap(local_zip, local_tunep, f'{year_value}{month_value}', os.path.join(database_directory, 'sigtap'), get_manifest())
+
+	log("Dados coletados com sucesso.")
+
+	return sigtap
+
+# Função que retorna as partes do arquivo SIH/SIA da competência ([''] para um arquivo único)
+def collect_parts(month_value, year_value, source_value, uf_value, log=print_log):
+	return resolve_month_parts(source_value, uf_value, year_value, month_value, log, downloads_directory, get_manifest())
+
+# Função que obtém o arquivo SIH/SIA da competência (ou de uma das partes do mês)
+# (se o mês já está no cache colunar, retorna o arquivo de origem registrado sem baixá-lo novamente)
+def collect_production(month_value, year_value, source_value, uf_value, log=print_log, part=''):
+	competencia = f'{year_value}{month_value}{part}'
+	if get_manifest().lookup(KIND_COLUMNAR, source_value, uf_value, competencia):
+		registro = get_manifest().get(KIND_COLUMNAR, source_value, uf_value, competencia)
+		log(f"Competência encontrada no cache: {source_value} {uf_value} {month_value}/{year_value}")
+		return registro['parent']
+
+	with profiling.stage('production_fetch', source=source_value, uf=uf_value, competencia=competencia):
+		arquivo_dbf = fetch_month_file(source_value, uf_value, year_value, month_value, log, downloads_directory, get_manifest(), part)
+
+	# Verificar se o arquivo DBF foi criado
+	if not arquivo_dbf or not os.path.exists(arquivo_dbf):
+		raise FileNotFoundError(f"Arquivo {source_value} não encontrado para {uf_value} {month_value}/{year_value}.")
+
+	return arquivo_dbf
+
+# Função que obtém os arquivos de todas as partes da competência, baixando-as em paralelo
+# Retorna uma lista de (parte, arquivo)
+def collect_production_parts(month_value, year_value, source_value, uf_value, log=print_log):
+	partes = collect_parts(month_value, year_value, source_value, uf_value, log)
+	if not partes:
+		raise FileNotFoundError(f"Arquivo {source_value} não encontrado para {uf_value} {month_value}/{year_value}.")
+
+	with ThreadPoolExecutor(max_workers=len(partes)) as executor:
+		arquivos = list(executor.map(lambda part: collect_production(month_value, year_value, source_value, uf_value, log, part), partes))
+	return list(zip(partes, arquivos))
+
+# Função que lê do cache colunar as colunas pedidas (pelos nomes usados na planilha) de um arquivo de produção
+# (CNES e PROC_REA chegam como categorias)
+def read_production(arquivo, source_value, uf_value, competencia, columns):
+	campos = production_columns[source_value]
+	codes = [campos[coluna] for coluna in code_columns]
+	filtered = read_month(arquivo, source_value, uf_value, competencia, [campos[coluna] for coluna in columns if coluna in campos], directory=database_directory, manifest=get_manifest(), codes=codes)
+	return filtered.rename(columns={campo: coluna for coluna, campo in campos.items()})
+
+# Função que retorna os arquivos de origem de cada parte da competência já convertida para o cache colunar:
+# {parte: {'path', 'sha256', 'size', 'mtime_ns'}} ('' para um arquivo único), ou None se alguma parte ainda não
+# está no cache colunar (as partes vêm dos arquivos locais e do manifesto; o FTP só é consultado sem nenhuma delas)
+def month_files(month_value, year_value, source_value, uf_value, log=print_log):
+	competencia = f'{year_value}{month_value}'
+	partes = collect_parts(month_value, year_value, source_value, uf_value, log)
+	if not partes:
+		return None
+
+	arquivos = {}
+	for part in partes:
+		if not get_manifest().lookup(KIND_COLUMNAR, source_value, uf_value, competencia + part):
+			return None
+		registro = get_manifest().get(KIND_COLUMNAR, source_value, uf_value, competencia + part)
+		sha256 = source_hash(registro['parent'], source_value, uf_value, competencia + part, database_directory)
+		if sha256 is None:
+			return None
+
+		arquivos[part] = {'path': registro['parent'], 'sha256': sha256}
+		if registro['parent'] and os.path.exists(registro['parent']):
+			arquivos[part].update(source_signature(registro['parent']))
+
+	return arquivos
+
+# Função que reduz os arquivos do mês ao hash do conteúdo (um hash para um arquivo único ou um dicionário
+# parte -> hash para os meses divididos em partes)
+def files_hash(arquivos):
+	hashes = {part: arquivo['sha256'] for part, arquivo in arquivos.items()}
+	return hashes[''] if list(hashes) == [''] else hashes
+
+# Função que retorna o hash do conteúdo do arquivo SIH/SIA da competência (ver files_hash),
+# ou None se o mês (alguma das partes) ainda não está no cache colunar
+def month_hash(month_value, year_value, source_value, uf_value, log=print_log):
+	arquivos = month_files(month_value, year_value, source_value, uf_value, log)
+	return None if arquivos is None else files_hash(arquivos)
+
+# Função que retorna o hash do conteúdo dos arquivos com que a competência foi gravada no armazém de fatos,
+# ou None se ela não está gravada ou se algum arquivo de origem ainda presente localmente mudou
+# Não consulta o FTP nem o cache colunar: os arquivos removidos (limite de disco, cache apagado) não invalidam o mês
+def stored_month_hash(month_value, year_value, source_value, uf_value, log=print_log):
+	arquivos = get_fact_store().month_files(source_value, uf_value, f'{year_value}{month_value}')
+	if arquivos is None:
+		return None
+
+	for arquivo in arquivos.values():
+		caminho = arquivo.get('path')
+		if not caminho or not os.path.exists(caminho):
+			continue
+		# Mesma assinatura: o arquivo não mudou; assinatura diferente: o conteúdo é comparado pelo hash
+		if source_signature(caminho) == {'size': arquivo.get('size'), 'mtime_ns': arquivo.get('mtime_ns')}:
+			continue
+		if get_manifest().content_hash(caminho) != arquivo['sha256']:
+			return None
+
+	return files_hash(arquivos)
+
+# Função que retorna os hashes do conteúdo das entradas de uma competência (ZIP SIGTAP, TUNEP.csv e arquivo SIH/SIA)
+# Retorna None se o mês (alguma das partes) ainda não está no cache colunar (a competência precisa ser processada)
+def input_hashes(month_value, year_value, source_value, uf_value, log=print_log):
+	local_zip = fetch_sigtap_zip(year_value, month_value, log, downloads_directory, get_manifest())
+	local_tunep = os.path.join(sources_directory, "TUNEP.csv")
+	if not local_zip or not os.path.exists(local_tunep):
+		return None
+
+	# O hash do mês gravado no armazém de fatos dispensa o FTP e o cache colunar
+	month = stored_month_hash(month_value, year_value, source_value, uf_value, log)
+	if month is None:
+		month = month_hash(month_value, year_value, source_value, uf_value, log)
+	if month is None:
+		return None
+
+	return {
+		'sigtap': get_manifest().content_hash(local_zip),
+		'tunep': get_manifest().content_hash(local_tunep),
+		'month': month
+	}
+
+# Função para verificar se a competência está gravada no armazém de fatos (e se os arquivos de origem ainda
+# presentes localmente são os mesmos com que foi gravada)
+def is_month_stored(month_value, year_value, source_value, uf_value, log=print_log):
+	return stored_month_hash(month_value, year_value, source_value, uf_value, log) is not None
+
+# Função que retorna do armazém os fatos da competência (procedimentos agrupados por CNES e PROC_REA),
+# apenas dos CNES informados; retorna None se o mês não está gravado ou se algum arquivo do mês mudou
+def stored_facts(month_value, year_value, source_value, uf_value, cnes_values=None, log=print_log):
+	competencia = f'{year_value}{month_value}'
+	if not is_month_stored(month_value, year_value, source_value, uf_value, log):
+		return None
+
+	with profiling.stage('fact_store', source=source_value, uf=uf_value, competencia=competencia):
+		return get_fact_store().month_facts(source_value, uf_value, competencia, cnes_values)
+
+# Função para gravar no armazém os fatos de todos os hospitais de uma competência recém-lida
+# (não grava se algum arquivo do mês não está no cache colunar, por exemplo quando uma parte falhou)
+def store_facts(df_agrupado, month_value, year_value, source_value, uf_value, log=print_log):
+	competencia = f'{year_value}{month_value}'
+	arquivos = month_files(month_value, year_value, source_value, uf_value, log)
+	if arquivos is None:
+		return False
+
+	with profiling.stage('fact_store', source=source_value, uf=uf_value, competencia=competencia):
+		get_fact_store().store_month(df_agrupado, source_value, uf_value, competencia, arquivos)
+	return True
+
+# Função que lê todas as partes da competência pelo cache colunar e agrupa os registros de todos os hospitais
+# por (CNES, PROC_REA), somando o 'VAL_TOT' e a frequência (as partes são lidas em paralelo e somadas)
+# arquivos é a lista de (parte, arquivo) da competência
+def aggregate_production(arquivos, month_value, year_value, source_value, uf_value):
+	def read_part(item):
+		part, arquivo = item
+		filtered = read_production(arquivo, source_value, uf_value, f'{year_value}{month_value}{part}', ['CNES', 'PROC_REA', 'VAL_TOT', 'QTD'])
+		return aggregate(filtered, ('CNES', 'PROC_REA'))
+
+	with profiling.stage('filter_groupby', source=source_value, uf=uf_value, competencia=f'{year_value}{month_value}'):
+		with ThreadPoolExecutor(max_workers=len(arquivos)) as executor:
+			partes = list(executor.map(read_part, arquivos))
+		return merge_aggregates(partes, ('CNES', 'PROC_REA'))
+
+# Função que retorna os fatos da competência (procedimentos agrupados por CNES e PROC_REA) dos CNES informados
+# Se o mês ainda não está no armazém, os arquivos são obtidos e lidos uma vez e os fatos de todos os hospitais são gravados
+def collect_facts(month_value, year_value, source_value, uf_value, cnes_values=None, log=print_log):
+	fatos = stored_facts(month_value, year_value, source_value, uf_value, cnes_values, log)
+	if fatos is not None:
+		log(f"Competência encontrada no armazém de fatos: {source_value} {uf_value} {month_value}/{year_value}")
+		return fatos
+
+	arquivos = collect_production_parts(month_value, year_value, source_value, uf_value, log)
+	log("Lendo arquivo DBF...")
+	fatos = aggregate_production(arquivos, month_value, year_value, source_value, uf_value)
+	store_facts(fatos, month_value, year_value, source_value, uf_value, log)
+
+	if cnes_values:
+		fatos = fatos[fatos['CNES'].isin(cnes_values)].reset_index(drop=True)
+	return fatos
+
+# Função que interpreta a correção monetária dos valores TUNEP/SUS 2008: um fator fixo ou o nome de um índice mensal,
+# lido de <sources_directory>/<nome>.csv (None, vazio ou 1 = sem correção)
+def collect_correction(correction, log=print_log):
+	try:
+		correcao = parse_correction(correction, sources_directory)
+	except FileNotFoundError as e:
+		log(str(e))
+		raise
+	if correcao is not None and correcao.index is not None:
+		log(f"Série do índice {correcao.index.name} carregada até {format_month(correcao.index.last)}.")
+	return correcao
+
+# Função que retorna o fator de correção de cada unidade (fonte, UF, ano, mês), calculados de uma só vez
+def correction_factors(correcao, units):
+	if correcao is None:
+		return {unit: 1 for unit in units}
+	fatores = correcao.factors({f'{year_value}{month_value}' for source_value, uf_value, year_value, month_value in units})
+	return {unit: fatores[f'{unit[2]}{unit[3]}'] for unit in units}
+
+# Função que monta a tabela da planilha a partir dos fatos do hospital na competência
+# (factor é o fator de correção dos valores TUNEP/SUS 2008 até a competência)
+def build_report(fatos, sigtap, month_value, year_value, cnes_value, source_value, uf_value, log=print_log, factor=1):
+	log("Aplicando filtros...")
+
+	df_agrupado = fatos[fatos['CNES'] == cnes_value][['PROC_REA', 'VAL_TOT', 'FREQ']].reset_index(drop=True)
+	df_agrupado['CNES'] = cnes_value
+
+	# Acrescentar os valores SIGTAP/TUNEP e os totais derivados
+	with profiling.stage('enrichment', competencia=f'{year_value}{month_value}'):
+		df_agrupado = enrich(df_agrupado, sigtap, month_value, year_value, source_value, factor)
+	df_agrupado.columns = report_headers(month_value, year_value)
+
+	return df_agrupado
+
+# Função que retorna o final dos nomes dos arquivos gerados: o timestamp atual e um identificador aleatório,
+# para que pedidos simultâneos do serviço local com os mesmos parâmetros não gravem o mesmo arquivo
+def output_suffix():
+	return f'{int(time.time())}-{uuid.uuid4().hex[:8]}'
+
+# Função para exportar a tabela para uma planilha do Excel (ou para CSV/Parquet, conforme output_format)
+def export_report(df_agrupado, month_value, year_value, cnes_value, log=print_log, output_format='xlsx'):
+	log("Exportando dados para Planilha do Excel..." if output_format == 'xlsx' else f"Exportando dados para {output_format.upper()}...")
+
+	# Obter o timestamp atual (com o identificador do arquivo)
+	timestamp = output_suffix()
+	nome_arquivo = f'{cnes_value}-{year_value}-{month_value}-{timestamp}'
+	caminho_base = os.path.join(output_directory, nome_arquivo)
+
+	# Exportar o resultado para Excel com formatação de moeda
+	with profiling.stage('export', format=output_format):
+		caminho_planilha = write_report(caminho_base, {'Resultados': df_agrupado}, output_format)[0]
+
+	log(f"Planilha exportada com sucesso em \"{caminho_planilha}\".")
+
+	return caminho_planilha
+
+# Função que executa todo o processo (SIGTAP, TUNEP, SIH/SIA e planilha) e retorna o caminho da planilha
+# correction é a correção monetária dos valores TUNEP/SUS 2008 (fator fixo ou nome do índice, ver collect_correction)
+def generate_report(month_value, year_value, cnes_value, source_value, uf_value='MG', log=print_log, output_format='xlsx', correction=None):
+	# Marcar o tempo inicial
+	start_time = time.time()
+	first_start_time = start_time
+
+	ensure_directories()
+
+	# A correção é interpretada antes dos downloads, para que um índice inválido não espere pelo processamento
+	correcao = collect_correction(correction, log)
+
+	# Obter os fatos do mês (do armazém ou baixando e lendo o arquivo SIH/SIA) em segundo plano enquanto o SIGTAP
+	# é coletado (as mensagens do download são exibidas depois, na etapa de coleta SIH/SIA)
+	mensagens_producao = []
+	executor = ThreadPoolExecutor(max_workers=1)
+	producao = executor.submit(collect_facts, month_value, year_value, source_value, uf_value, [cnes_value], mensagens_producao.append)
+	executor.shutdown(wait=False)
+
+	################################################################################
+	# COLETA DE DADOS SIGTAP ATUAL E TUNEP
+	################################################################################
+
+	log(f"\n\nCOLETA DE DADOS - SIGTAP {month_value}/{year_value}\n\n")
+
+	sigtap = collect_sigtap(month_value, year_value, log)
+
+	# Calcular o tempo total
+	elapsed_time = time.time() - start_time
+	log(f"Processo concluído em {elapsed_time:.2f} segundos.")
+
+	################################################################################
+	# COLETA DE DADOS SIH/SIA
+	################################################################################
+
+	log("\n\nCOLETA DE DADOS - " + source_value + "\n\n")
+
+	# Marcar o tempo inicial
+	start_time = time.time()
+
+	try:
+		fatos = producao.result()
+	finally:
+		for mensagem in mensagens_producao:
+			log(mensagem)
+
+	# Calcular o tempo total
+	elapsed_time = time.time() - start_time
+	log(f"Processo concluído em {elapsed_time:.2f} segundos.")
+
+	################################################################################
+	# GERAÇÃO DA PLANILHA
+	################################################################################
+
+	log("\n\nGERAÇÃO DA PLANILHA\n\n")
+
+	# Marcar o tempo inicial
+	start_time = time.time()
+
+	factor = 1
+	if correcao is not None:
+		factor = correcao.factor(month_value, year_value)
+		log(correcao.describe(month_value, year_value))
+
+	df_agrupado = build_report(fatos, sigtap, month_value, year_value, cnes_value, source_value, uf_value, log, factor)
+	caminho_planilha = export_report(df_agrupado, month_value, year_value, cnes_value, log, output_format)
+
+	# Marcar o tempo final
+	end_time = time.time()
+
+	# Calcular o tempo dessa tarefa
+	elapsed_time = end_time - start_time
+	log(f"Processo concluído em {elapsed_time:.2f} segundos.")
+
+	# Calcular o tempo total
+	elapsed_time = end_time - first_start_time
+	log(f"\nToda a operação foi concluída em {elapsed_time:.2f} segundos.\n")
+
+	enforce_disk_budget(log)
+
+	return caminho_planilha
@@ -0,0 +1,206 @@
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+	import resource
+except ImportError:
+	# Windows: o pico de memória (RSS) não é registrado
+	resource = None
+
+# Registro da execução atual (None = instrumentação desligada)
+current = None
+
+# Nos processos filhos: registrar as etapas para devolvê-las ao processo principal
+worker_enabled = False
+
+# Contadores registrados em cada etapa
+counters = ('rows_read', 'rows_kept', 'bytes_downloaded')
+
+# Função que retorna o pico de memória (RSS) do processo até agora, em bytes
+def peak_rss():
+	if resource is None:
+		return None
+	pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# No Linux o valor vem em KB; no macOS, em bytes
+	return pico if sys.platform == 'darwin' else pico * 1024
+
+# Classe com o registro das etapas de uma execução (tempo, CPU, memória e contadores de cada etapa)
+class RunReport:
+	def __init__(self, profile=False, trace_memory=False):
+		self.profile = profile
+		self.trace_memory = trace_memory
+		self.stages = []
+		self.local = threading.local()
+		self.lock = threading.Lock()
+		self.profiler = None
+		self.started_at = None
+		self.inicio = None
+
+	# Função para iniciar a execução (e o cProfile/tracemalloc, quando pedidos)
+	def start(self):
+		self.started_at = time.time()
+		self.inicio = (time.perf_counter(), time.process_time())
+		if self.trace_memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+		if self.profile:
+			self.profiler = cProfile.Profile()
+			self.profiler.enable()
+
+	# Função para encerrar a execução
+	def stop(self):
+		if self.profiler:
+			self.profiler.disable()
+		self.wall_time = time.perf_counter() - self.inicio[0]
+		self.cpu_time = time.process_time() - self.inicio[1]
+		if self.trace_memory and tracemalloc.is_tracing():
+			self.traced_peak = tracemalloc.get_traced_memory()[1]
+			tracemalloc.stop()
+
+	# Função que retorna as etapas abertas na thread atual (cada thread tem a sua pilha de etapas)
+	def abertas(self):
+		if not hasattr(self.local, 'abertas'):
+			self.local.abertas = []
+		return self.local.abertas
+
+	# Função para medir uma etapa; os contadores somados durante a etapa (add) ficam no seu registro
+	@contextmanager
+	def stage(self, name, **labels):
+		etapa = {'stage': name, **labels, 'pid': os.getpid()}
+		for contador in counters:
+			etapa[contador] = 0
+
+		# Etapas dentro de outra (por exemplo, dbf_read dentro de filter_groupby) indicam a etapa externa
+		abertas = self.abertas()
+		etapa['parent'] = abertas[-1]['stage'] if abertas else None
+		abertas.append(etapa)
+		if self.trace_memory and tracemalloc.is_tracing():
+			tracemalloc.reset_peak()
+
+		inicio = time.perf_counter()
+		inicio_cpu = time.process_time()
+		try:
+			yield etapa
+		finally:
+			etapa['wall_time'] = time.perf_counter() - inicio
+			etapa['cpu_time'] = time.process_time() - inicio_cpu
+			etapa['peak_rss'] = peak_rss()
+			if self.trace_memory and tracemalloc.is_tracing():
+				etapa['traced_peak'] = tracemalloc.get_traced_memory()[1]
+			abertas.remove(etapa)
+			with self.lock:
+				self.stages.append(etapa)
+
+	# Função para somar um contador na etapa aberta mais recente da thread atual
+	def add(self, contador, valor):
+		abertas = self.abertas()
+		if abertas:
+			abertas[-1][contador] += valor
+
+	# Função para acrescentar etapas registradas em outro processo
+	def merge(self, etapas):
+		with self.lock:
+			self.stages.extend(etapas)
+
+	# Função que retorna os totais de cada etapa (soma das ocorrências)
+	def totals(self):
+		totais = {}
+		for etapa in self.stages:
+			total = totais.setdefault(etapa['stage'], {'count': 0, 'wall_time': 0.0, 'cpu_time': 0.0, **{contador: 0 for contador in counters}})
+			total['count'] += 1
+			for chave in ('wall_time', 'cpu_time') + counters:
+				total[chave] += etapa[chave]
+		return totais
+
+	# Função que retorna o relatório da execução em um dicionário (pronto para JSON)
+	def to_dict(self):
+		relatorio = {
+			'started_at': self.started_at,
+			'wall_time': getattr(self, 'wall_time', None),
+			'cpu_time': getattr(self, 'cpu_time', None),
+			'peak_rss': peak_rss(),
+			'pid': os.getpid(),
+			'stages': self.stages,
+			'totals': self.totals()
+		}
+		if self.trace_memory:
+			relatorio['traced_peak'] = getattr(self, 'traced_peak', None)
+		return relatorio
+
+	# Função para gravar o relatório em JSON (e, com profile, o cProfile em <caminho>.prof e um resumo em <caminho>.txt)
+	def write(self, caminho):
+		diretorio = os.path.dirname(caminho)
+		if diretorio:
+			os.makedirs(diretorio, exist_ok=True)
+
+		with open(caminho, 'w', encoding='utf-8') as f:
+			json.dump(self.to_dict(), f, indent=2)
+
+		if self.profiler:
+			base = os.path.splitext(caminho)[0]
+			self.profiler.dump_stats(base + '.prof')
+			resumo = io.StringIO()
+			pstats.Stats(self.profiler, stream=resumo).sort_stats('cumulative').print_stats(40)
+			with open(base + '.txt', 'w', encoding='utf-8') as f:
+				f.write(resumo.getvalue())
+
+# Função para iniciar o registro de uma execução
+def start_run(profile=False, trace_memory=False):
+	global current
+	current = RunReport(profile, trace_memory)
+	current.start()
+	return current
+
+# Função para encerrar o registro da execução atual, gravando o relatório se um caminho for informado
+def finish_run(caminho=None):
+	global current
+	relatorio = current
+	current = None
+	if relatorio is None:
+		return None
+
+	relatorio.stop()
+	if caminho:
+		relatorio.write(caminho)
+	return relatorio
+
+# Função para medir uma etapa da execução atual (sem efeito quando a instrumentação está desligada)
+@contextmanager
+def stage(name, **labels):
+	if current is None:
+		yield {}
+		return
+	with current.stage(name, **labels) as etapa:
+		yield etapa
+
+# Função para somar um contador na etapa atual
+def add(contador, valor):
+	if current is not None:
+		current.add(contador, valor)
+
+# Função usada nos processos filhos: registra as etapas de uma tarefa e as devolve em uma lista
+# (no processo principal, as etapas vão direto para a execução atual e a lista fica vazia)
+@contextmanager
+def worker_stages():
+	global current
+	if current is not None or not worker_enabled:
+		yield []
+		return
+
+	current = RunReport()
+	try:
+		yield current.stages
+	finally:
+		current = None
+
+# Função para acrescentar à execução atual as etapas devolvidas por um processo filho
+def merge(etapas):
+	if current is not None and etapas:
+		current.merge(etapas)
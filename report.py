@@ -0,0 +1,287 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from schema import to_cents, to_reais, compact_codes
+
+# Formatos usados nas colunas da planilha
+column_formats = {
+	'texto': {'align': 'left', 'valign': 'vcenter', 'text_wrap': True},
+	'texto_centro': {'align': 'center', 'valign': 'vcenter', 'text_wrap': True},
+	'moeda': {'num_format': 'R$ #,##0.00', 'align': 'right', 'valign': 'vcenter', 'text_wrap': True},
+	'inteiro': {'num_format': '0', 'align': 'center', 'valign': 'vcenter', 'text_wrap': True}
+}
+
+# Formato do cabeçalho da planilha
+header_format_padrao = {
+	'bold': True,
+	'align': 'center',
+	'valign': 'bottom',
+	'text_wrap': True,
+	'bg_color': '#DCE6F1',
+	'border': 1,
+	'border_color': 'black'
+}
+
+# Colunas da planilha (nome, largura, formato), na ordem em que são exportadas
+report_schema = [
+	('CNES', 8, 'texto_centro'),
+	('COD_TUNEP', 40, 'texto_centro'),
+	('PROC_REA', 13, 'texto_centro'),
+	('NOME', 70, 'texto'),
+	('DATA', 20, 'texto_centro'),
+	('VAL_TOT', 20, 'moeda'),
+	('FREQ', 20, 'inteiro'),
+	('SIGTAP', 20, 'moeda'),
+	('SIGTAP_ORIGEM', 20, 'moeda'),
+	('SIGTAP_ORIGEM_MEDIA', 20, 'moeda'),
+	('TUNEP', 20, 'moeda'),
+	('TUNEP_MEDIA', 20, 'moeda'),
+	('DIF_TUNEP_SUS', 20, 'moeda'),
+	('TUNEP_SUS_TOTAL', 20, 'moeda'),
+	('DIF_TUNEP_SUS_MEDIA', 20, 'moeda'),
+	('TUNEP_SUS_TOTAL_MEDIA', 20, 'moeda'),
+	('DIF_TUNEP_SIGTAP', 20, 'moeda'),
+	('VALOR_TOTAL_TUNEP', 20, 'moeda'),
+	('DIF_TUNEP_SIGTAP_MEDIA', 20, 'moeda'),
+	('VALOR_TOTAL', 20, 'moeda'),
+	('VALOR_UNIT_IVR', 20, 'moeda'),
+	('IVR', 20, 'moeda'),
+	('IVR_SIGTAP_MES', 20, 'moeda'),
+	('VALOR_UNIT_IVR', 20, 'moeda'),
+	('METADE_SIGTAP_MES', 20, 'moeda'),
+	('IVR_TABWIN_MES', 20, 'moeda'),
+	('BD_SUS', 20, 'texto_centro')
+]
+
+# Colunas da planilha, na ordem em que são exportadas
+report_columns = [coluna for coluna, largura, formato in report_schema]
+
+# Colunas de valores, calculadas em centavos e convertidas para reais apenas na tabela final
+money_columns = list(dict.fromkeys(coluna for coluna, largura, formato in report_schema if formato == 'moeda'))
+
+# Colunas do resumo por CNES (nome, largura, formato)
+summary_schema = [
+	('POSICAO', 10, 'inteiro'),
+	('CNES', 10, 'texto_centro'),
+	('PROCEDIMENTOS', 16, 'inteiro'),
+	('FREQ', 20, 'inteiro'),
+	('VAL_TOT', 20, 'moeda'),
+	('TUNEP_SUS_TOTAL', 20, 'moeda'),
+	('VALOR_TOTAL_TUNEP', 20, 'moeda'),
+	('IVR_TABWIN_MES', 20, 'moeda')
+]
+
+# Colunas do resumo por CNES
+summary_columns = [coluna for coluna, largura, formato in summary_schema]
+
+# Colunas dos totais por CNES lidos do armazém de fatos (nome, largura, formato)
+totals_schema = [
+	('BD_SUS', 10, 'texto_centro'),
+	('CNES', 10, 'texto_centro'),
+	('DATA', 20, 'texto_centro'),
+	('PROCEDIMENTOS', 16, 'inteiro'),
+	('FREQ', 20, 'inteiro'),
+	('VAL_TOT', 20, 'moeda')
+]
+
+# Colunas com valores TUNEP/SUS 2008, multiplicadas pelo fator de correção monetária
+corrected_columns = ['SIGTAP_ORIGEM', 'SIGTAP_ORIGEM_MEDIA', 'TUNEP', 'TUNEP_MEDIA', 'DIF_TUNEP_SUS', 'DIF_TUNEP_SUS_MEDIA']
+
+# Formatos de saída disponíveis
+output_formats = ('xlsx', 'csv', 'parquet')
+
+# Função para agrupar os registros filtrados por procedimento, somando o 'VAL_TOT' e contando a frequência
+# Os códigos são agrupados como categorias e os valores somados em centavos (int64), sem erro de arredondamento
+def aggregate(filtered, keys=('PROC_REA',)):
+	# Códigos como categorias ('PROC_REA' completado com zeros, uma vez por código distinto)
+	filtered = compact_codes(filtered, keys)
+	filtered['VAL_TOT'] = to_cents(filtered['VAL_TOT'])
+
+	# No SIA, a frequência é a soma das quantidades aprovadas (QTD); no SIH, cada registro é uma AIH
+	if 'QTD' in filtered:
+		filtered['QTD'] = filtered['QTD'].fillna(0).astype('int64')
+	return filtered.groupby(list(keys), observed=True).agg(
+		VAL_TOT=('VAL_TOT', 'sum'),
+		FREQ=('QTD', 'sum') if 'QTD' in filtered else ('PROC_REA', 'size')
+	).reset_index()
+
+# Função para somar as tabelas agrupadas das partes de um mês (arquivos a, b, c dos estados maiores)
+def merge_aggregates(partes, keys=('PROC_REA',)):
+	if len(partes) == 1:
+		return partes[0]
+
+	# As categorias de cada parte são diferentes: os códigos são refeitos sobre as partes juntas
+	juntas = compact_codes(pd.concat(partes, ignore_index=True), keys)
+	return juntas.groupby(list(keys), observed=True).agg(
+		VAL_TOT=('VAL_TOT', 'sum'),
+		FREQ=('FREQ', 'sum')
+	).reset_index()
+
+# Função para acrescentar aos procedimentos agrupados os valores SIGTAP/TUNEP e calcular os totais derivados
+# A junção usa a posição de cada código na tabela SIGTAP, calculada uma vez por código distinto; os valores
+# (VAL_TOT e SIGTAP/TUNEP) chegam e são calculados em centavos, e convertidos para reais apenas ao final
+# Com fator de correção (factor), os valores TUNEP/SUS 2008 são corrigidos até a competência antes dos totais
+def enrich(df_agrupado, sigtap, month_value, year_value, source_value, factor=1):
+	df_agrupado = compact_codes(df_agrupado.reset_index(drop=True), ['PROC_REA'])
+	codigos = df_agrupado['PROC_REA'].cat
+	posicao = np.append(pd.Index(sigtap['PROC_REA']).get_indexer(codigos.categories), -1)[codigos.codes.to_numpy()]
+
+	# Posições -1 (procedimentos que não existem no SIGTAP da competência) ficam com valores ausentes
+	valores = sigtap.drop(columns='PROC_REA').reindex(posicao).reset_index(drop=True)
+	df_agrupado = pd.concat([df_agrupado, valores], axis=1)
+
+	df_agrupado['DATA'] = f"{month_value}/{year_value}"
+	df_agrupado['BD_SUS'] = source_value
+
+	# Procedimentos que não existem no SIGTAP da competência
+	df_agrupado['NOME'] = df_agrupado['NOME'].fillna('-')
+	df_agrupado['SIGTAP'] = df_agrupado['SIGTAP'].fillna(0)
+	df_agrupado['COD_TUNEP'] = df_agrupado['COD_TUNEP'].fillna('')
+
+	# Correção monetária: as diferenças para o SIGTAP da competência são refeitas com a TUNEP corrigida
+	# (diferenças negativas ficam ausentes, como no cálculo da tabela SIGTAP)
+	if factor != 1:
+		for coluna in corrected_columns:
+			df_agrupado[coluna] = df_agrupado[coluna] * factor
+		df_agrupado['DIF_TUNEP_SIGTAP'] = (df_agrupado['TUNEP'] - df_agrupado['SIGTAP']).where(lambda diferenca: diferenca >= 0)
+		df_agrupado['DIF_TUNEP_SIGTAP_MEDIA'] = (df_agrupado['TUNEP_MEDIA'] - df_agrupado['SIGTAP']).where(lambda diferenca: diferenca >= 0)
+
+	df_agrupado['TUNEP_SUS_TOTAL'] = df_agrupado['FREQ'] * df_agrupado['DIF_TUNEP_SUS']
+	df_agrupado['TUNEP_SUS_TOTAL_MEDIA'] = df_agrupado['FREQ'] * df_agrupado['DIF_TUNEP_SUS_MEDIA']
+	df_agrupado['VALOR_TOTAL_TUNEP'] = df_agrupado['FREQ'] * df_agrupado['DIF_TUNEP_SIGTAP']
+	df_agrupado['VALOR_TOTAL'] = df_agrupado['FREQ'] * df_agrupado['DIF_TUNEP_SIGTAP_MEDIA']
+
+	df_agrupado['IVR_SIGTAP_MES'] = df_agrupado['FREQ'] * df_agrupado['IVR']
+	df_agrupado['VALOR_UNIT_IVR'] = df_agrupado['VAL_TOT'] + df_agrupado['VAL_TOT'] / 2
+	df_agrupado['METADE_SIGTAP_MES'] = df_agrupado['VAL_TOT'] / 2
+	df_agrupado['IVR_TABWIN_MES'] = df_agrupado['METADE_SIGTAP_MES'] * df_agrupado['FREQ']
+
+	for coluna in money_columns:
+		df_agrupado[coluna] = to_reais(df_agrupado[coluna].astype(float))
+
+	df_agrupado = df_agrupado[report_columns].copy()
+	df_agrupado['FREQ'] = df_agrupado['FREQ'].astype(int)
+
+	return df_agrupado
+
+# Função para montar os títulos das colunas da planilha
+# (sem mês/ano, os títulos se referem genericamente ao mês de referência de cada linha)
+def report_headers(month_value=None, year_value=None):
+	if month_value and year_value:
+		referencia = f"{month_value}/{year_value}"
+		source_header_name = f"Valor aprovado / realizado  no mês de referência do TABWIN{referencia}"
+		sigtap_header_name = f"Valor unitário SIGTAP-SUS {referencia} no mês de referência"
+	else:
+		referencia = "no mês de referência"
+		source_header_name = "Valor aprovado / realizado  no mês de referência do TABWIN"
+		sigtap_header_name = "Valor unitário SIGTAP-SUS no mês de referência"
+
+	dif_tunep_sigtap_header_name = f"Diferença TUNEP - SIGTAP SUS {referencia}"
+	dif_tunep_sigtap_media_header_name = f"Dif. Méd. TUNEP 2008 e SIGTAP {referencia}"
+
+	valor_total_header_name = f"VALOR TOTAL - Dif. Méd TUNEP 2008 - SIGTAP {referencia}"
+
+	return ['CNES', 'Código de origem da TUNEP', 'Código do Procedimento', 'Nome do Procedimento', 'Data/Mês de Referência', source_header_name, 'Frequência / Quantidade aprovada', sigtap_header_name, "Valor unitário SIGTAP-SUS 2008", "Média do valor unitário SIGTAP-SUS 2008", "Valor unitário TUNEP 2008", "Média do valor unitário TUNEP 2008", "Diferença da TUNEP - SIGTAP-SUS 2008", "Valor Total TUNEP (Dif. TUNEP 2008 - SIGTAP-SUS 2008)", "Diferença Média TUNEP 2008 - Média SIGTAP-SUS 2008", "Valor Total TUNEP (Dif. Méd. TUNEP 2008 - Média SIGTAP-SUS 2008)", dif_tunep_sigtap_header_name, "VR TOTAL TUNEP (Diferença TUNEP 2008 - SIGTAP-SUS no mês de referência)", dif_tunep_sigtap_media_header_name, valor_total_header_name, "Valor unitário que deveria ser pago aplicando o IVR = SITAP-SUS mês de referência + 50% do SIGTAP-SUS no mês de referência", "50% do SIGTAP-SUS no mês de referência = IVR", "IVR com base no SIGTAP-SUS no mês de referência", "Valor unitário que deveria ser pago aplicando o IVR = Valor aprovado / realizado  no mês de referência do TABWIN  + 50% do Valor aprovado / realizado  no mês de referência do TABWIN", "50% do SIGTAP-SUS no mês de referência = IVR", "IVR com base no TABWIN no mês de referência",
+	"Fonte SUS"]
+
+# Função para montar o resumo por CNES a partir das tabelas de vários hospitais (totais das diferenças TUNEP),
+# do maior para o menor VALOR_TOTAL_TUNEP
+def summarize_cnes(df_agrupado):
+	resumo = df_agrupado.groupby('CNES', observed=True).agg(
+		PROCEDIMENTOS=('PROC_REA', 'nunique'),
+		FREQ=('FREQ', 'sum'),
+		VAL_TOT=('VAL_TOT', 'sum'),
+		TUNEP_SUS_TOTAL=('TUNEP_SUS_TOTAL', 'sum'),
+		VALOR_TOTAL_TUNEP=('VALOR_TOTAL_TUNEP', 'sum'),
+		IVR_TABWIN_MES=('IVR_TABWIN_MES', 'sum')
+	).reset_index()
+
+	resumo = resumo.sort_values(['VALOR_TOTAL_TUNEP', 'CNES'], ascending=[False, True]).reset_index(drop=True)
+	resumo.insert(0, 'POSICAO', range(1, len(resumo) + 1))
+
+	return resumo[summary_columns]
+
+# Função para montar os títulos das colunas do resumo por CNES
+def summary_headers():
+	titulos = dict(zip(report_columns, report_headers()))
+	return ['Posição', 'CNES', 'Procedimentos distintos', titulos['FREQ'], titulos['VAL_TOT'], titulos['TUNEP_SUS_TOTAL'], titulos['VALOR_TOTAL_TUNEP'], titulos['IVR_TABWIN_MES']]
+
+# Função para montar os títulos das colunas dos totais por CNES (DATA apenas nos totais por competência)
+def totals_headers(columns):
+	titulos = dict(zip(report_columns, report_headers()))
+	titulos['PROCEDIMENTOS'] = 'Procedimentos distintos'
+	return [titulos[coluna] for coluna in columns]
+
+# Função para formatar uma aba da planilha (larguras e formatos das colunas a partir do schema)
+def format_sheet(workbook, worksheet, columns, schema=report_schema):
+	header_format = workbook.add_format(header_format_padrao)
+	formatos = {nome: workbook.add_format(formato) for nome, formato in column_formats.items()}
+
+	for col_num, (coluna, largura, formato) in enumerate(schema):
+		worksheet.set_column(col_num, col_num, largura, formatos[formato])
+
+	for col_num, value in enumerate(columns):
+		worksheet.write(0, col_num, value, header_format)
+
+# Função para escrever as linhas de uma tabela na aba, uma de cada vez (células vazias para NaN)
+def write_rows(worksheet, df):
+	for row_num, valores in enumerate(df.itertuples(index=False, name=None), start=1):
+		for col_num, valor in enumerate(valores):
+			if isinstance(valor, str):
+				worksheet.write_string(row_num, col_num, valor)
+			elif valor is not None and not (isinstance(valor, float) and math.isnan(valor)):
+				worksheet.write_number(row_num, col_num, valor)
+
+# Função para exportar uma ou mais abas para uma planilha do Excel com formatação de moeda
+# (as linhas são gravadas em sequência no modo constant_memory, sem manter a planilha inteira em memória)
+# schemas indica o schema de cada aba (padrão: colunas do relatório)
+def write_workbook(caminho_planilha, sheets, schemas=None):
+	diretorio = os.path.dirname(caminho_planilha)
+	if diretorio and not os.path.exists(diretorio):
+		os.makedirs(diretorio)
+
+	workbook = xlsxwriter.Workbook(caminho_planilha, {'constant_memory': True})
+	try:
+		for sheet_name, df in sheets.items():
+			worksheet = workbook.add_worksheet(sheet_name)
+			format_sheet(workbook, worksheet, df.columns.values, (schemas or {}).get(sheet_name, report_schema))
+			write_rows(worksheet, df)
+	finally:
+		workbook.close()
+
+	return caminho_planilha
+
+# Função para tornar únicos os títulos repetidos (exigido pelo Parquet)
+def unique_columns(columns):
+	vistos = {}
+	unicos = []
+	for coluna in columns:
+		vistos[coluna] = vistos.get(coluna, 0) + 1
+		unicos.append(coluna if vistos[coluna] == 1 else f"{coluna} ({vistos[coluna]})")
+	return unicos
+
+# Função para exportar as abas no formato pedido: planilha do Excel (xlsx), CSV com separador e
+# decimais no padrão brasileiro (csv) ou Parquet (parquet)
+# Nos formatos csv e parquet, cada aba é gravada em um arquivo; retorna os caminhos gravados
+def write_report(caminho_base, sheets, output_format='xlsx', schemas=None):
+	if output_format not in output_formats:
+		raise ValueError(f"Formato de saída inválido: {output_format}")
+
+	if output_format == 'xlsx':
+		return [write_workbook(caminho_base + '.xlsx', sheets, schemas)]
+
+	diretorio = os.path.dirname(caminho_base)
+	if diretorio and not os.path.exists(diretorio):
+		os.makedirs(diretorio)
+
+	caminhos = []
+	for sheet_name, df in sheets.items():
+		caminho = f'{caminho_base}.{output_format}' if len(sheets) == 1 else f'{caminho_base}-{sheet_name}.{output_format}'
+		if output_format == 'csv':
+			df.to_csv(caminho, sep=';', decimal=',', index=False, encoding='utf-8-sig')
+		else:
+			df.set_axis(unique_columns(df.columns), axis=1).to_parquet(caminho, index=False)
+		caminhos.append(caminho)
+	return caminhos
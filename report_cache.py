@@ -0,0 +1,56 @@
+import os
+import json
+import hashlib
+import pyarrow.feather as feather
+
+# Diretório padrão das partes de relatório já calculadas (dentro do diretório de dados)
+store_directory_padrao = os.path.join('data', 'reports')
+
+# Versão do cálculo das partes (alterar invalida todas as partes salvas)
+store_version = 2
+
+# Função para montar a chave de uma parte a partir dos hashes do conteúdo das entradas
+# (ZIP SIGTAP, TUNEP.csv, arquivo SIH/SIA do mês e quaisquer outras entradas do cálculo)
+def input_key(**hashes):
+	conteudo = json.dumps({'version': store_version, **hashes}, sort_keys=True)
+	return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+# Função para montar o caminho base (sem extensão) da parte de um CNES em uma competência
+def part_path(cnes, source, uf, competencia, directory=store_directory_padrao):
+	return os.path.join(directory, source, uf, cnes, f'{cnes}_{source}_{uf}_{competencia}')
+
+# Função para ler uma parte salva, retornando None se não existir ou se foi calculada com outras entradas
+def read_part(key, cnes, source, uf, competencia, directory=store_directory_padrao):
+	base = part_path(cnes, source, uf, competencia, directory)
+	if not os.path.exists(base + '.feather') or not os.path.exists(base + '.json'):
+		return None
+
+	try:
+		with open(base + '.json', 'r', encoding='utf-8') as f:
+			meta = json.load(f)
+	except (OSError, ValueError):
+		return None
+
+	if meta.get('key') != key:
+		return None
+
+	df = feather.read_feather(base + '.feather')
+	df.columns = meta['columns']
+	return df
+
+# Função para salvar a parte de um CNES em uma competência
+# (as colunas são gravadas por posição, já que a tabela da planilha tem títulos repetidos)
+def write_part(df, key, cnes, source, uf, competencia, directory=store_directory_padrao):
+	base = part_path(cnes, source, uf, competencia, directory)
+	os.makedirs(os.path.dirname(base), exist_ok=True)
+
+	# A chave antiga é removida antes, para que uma gravação interrompida não deixe uma parte válida com outro conteúdo
+	if os.path.exists(base + '.json'):
+		os.remove(base + '.json')
+
+	temporario = base + '.feather.tmp'
+	feather.write_feather(df.set_axis([str(i) for i in range(len(df.columns))], axis=1).reset_index(drop=True), temporario, compression='uncompressed')
+	os.replace(temporario, base + '.feather')
+
+	with open(base + '.json', 'w', encoding='utf-8') as f:
+		json.dump({'key': key, 'columns': list(df.columns)}, f)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+# Tamanho dos códigos de procedimento (completados com zeros à esquerda)
+proc_rea_width = 10
+
+# Colunas de códigos, guardadas como categorias (um código inteiro por registro e cada texto uma única vez),
+# com o tamanho usado para completá-los com zeros à esquerda
+code_columns = {'CNES': None, 'PROC_REA': proc_rea_width}
+
+# Função que converte valores em reais para centavos inteiros (int64); valores ausentes contam como zero
+# (os valores dos arquivos têm no máximo duas casas decimais, então o arredondamento é exato)
+def to_cents(valores):
+	centavos = np.rint(np.asarray(valores, dtype=np.float64) * 100)
+	return np.nan_to_num(centavos).astype(np.int64)
+
+# Função que converte valores em centavos para reais, usada apenas na saída (planilha, CSV, Parquet)
+def to_reais(centavos):
+	return centavos / 100
+
+# Função que converte uma coluna de códigos em categorias ordenadas pelo texto
+# (agrupar pelos códigos inteiros dá a mesma ordem que agrupar pelos textos)
+# A conversão para texto e o preenchimento com zeros (width) são feitos uma vez por código distinto
+def as_codes(valores, width=None):
+	if not isinstance(valores.dtype, pd.CategoricalDtype):
+		valores = valores.astype('category')
+
+	textos = valores.cat.categories.astype(str)
+	if width:
+		textos = textos.str.zfill(width).str.strip()
+	posicao, unicos = pd.factorize(textos, sort=True)
+
+	# Códigos ausentes (-1) continuam ausentes
+	codigos = np.append(posicao, -1)[valores.cat.codes.to_numpy()]
+	return pd.Series(pd.Categorical.from_codes(codigos, unicos), index=valores.index, name=valores.name)
+
+# Função que converte as colunas de códigos presentes na tabela em categorias
+def compact_codes(df, columns=None):
+	for coluna, width in code_columns.items():
+		if coluna in df and (columns is None or coluna in columns):
+			df[coluna] = as_codes(df[coluna], width)
+	return df
@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import queue
+import uuid
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import sigtap
+import pipeline
+from pipeline import ensure_directories, generate_report
+from batch import run_batch
+from state_report import run_state_report
+from totals_report import run_totals
+from report import output_formats
+from downloads import file_types, ufs
+from manifest import KIND_COLUMNAR, KIND_SIGTAP_INDEX
+
+# Endereço padrão do serviço (apenas na própria máquina)
+host_padrao = '127.0.0.1'
+port_padrao = 8765
+
+# Quantidade padrão de pedidos executados ao mesmo tempo e de pedidos aguardando na fila
+workers_padrao = 2
+queue_size_padrao = 32
+
+# Quantidade padrão de competências SIGTAP mantidas em memória
+sigtap_cache_padrao = 24
+
+# Quantidade de pedidos concluídos mantidos para consulta
+finished_jobs_padrao = 500
+
+# Mensagens de progresso guardadas por pedido
+log_lines_padrao = 200
+
+# Tipos dos arquivos gerados
+content_types = {
+	'.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+	'.csv': 'text/csv; charset=utf-8',
+	'.parquet': 'application/octet-stream'
+}
+
+# Função para ler um mês (01-12) de um pedido
+def job_month(valor):
+	mes = str(valor).zfill(2)
+	if not mes.isdigit() or not 1 <= int(mes) <= 12:
+		raise ValueError(f"Mês inválido: {valor}")
+	return mes
+
+# Função para ler um ano (AAAA) de um pedido
+def job_year(valor):
+	ano = str(valor).strip()
+	if not (len(ano) == 4 and ano.isdigit()):
+		raise ValueError(f"Ano inválido: {valor}")
+	return ano
+
+# Função para ler um CNES (apenas dígitos) de um pedido
+def job_cnes(valor):
+	cnes = str(valor).strip()
+	if not cnes.isdigit():
+		raise ValueError(f"CNES inválido: {valor}")
+	return cnes
+
+# Função para ler uma fonte (SIH, SIA) de um pedido
+def job_source(valor):
+	if not isinstance(valor, str) or valor not in file_types:
+		raise ValueError(f"Fonte inválida: {valor}")
+	return valor
+
+# Função para ler uma UF de um pedido
+def job_uf(valor):
+	if valor not in ufs:
+		raise ValueError(f"UF inválida: {valor}")
+	return valor
+
+# Função para ler uma lista (lista JSON ou texto separado por vírgulas) de um pedido
+def job_list(valor):
+	if isinstance(valor, str):
+		valor = valor.split(',')
+	if not isinstance(valor, list):
+		raise ValueError(f"Lista inválida: {valor}")
+	return [str(item).strip() for item in valor if str(item).strip()]
+
+# Função que transforma o corpo de um pedido na função a executar, seus argumentos e as unidades (fonte, UF, ano, mês) usadas
+# (a fonte, a UF, o ano e os CNES entram nos nomes dos arquivos e nos caminhos do FTP e são conferidos antes de o pedido entrar na fila)
+def parse_job(dados):
+	if not isinstance(dados, dict):
+		raise ValueError("O pedido deve ser um objeto JSON.")
+
+	comando = dados.get('command', 'report')
+	output_format = dados.get('format', 'xlsx')
+	if output_format not in output_formats:
+		raise ValueError(f"Formato inválido: {output_format}")
+	uf_value = job_uf(dados.get('uf', 'MG'))
+
+	# Correção monetária dos valores TUNEP/SUS 2008 (fator fixo ou nome do índice); não se aplica aos totais
+	correction = dados.get('correction')
+
+	try:
+		if comando == 'report':
+			month_value = job_month(dados['month'])
+			args = {'month_value': month_value, 'year_value': job_year(dados['year']), 'cnes_value': job_cnes(dados['cnes']), 'source_value': job_source(dados.get('source', 'SIH')), 'uf_value': uf_value, 'output_format': output_format, 'correction': correction}
+			units = [(args['source_value'], uf_value, args['year_value'], month_value)]
+			return generate_report, args, units
+
+		months = [job_month(mes) for mes in job_list(dados['months'])]
+		years = [job_year(ano) for ano in job_list(dados['years'])]
+		sources = [job_source(fonte) for fonte in job_list(dados.get('sources', ['SIH']))]
+		units = [(source_value, uf_value, year_value, month_value) for source_value in sources for year_value in years for month_value in months]
+
+		if comando == 'batch':
+			args = {'cnes_values': [job_cnes(cnes) for cnes in job_list(dados['cnes'])], 'months': months, 'years': years, 'sources': sources, 'uf_value': uf_value, 'single_workbook': bool(dados.get('single_workbook')), 'incremental': bool(dados.get('incremental')), 'output_format': output_format, 'correction': correction}
+			return run_batch, args, units
+
+		if comando == 'state':
+			args = {'months': months, 'years': years, 'sources': sources, 'uf_value': uf_value, 'detail_cnes': [job_cnes(cnes) for cnes in job_list(dados.get('detail_cnes', []))], 'output_format': output_format, 'correction': correction}
+			return run_state_report, args, units
+
+		if comando == 'totals':
+			args = {'months': months, 'years': years, 'sources': sources, 'uf_value': uf_value, 'cnes_values': [job_cnes(cnes) for cnes in job_list(dados.get('cnes', []))], 'by_month': bool(dados.get('by_month')), 'output_format': output_format}
+			return run_totals, args, units
+	except KeyError as e:
+		raise ValueError(f"Campo obrigatório ausente: {e.args[0]}")
+
+	raise ValueError(f"Comando inválido: {comando}")
+
+# Classe com o estado de um pedido (aguardando, executando, concluído ou erro)
+class Job:
+	def __init__(self, funcao, args, units, log_lines=log_lines_padrao):
+		self.id = uuid.uuid4().hex
+		self.funcao = funcao
+		self.args = args
+		self.units = units
+		self.status = 'queued'
+		self.paths = []
+		self.error = None
+		self.log = []
+		self.log_lines = log_lines
+		self.created_at = time.time()
+		self.started_at = None
+		self.finished_at = None
+		self.done = threading.Event()
+
+	# Função de progresso do pedido (guarda apenas as últimas mensagens)
+	def add_log(self, message):
+		self.log.append(message)
+		del self.log[:-self.log_lines]
+
+	# Função que retorna o estado do pedido em um dicionário (pronto para JSON)
+	def to_dict(self):
+		return {
+			'id': self.id,
+			'status': self.status,
+			'paths': self.paths,
+			'files': [f'/jobs/{self.id}/files/{i}' for i in range(len(self.paths))],
+			'error': self.error,
+			'created_at': self.created_at,
+			'started_at': self.started_at,
+			'finished_at': self.finished_at,
+			'log': self.log
+		}
+
+# Classe do serviço local: mantém as tabelas SIGTAP/TUNEP em memória entre os pedidos e executa
+# os pedidos de uma fila limitada com um grupo de threads
+class ReportServer:
+	def __init__(self, host=host_padrao, port=port_padrao, workers=workers_padrao, queue_size=queue_size_padrao, sigtap_cache=sigtap_cache_padrao, log=pipeline.print_log):
+		self.fila = queue.Queue(maxsize=queue_size)
+		self.jobs = OrderedDict()
+		self.lock = threading.Lock()
+		self.workers = workers
+		self.log = log
+
+		# Uma trava por competência, usada enquanto os arquivos do mês ainda não foram baixados e convertidos
+		self.travas = {}
+
+		sigtap.memory_cache_size = sigtap_cache
+		self.httpd = ThreadingHTTPServer((host, port), RequestHandler)
+		self.httpd.report_server = self
+
+	# Função para colocar um pedido na fila (retorna None se a fila está cheia)
+	def submit(self, dados):
+		funcao, args, units = parse_job(dados)
+		job = Job(funcao, args, units)
+		try:
+			self.fila.put_nowait(job)
+		except queue.Full:
+			return None
+
+		with self.lock:
+			self.jobs[job.id] = job
+			# Descartar os pedidos concluídos mais antigos
+			concluidos = [chave for chave, item in self.jobs.items() if item.done.is_set()]
+			for chave in concluidos[:max(0, len(concluidos) - finished_jobs_padrao)]:
+				del self.jobs[chave]
+		return job
+
+	# Função que retorna um pedido pelo identificador
+	def get(self, job_id):
+		with self.lock:
+			return self.jobs.get(job_id)
+
+	# Função que retorna as travas das competências do pedido que ainda não estão prontas
+	# (sem índice SIGTAP ou sem o mês, ou suas partes, no cache colunar), para que dois pedidos não baixem nem convertam o mesmo arquivo
+	def cold_locks(self, job):
+		manifest = pipeline.get_manifest()
+		competencias = set()
+		for source_value, uf_value, year_value, month_value in job.units:
+			competencia = f'{year_value}{month_value}'
+			if not manifest.get(KIND_SIGTAP_INDEX, competencia=competencia) or not manifest.entries(KIND_COLUMNAR, source_value, uf_value, competencia):
+				competencias.add(competencia)
+
+		with self.lock:
+			return [self.travas.setdefault(competencia, threading.Lock()) for competencia in sorted(competencias)]
+
+	# Função executada por cada thread: retira os pedidos da fila e os executa
+	def work(self):
+		while True:
+			job = self.fila.get()
+			job.status = 'running'
+			job.started_at = time.time()
+
+			travas = self.cold_locks(job)
+			for trava in travas:
+				trava.acquire()
+			try:
+				resultado = job.funcao(**job.args, log=job.add_log)
+				job.paths = resultado if isinstance(resultado, list) else [resultado]
+				job.status = 'done'
+			except Exception as e:
+				job.error = str(e)
+				job.status = 'error'
+			finally:
+				for trava in reversed(travas):
+					trava.release()
+				job.finished_at = time.time()
+				job.done.set()
+				self.fila.task_done()
+
+			self.log(f"Pedido {job.id} {job.status} em {job.finished_at - job.started_at:.2f} segundos.")
+
+	# Função que retorna o estado do serviço (fila, pedidos e tabelas em memória)
+	def status(self):
+		with self.lock:
+			contagem = {}
+			for job in self.jobs.values():
+				contagem[job.status] = contagem.get(job.status, 0) + 1
+		return {
+			'queued': self.fila.qsize(),
+			'queue_size': self.fila.maxsize,
+			'workers': self.workers,
+			'jobs': contagem,
+			'sigtap_cached': len(sigtap.memory_cache),
+			'sigtap_cache_size': sigtap.memory_cache_size
+		}
+
+	# Função para iniciar as threads e atender aos pedidos até o processo ser interrompido
+	def serve_forever(self):
+		ensure_directories()
+		for _ in range(self.workers):
+			threading.Thread(target=self.work, daemon=True).start()
+
+		host, port = self.httpd.server_address[:2]
+		self.log(f"Serviço disponível em http://{host}:{port}/ ({self.workers} pedidos em paralelo, fila de {self.fila.maxsize}).")
+		try:
+			self.httpd.serve_forever()
+		finally:
+			self.httpd.server_close()
+
+	# Função para encerrar o atendimento
+	def shutdown(self):
+		self.httpd.shutdown()
+
+# Classe que atende às requisições HTTP:
+#   POST /jobs                  coloca um pedido na fila (com ?wait=1, responde apenas ao final)
+#   GET  /jobs/<id>             estado do pedido, caminhos dos arquivos e mensagens de progresso
+#   GET  /jobs/<id>/files/<n>   conteúdo do n-ésimo arquivo gerado
+#   GET  /status                estado do serviço
+class RequestHandler(BaseHTTPRequestHandler):
+	# Função para responder com um JSON
+	def send_json(self, codigo, dados):
+		corpo = json.dumps(dados).encode('utf-8')
+		self.send_response(codigo)
+		self.send_header('Content-Type', 'application/json; charset=utf-8')
+		self.send_header('Content-Length', str(len(corpo)))
+		self.end_headers()
+		self.wfile.write(corpo)
+
+	# Função para responder com o conteúdo de um arquivo, em blocos
+	def send_file(self, caminho):
+		self.send_response(200)
+		self.send_header('Content-Type', content_types.get(os.path.splitext(caminho)[1], 'application/octet-stream'))
+		self.send_header('Content-Length', str(os.path.getsize(caminho)))
+		self.send_header('Content-Disposition', f'attachment; filename="{os.path.basename(caminho)}"')
+		self.end_headers()
+		with open(caminho, 'rb') as f:
+			while True:
+				bloco = f.read(1024 * 1024)
+				if not bloco:
+					break
+				self.wfile.write(bloco)
+
+	def do_POST(self):
+		url = urlparse(self.path)
+		if url.path.rstrip('/') != '/jobs':
+			return self.send_json(404, {'error': "Caminho não encontrado."})
+
+		try:
+			tamanho = int(self.headers.get('Content-Length') or 0)
+			dados = json.loads(self.rfile.read(tamanho) or b'{}')
+			job = self.server.report_server.submit(dados)
+		except ValueError as e:
+			return self.send_json(400, {'error': str(e)})
+
+		if job is None:
+			return self.send_json(503, {'error': "Fila de pedidos cheia. Tente novamente mais tarde."})
+
+		if parse_qs(url.query).get('wait', ['0'])[0] not in ('', '0'):
+			job.done.wait()
+			return self.send_json(200 if job.status == 'done' else 500, job.to_dict())
+
+		self.send_json(202, job.to_dict())
+
+	def do_GET(self):
+		partes = [parte for parte in urlparse(self.path).path.split('/') if parte]
+
+		if partes == ['status']:
+			return self.send_json(200, self.server.report_server.status())
+
+		if len(partes) >= 2 and partes[0] == 'jobs':
+			job = self.server.report_server.get(partes[1])
+			if job is None:
+				return self.send_json(404, {'error': "Pedido não encontrado."})
+			if len(partes) == 2:
+				return self.send_json(200, job.to_dict())
+			if len(partes) == 4 and partes[2] == 'files' and partes[3].isdigit() and int(partes[3]) < len(job.paths):
+				return self.send_file(job.paths[int(partes[3])])
+
+		self.send_json(404, {'error': "Caminho não encontrado."})
+
+	# As requisições não são registradas na saída (as mensagens dos pedidos já informam o andamento)
+	def log_message(self, format, *args):
+		pass
@@ -0,0 +1,413 @@
+import os
+import json
+import zipfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import profiling
+from schema import to_cents
+from manifest import KIND_SIGTAP_INDEX
+
+# Diretório padrão dos índices SIGTAP (dentro do diretório de dados)
+index_directory_padrao = os.path.join('data', 'sigtap')
+
+# Versão do formato do índice (alterar invalida todos os índices existentes)
+index_version = 2
+
+# Quantidade de tabelas SIGTAP (já cruzadas com a TUNEP) mantidas em memória (0 = nenhuma; usado pelo serviço local)
+memory_cache_size = 0
+
+# Tabelas mantidas em memória, da usada há mais tempo para a mais recente, e a TUNEP lida por último
+memory_cache = OrderedDict()
+memory_tunep = {}
+memory_lock = threading.RLock()
+
+# Trava da leitura da TUNEP (separada, para não bloquear as consultas às tabelas já em memória)
+tunep_lock = threading.Lock()
+
+# Travas de montagem de cada chave (competência e assinaturas dos arquivos) ainda não mantida em memória
+key_locks = {}
+
+# Separador usado para guardar listas de textos em um único bloco de bytes
+separador = '\x00'
+
+# Campos numéricos resultantes do cruzamento com a TUNEP, em centavos (NaN quando o procedimento não tem o valor;
+# as médias de várias origens podem ter frações de centavo)
+campos_tunep = ['sus', 'sus_media', 'tunep', 'tunep_media', 'dif_tunep_sus', 'dif_tunep_sus_media', 'dif_tunep_sigtap', 'dif_tunep_sigtap_media']
+
+# Codificação dos arquivos da Tabela Unificada
+encoding_padrao = 'ISO-8859-1'
+
+# Colunas lidas de tb_procedimento.txt e rl_procedimento_sia_sih.txt (nome no layout -> nome usado aqui)
+procedimento_columns = {'CO_PROCEDIMENTO': 'code', 'NO_PROCEDIMENTO': 'name', 'VL_SH': 'servico_hospitalar', 'VL_SP': 'servico_profissional'}
+origem_columns = {'CO_PROCEDIMENTO': 'code', 'CO_PROCEDIMENTO_SIA_SIH': 'origem'}
+
+# Campos (nome, início, tamanho, tipo) usados quando o ZIP não traz o arquivo de layout da tabela
+# (posições usadas desde a primeira versão para o código, o nome, os valores e a origem)
+procedimento_fields = [
+	('code', 0, 10, 'VARCHAR2'),
+	('name', 10, 250, 'VARCHAR2'),
+	('servico_hospitalar', 282, 10, 'NUMBER'),
+	('servico_profissional', 303, 9, 'NUMBER')
+]
+origem_fields = [
+	('code', 0, 10, 'VARCHAR2'),
+	('origem', 10, 8, 'VARCHAR2')
+]
+
+# Função para ler os campos de uma tabela a partir do seu arquivo de layout (<tabela>_layout.txt),
+# no formato "Coluna,Tamanho,Inicio,Fim,Tipo" com posições começando em 1
+def layout_fields(zip_ref, tabela):
+	fields = []
+	linhas = zip_ref.read(f'{tabela}_layout.txt').decode(encoding_padrao).splitlines()
+	for linha in linhas[1:]:
+		partes = [parte.strip() for parte in linha.split(',')]
+		if len(partes) < 5 or not partes[0]:
+			continue
+		fields.append((partes[0], int(partes[2]) - 1, int(partes[1]), partes[4].upper()))
+	return fields
+
+# Função que retorna os campos das colunas pedidas (nome no layout -> nome usado aqui) de uma tabela do ZIP,
+# a partir do seu arquivo de layout; sem o arquivo de layout, usa os campos padrão informados
+def table_fields(zip_ref, tabela, columns, padrao):
+	if f'{tabela}_layout.txt' not in zip_ref.namelist():
+		return padrao
+
+	fields = [(columns[nome], inicio, tamanho, tipo) for nome, inicio, tamanho, tipo in layout_fields(zip_ref, tabela) if nome in columns]
+	ausentes = set(columns.values()) - {campo[0] for campo in fields}
+	if ausentes:
+		raise ValueError(f"Layout de {tabela} sem as colunas {', '.join(nome for nome, coluna in columns.items() if coluna in ausentes)}.")
+	return fields
+
+# Função para montar o dtype estruturado (um campo de bytes por coluna) de registros com o tamanho informado
+def record_dtype(fields, tamanho_registro):
+	return np.dtype({
+		'names': [nome for nome, inicio, tamanho, tipo in fields],
+		'formats': [f'S{tamanho}' for nome, inicio, tamanho, tipo in fields],
+		'offsets': [inicio for nome, inicio, tamanho, tipo in fields],
+		'itemsize': tamanho_registro
+	})
+
+# Função para ler um arquivo de largura fixa do ZIP de uma só vez, separando as colunas
+# sem percorrer as linhas (o conteúdo é visto como um array de registros)
+def read_fixed_width(zip_ref, membro, fields):
+	largura = max([inicio + tamanho for nome, inicio, tamanho, tipo in fields], default=1)
+	if membro not in zip_ref.namelist():
+		return np.zeros(0, dtype=record_dtype(fields, largura))
+
+	buffer = zip_ref.read(membro)
+	if buffer and not buffer.endswith(b'\n'):
+		buffer += b'\n'
+
+	# Todas as linhas com o mesmo tamanho (cada registro termina com '\n' na mesma posição e não há outras quebras
+	# de linha): o buffer é usado diretamente
+	tamanho_registro = buffer.find(b'\n') + 1
+	if tamanho_registro > largura and len(buffer) % tamanho_registro == 0 and buffer.count(b'\n') == len(buffer) // tamanho_registro:
+		if (np.frombuffer(buffer, dtype=np.uint8)[tamanho_registro - 1::tamanho_registro] == ord('\n')).all():
+			return np.frombuffer(buffer, dtype=record_dtype(fields, tamanho_registro))
+
+	# Linhas com tamanhos diferentes: cada linha é completada até a largura necessária
+	linhas = [linha for linha in buffer.splitlines() if linha.strip()]
+	largura = max([largura] + [len(linha) for linha in linhas])
+	return np.array(linhas, dtype=f'S{largura}').view(record_dtype(fields, largura))
+
+# Função para converter as colunas de bytes em textos (sem espaços nas pontas) ou números
+def decode_records(registros, fields, encoding=encoding_padrao):
+	colunas = {}
+	for nome, inicio, tamanho, tipo in fields:
+		texto = np.char.strip(np.char.decode(registros[nome], encoding))
+		if tipo == 'NUMBER':
+			vazio = texto == ''
+			if vazio.any():
+				numeros = np.where(vazio, '0', texto).astype(np.float64)
+				numeros[vazio] = np.nan
+			else:
+				numeros = texto.astype(np.int64)
+			colunas[nome] = numeros
+		else:
+			colunas[nome] = texto.astype(object)
+	return colunas
+
+# Função para ler qualquer tabela da Tabela Unificada (procedimentos, CIDs, compatibilidades etc.)
+# usando o arquivo de layout que a acompanha no ZIP
+def read_table(local_zip, tabela, columns=None, encoding=encoding_padrao):
+	with zipfile.ZipFile(local_zip, 'r') as zip_ref:
+		fields = layout_fields(zip_ref, tabela)
+		if columns is not None:
+			fields = [campo for campo in fields if campo[0] in columns]
+		registros = read_fixed_width(zip_ref, f'{tabela}.txt', fields)
+
+	return pd.DataFrame(decode_records(registros, fields, encoding), columns=[campo[0] for campo in fields])
+
+# Função para ler os procedimentos e as origens SIA/SIH do ZIP da Tabela Unificada
+# Retorna duas tabelas: procedimentos (code, name, value, ivr, valores em centavos), ordenada por código,
+# e origens (code, origem), com uma linha por par procedimento/origem na ordem do arquivo
+def parse_sigtap_zip(local_zip):
+	# As posições das colunas vêm dos arquivos de layout do próprio ZIP
+	with zipfile.ZipFile(local_zip, 'r') as zip_ref:
+		fields = table_fields(zip_ref, 'tb_procedimento', procedimento_columns, procedimento_fields)
+		colunas = decode_records(read_fixed_width(zip_ref, 'tb_procedimento.txt', fields), fields)
+		fields = table_fields(zip_ref, 'rl_procedimento_sia_sih', origem_columns, origem_fields)
+		origens = pd.DataFrame(decode_records(read_fixed_width(zip_ref, 'rl_procedimento_sia_sih.txt', fields), fields), columns=['code', 'origem'])
+
+	# Valores em centavos no arquivo, mantidos em centavos inteiros (valores vazios contam como zero)
+	value = np.nan_to_num(colunas['servico_hospitalar']) + np.nan_to_num(colunas['servico_profissional'])
+
+	# Um código repetido no arquivo fica com a última linha
+	procedimentos = pd.DataFrame({'code': colunas['code'], 'name': colunas['name'], 'value': value}, columns=['code', 'name', 'value'])
+	procedimentos = procedimentos.drop_duplicates('code', keep='last').sort_values('code').reset_index(drop=True)
+	procedimentos['value'] = procedimentos['value'].astype(np.int64)
+	procedimentos['ivr'] = procedimentos['value'] * 0.5
+
+	# Origens vazias são descartadas, assim como as de procedimentos que não estão em tb_procedimento
+	origens['origem'] = origens['origem'].str.split()
+	origens = origens.explode('origem').dropna(subset=['origem'])
+	origens = origens[origens['code'].isin(procedimentos['code'])].reset_index(drop=True)
+
+	return procedimentos, origens
+
+# Função para carregar o arquivo TUNEP.csv em uma tabela (code, sus, tunep), com os valores em centavos
+def load_tunep(local_tunep):
+	tunep = pd.read_csv(local_tunep, sep=';', encoding=encoding_padrao, header=None, skiprows=1, usecols=[0, 1, 2], names=['code', 'sus', 'tunep'], dtype=str, keep_default_na=False)
+
+	tunep['code'] = tunep['code'].str.strip()
+	for coluna in ('sus', 'tunep'):
+		tunep[coluna] = to_cents(tunep[coluna].str.replace('.', '', regex=False).str.replace(',', '.', regex=False).astype(np.float64))
+
+	# Um código repetido no arquivo fica com a última linha
+	return tunep.drop_duplicates('code', keep='last').reset_index(drop=True)
+
+# Função para cruzar cada procedimento SIGTAP com os códigos de origem da TUNEP
+# Contagens e somas por procedimento são feitas de uma vez sobre a tabela longa de origens
+# (bincount acumula na ordem das linhas, como a soma feita origem a origem)
+def join_tunep(procedimentos, origens, tunep):
+	total = len(procedimentos)
+	value = procedimentos['value'].to_numpy()
+
+	# Origens que existem na TUNEP e posição do procedimento de cada uma
+	posicao_tunep = pd.Index(tunep['code']).get_indexer(origens['origem'])
+	encontradas = posicao_tunep >= 0
+	posicao_tunep = posicao_tunep[encontradas]
+	posicao_codigo = pd.Index(procedimentos['code']).get_indexer(origens['code'][encontradas])
+
+	count = np.bincount(posicao_codigo, minlength=total)
+	soma_tunep = np.bincount(posicao_codigo, weights=tunep['tunep'].to_numpy()[posicao_tunep], minlength=total)
+	soma_sus = np.bincount(posicao_codigo, weights=tunep['sus'].to_numpy()[posicao_tunep], minlength=total)
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		media_tunep = soma_tunep / count
+		media_sus = soma_sus / count
+
+	dif_tunep_sus = np.abs(media_tunep - media_sus)
+	dif_tunep_sigtap = media_tunep - value
+	dif_tunep_sigtap[dif_tunep_sigtap < 0] = np.nan
+
+	# Valores de uma única origem e médias de várias origens ficam em colunas separadas
+	com_valor = soma_tunep > 0
+	unica = com_valor & (count == 1)
+	varias = com_valor & (count > 1)
+
+	sigtap = procedimentos.copy()
+	sigtap['sus'] = np.where(unica, media_sus, np.nan)
+	sigtap['sus_media'] = np.where(varias, media_sus, np.nan)
+	sigtap['tunep'] = np.where(unica, media_tunep, np.nan)
+	sigtap['tunep_media'] = np.where(varias, media_tunep, np.nan)
+	sigtap['dif_tunep_sus'] = np.where(unica, dif_tunep_sus, np.nan)
+	sigtap['dif_tunep_sus_media'] = np.where(varias, dif_tunep_sus, np.nan)
+	sigtap['dif_tunep_sigtap'] = np.where(unica, dif_tunep_sigtap, np.nan)
+	sigtap['dif_tunep_sigtap_media'] = np.where(varias, dif_tunep_sigtap, np.nan)
+
+	# Códigos TUNEP encontrados, na ordem das origens
+	cod_tunep = np.full(total, '', dtype=object)
+	if len(posicao_codigo):
+		codigos = pd.Series(origens['origem'].to_numpy()[encontradas]).groupby(posicao_codigo, sort=False).agg(' - '.join)
+		cod_tunep[codigos.index.to_numpy()] = codigos.to_numpy()
+	sigtap['cod_tunep'] = cod_tunep
+
+	return sigtap
+
+# Função para juntar uma lista de textos em um único bloco de bytes
+def pack_strings(textos):
+	return np.frombuffer(separador.join(textos).encode('utf-8'), dtype=np.uint8)
+
+# Função para separar um bloco de bytes de volta em uma lista de textos
+# (um bloco vazio pode ser uma lista vazia ou um único texto vazio: quantidade, quando informada, decide)
+def unpack_strings(bloco, quantidade=None):
+	if quantidade == 0:
+		return []
+	return bloco.tobytes().decode('utf-8').split(separador)
+
+# Função para converter a tabela SIGTAP (já cruzada com a TUNEP) e as origens em arrays compactos
+def build_index(sigtap, origens):
+	codes = sigtap['code'].to_numpy(dtype=str)
+
+	# Nomes únicos, referenciados por posição
+	name_index, nomes_unicos = pd.factorize(sigtap['name'])
+
+	# Origens guardadas como lista plana (agrupada por procedimento, na ordem do arquivo) + deslocamentos
+	posicao_codigo = pd.Index(sigtap['code']).get_indexer(origens['code'])
+	origin_flat = origens['origem'].to_numpy(dtype=str)[np.argsort(posicao_codigo, kind='stable')]
+	origin_offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+	origin_offsets[1:] = np.cumsum(np.bincount(posicao_codigo, minlength=len(codes)))
+
+	index = {
+		'codes': codes if len(codes) else np.array([], dtype='U1'),
+		'value': sigtap['value'].to_numpy(dtype=np.int64),
+		'ivr': sigtap['ivr'].to_numpy(dtype=np.float64),
+		'names': pack_strings(list(nomes_unicos)),
+		'name_index': name_index.astype(np.int32),
+		'origin_offsets': origin_offsets,
+		'origin_flat': origin_flat if len(origin_flat) else np.array([], dtype='U1'),
+		'cod_tunep': pack_strings(list(sigtap['cod_tunep']))
+	}
+
+	for campo in campos_tunep:
+		index[campo] = sigtap[campo].to_numpy(dtype=np.float64)
+
+	return index
+
+# Colunas da tabela SIGTAP usada na planilha, a partir dos campos do índice
+frame_columns = {
+	'sus': 'SIGTAP_ORIGEM',
+	'sus_media': 'SIGTAP_ORIGEM_MEDIA',
+	'tunep': 'TUNEP',
+	'tunep_media': 'TUNEP_MEDIA',
+	'dif_tunep_sus': 'DIF_TUNEP_SUS',
+	'dif_tunep_sus_media': 'DIF_TUNEP_SUS_MEDIA',
+	'dif_tunep_sigtap': 'DIF_TUNEP_SIGTAP',
+	'dif_tunep_sigtap_media': 'DIF_TUNEP_SIGTAP_MEDIA'
+}
+
+# Função para converter o índice em uma tabela tipada (um procedimento por linha), pronta para a junção
+# com os procedimentos agrupados; valores em centavos, ausentes como NaN
+def index_to_frame(index):
+	nomes = np.array(unpack_strings(index['names']), dtype=object)
+
+	sigtap = pd.DataFrame({
+		'PROC_REA': index['codes'].astype(object),
+		'NOME': nomes[index['name_index']],
+		'SIGTAP': index['value'],
+		'IVR': index['ivr'],
+		'COD_TUNEP': np.array(unpack_strings(index['cod_tunep'], len(index['codes'])), dtype=object)
+	})
+
+	for campo, coluna in frame_columns.items():
+		sigtap[coluna] = index[campo]
+
+	return sigtap
+
+# Função para obter a assinatura (tamanho e data de modificação) de um arquivo
+def file_signature(arquivo):
+	info = os.stat(arquivo)
+	return {'name': os.path.basename(arquivo), 'size': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+# Função para montar o caminho base (sem extensão) do índice de uma competência
+def index_path(competencia, directory=index_directory_padrao):
+	return os.path.join(directory, f'sigtap_{competencia}')
+
+# Função para ler o índice salvo, retornando None se não existir ou estiver desatualizado
+def read_index(local_zip, local_tunep, competencia, directory=index_directory_padrao):
+	base = index_path(competencia, directory)
+	if not os.path.exists(base + '.npz') or not os.path.exists(base + '.json'):
+		return None
+
+	try:
+		with open(base + '.json', 'r', encoding='utf-8') as f:
+			meta = json.load(f)
+	except (OSError, ValueError):
+		return None
+
+	if meta.get('version') != index_version or meta.get('zip') != file_signature(local_zip) or meta.get('tunep') != file_signature(local_tunep):
+		return None
+
+	with np.load(base + '.npz', allow_pickle=False) as arquivo:
+		return {chave: arquivo[chave] for chave in arquivo.files}
+
+# Função para salvar o índice de uma competência
+def write_index(index, local_zip, local_tunep, competencia, directory=index_directory_padrao):
+	base = index_path(competencia, directory)
+	os.makedirs(directory, exist_ok=True)
+
+	temporario = base + '.tmp.npz'
+	np.savez(temporario, **index)
+	os.replace(temporario, base + '.npz')
+
+	meta = {
+		'version': index_version,
+		'zip': file_signature(local_zip),
+		'tunep': file_signature(local_tunep)
+	}
+	with open(base + '.json', 'w', encoding='utf-8') as f:
+		json.dump(meta, f)
+
+# Função que obtém o índice SIGTAP (com o cruzamento TUNEP) de uma competência,
+# montando-o a partir do ZIP apenas quando ainda não existe ou quando o ZIP/TUNEP mudou
+def load_sigtap_index(local_zip, local_tunep, competencia, directory=index_directory_padrao, manifest=None):
+	index = read_index(local_zip, local_tunep, competencia, directory)
+	if index is None:
+		with profiling.stage('sigtap_parse', competencia=competencia):
+			procedimentos, origens = parse_sigtap_zip(local_zip)
+			profiling.add('rows_read', len(procedimentos) + len(origens))
+
+		with profiling.stage('tunep_join', competencia=competencia):
+			tunep = cached_tunep(local_tunep)
+			profiling.add('rows_read', len(tunep))
+			index = build_index(join_tunep(procedimentos, origens, tunep), origens)
+			profiling.add('rows_kept', int(np.isfinite(index['tunep']).sum() + np.isfinite(index['tunep_media']).sum()))
+		write_index(index, local_zip, local_tunep, competencia, directory)
+		if manifest:
+			manifest.register(KIND_SIGTAP_INDEX, index_path(competencia, directory) + '.npz', competencia=competencia, parent=local_zip, with_hash=False)
+	return index
+
+# Função que retorna a TUNEP lida, reaproveitando a leitura anterior enquanto o arquivo não muda
+# (apenas com a memória habilitada)
+def cached_tunep(local_tunep):
+	if not memory_cache_size:
+		return load_tunep(local_tunep)
+
+	assinatura = (local_tunep, tuple(file_signature(local_tunep).values()))
+	with tunep_lock:
+		if memory_tunep.get('signature') != assinatura:
+			memory_tunep['tunep'] = load_tunep(local_tunep)
+			memory_tunep['signature'] = assinatura
+		return memory_tunep['tunep']
+
+# Função para esvaziar as tabelas mantidas em memória
+def clear_memory_cache():
+	with memory_lock:
+		memory_cache.clear()
+		memory_tunep.clear()
+		key_locks.clear()
+
+# Função que retorna a tabela SIGTAP de uma competência, usando o índice salvo
+# Com memory_cache_size, as tabelas usadas mais recentemente ficam em memória (a mais antiga é descartada)
+def load_sigtap(local_zip, local_tunep, competencia, directory=index_directory_padrao, manifest=None):
+	if not memory_cache_size:
+		return index_to_frame(load_sigtap_index(local_zip, local_tunep, competencia, directory, manifest))
+
+	# A chave inclui as assinaturas do ZIP e da TUNEP, para que uma alteração em um deles monte a tabela novamente
+	chave = (directory, competencia, tuple(file_signature(local_zip).values()), tuple(file_signature(local_tunep).values()))
+
+	with memory_lock:
+		sigtap = memory_cache.get(chave)
+		if sigtap is not None:
+			memory_cache.move_to_end(chave)
+			return sigtap
+		trava = key_locks.setdefault(chave, threading.Lock())
+
+	# A montagem fica fora da trava geral e dentro da trava da chave: pedidos simultâneos da mesma competência
+	# montam o índice uma única vez, e competências diferentes são montadas ao mesmo tempo
+	with trava:
+		with memory_lock:
+			sigtap = memory_cache.get(chave)
+		if sigtap is None:
+			sigtap = index_to_frame(load_sigtap_index(local_zip, local_tunep, competencia, directory, manifest))
+
+		with memory_lock:
+			memory_cache[chave] = sigtap
+			memory_cache.move_to_end(chave)
+			while len(memory_cache) > memory_cache_size:
+				memory_cache.popitem(last=False)
+			key_locks.pop(chave, None)
+		return sigtap
@@ -0,0 +1,77 @@
+import os
+import pandas as pd
+import pipeline
+import profiling
+from pipeline import print_log, ensure_directories, collect_sigtap, collect_correction, correction_factors
+from parallel import aggregate_stored_units
+from report import enrich, report_headers, summarize_cnes, summary_headers, summary_schema, write_report
+
+# Função que gera o relatório de todos os hospitais de uma UF, lendo cada arquivo mensal uma única vez:
+# uma aba "Resumo" com os totais das diferenças TUNEP por CNES (do maior para o menor) e, para os CNES
+# pedidos em detail_cnes, uma aba com os procedimentos de cada um
+# correction é a correção monetária dos valores TUNEP/SUS 2008 (fator fixo ou nome do índice, ver collect_correction)
+def run_state_report(months, years, sources, uf_value='MG', detail_cnes=None, log=print_log, workers=1, output_format='xlsx', correction=None):
+	ensure_directories()
+
+	correcao = collect_correction(correction, log)
+
+	units = [(source_value, uf_value, year_value, month_value) for source_value in sources for year_value in years for month_value in months]
+	fatores = correction_factors(correcao, units)
+
+	# Sem lista de CNES, cada arquivo mensal é agrupado por (CNES, PROC_REA) com todos os hospitais
+	# (os meses já gravados no armazém de fatos não são lidos novamente)
+	agregados = aggregate_stored_units(units, None, workers, log)
+
+	partes = []
+	competencias = set()
+	for unit, df_agrupado in agregados.items():
+		source_value, uf_value, year_value, month_value = unit
+		log(f"\n\nCOLETA DE DADOS - SIGTAP {month_value}/{year_value}\n\n")
+
+		# Competências sem Tabela Unificada são ignoradas
+		try:
+			sigtap = collect_sigtap(month_value, year_value, log)
+		except FileNotFoundError:
+			continue
+
+		if correcao is not None:
+			log(correcao.describe(month_value, year_value))
+
+		with profiling.stage('enrichment', source=source_value, uf=uf_value, competencia=f'{year_value}{month_value}'):
+			partes.append(enrich(df_agrupado, sigtap, month_value, year_value, source_value, fatores[unit]))
+		competencias.add((month_value, year_value))
+
+	if not partes:
+		raise FileNotFoundError(f"Nenhum arquivo encontrado para {uf_value}.")
+
+	detalhe = pd.concat(partes, ignore_index=True)
+
+	resumo = summarize_cnes(detalhe)
+	resumo.columns = summary_headers()
+	log(f"{len(resumo)} hospitais encontrados em {uf_value}.")
+
+	sheets = {'Resumo': resumo}
+	schemas = {'Resumo': summary_schema}
+
+	# Com uma única competência, os títulos das colunas trazem o mês/ano como na planilha individual
+	headers = report_headers(*next(iter(competencias))) if len(competencias) == 1 else report_headers()
+	for cnes_value in detail_cnes or []:
+		df = detalhe[detalhe['CNES'] == cnes_value]
+		if not len(df):
+			log(f"Nenhum registro encontrado para o CNES {cnes_value}.")
+			continue
+		df.columns = headers
+		sheets[cnes_value] = df
+
+	log("Exportando dados para Planilha do Excel..." if output_format == 'xlsx' else f"Exportando dados para {output_format.upper()}...")
+
+	timestamp = pipeline.output_suffix()
+	with profiling.stage('export', format=output_format):
+		caminhos = write_report(os.path.join(pipeline.output_directory, f'{uf_value}-hospitais-{timestamp}'), sheets, output_format, schemas)
+
+	for caminho_planilha in caminhos:
+		log(f"Planilha exportada com sucesso em \"{caminho_planilha}\".")
+
+	pipeline.enforce_disk_budget(log)
+
+	return caminhos
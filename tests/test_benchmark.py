@@ -0,0 +1,52 @@
+import os
+import sys
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+# Diretório do projeto (os módulos do recsus e dos benchmarks são importados a partir dele)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_directory)
+sys.path.insert(0, os.path.join(project_directory, 'benchmarks'))
+
+import pipeline
+import downloads
+import run as benchmark
+
+# Testes do benchmark com arquivos sintéticos: a execução completa não pode acessar a rede
+class BenchmarkTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.addCleanup(self.directory.cleanup)
+
+		# O benchmark altera os diretórios configurados nos módulos; restaurar ao final
+		for modulo, nomes in [(pipeline, ['database_directory', 'downloads_directory', 'sources_directory', 'output_directory', 'manifest', 'fact_store']), (downloads, ['listings_directory', 'listing_cache'])]:
+			for nome in nomes:
+				patch = mock.patch.object(modulo, nome, getattr(modulo, nome))
+				patch.start()
+				self.addCleanup(patch.stop)
+
+	# Função que executa o benchmark pequeno com os parâmetros informados
+	def run_benchmark(self, **params):
+		params = {'rows': 2000, 'cnes': 20, 'competencias': ['202408'], 'uf': 'MG', 'procedimentos': 200, 'seed': 0, **params}
+		return benchmark.run_benchmark(self.directory.name, params, repeat=2, output_format='csv', report_cnes=3)
+
+	def test_offline(self):
+		execucoes = self.run_benchmark()
+		self.assertEqual([execucao['run'] for execucao in execucoes], ['cold', 'warm'])
+		self.assertTrue(downloads.listings_directory.startswith(self.directory.name))
+
+	def test_offline_parts(self):
+		execucoes = self.run_benchmark(source='SIA', parts=2)
+		self.assertEqual(len(execucoes), 2)
+
+	def test_network_attempt(self):
+		# Uma tentativa de conexão durante a medição faz o benchmark falhar
+		with benchmark.no_network() as tentativas:
+			with self.assertRaises(OSError):
+				socket.create_connection(('192.0.2.1', 21), timeout=1)
+		self.assertEqual(tentativas, [('192.0.2.1', 21)])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,199 @@
+import os
+import sys
+import logging
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# Diretório do projeto (os módulos do recsus são importados a partir dele)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_directory)
+
+from download_manager import DownloadManager, partial_suffix
+
+# O servidor FTP local dos testes usa o pyftpdlib, que não faz parte das dependências do recsus
+try:
+	from pyftpdlib.authorizers import DummyAuthorizer
+	from pyftpdlib.handlers import FTPHandler
+	from pyftpdlib.servers import ThreadedFTPServer
+except ImportError:
+	FTPHandler = None
+
+if FTPHandler is not None:
+	# Sem um handler próprio, o pyftpdlib configura o log e imprime cada comando recebido
+	logging.getLogger('pyftpdlib').addHandler(logging.NullHandler())
+	logging.getLogger('pyftpdlib').setLevel(logging.WARNING)
+
+	# Handler que registra as conexões e os comandos recebidos e permite desativar o SIZE
+	# ou informar um tamanho diferente do arquivo
+	class RecordingHandler(FTPHandler):
+		connections = 0
+		commands = []
+		size_enabled = True
+		size_offset = 0
+		on_retr = None
+		lock = threading.Lock()
+
+		def on_connect(self):
+			with self.lock:
+				type(self).connections += 1
+
+		def pre_process_command(self, line, cmd, arg):
+			with self.lock:
+				self.commands.append((cmd, arg))
+			return super().pre_process_command(line, cmd, arg)
+
+		def ftp_SIZE(self, path):
+			if not self.size_enabled:
+				self.respond('502 Command not implemented.')
+			elif self.size_offset:
+				self.respond(f'213 {os.path.getsize(path) + self.size_offset}')
+			else:
+				super().ftp_SIZE(path)
+
+		def ftp_RETR(self, file):
+			if self.on_retr:
+				self.on_retr(file)
+			return super().ftp_RETR(file)
+
+# Testes do DownloadManager contra um servidor FTP local (sem acessar o FTP do DATASUS)
+@unittest.skipIf(FTPHandler is None, "pyftpdlib não instalado")
+class DownloadManagerTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.addCleanup(self.directory.cleanup)
+
+		# O pyftpdlib muda o diretório atual do processo ao atender o CWD; com sessões simultâneas ele pode ficar
+		# no diretório temporário do teste, removido ao final
+		self.addCleanup(os.chdir, os.getcwd())
+		self.remote = os.path.join(self.directory.name, 'remoto')
+		self.local = os.path.join(self.directory.name, 'local')
+		os.makedirs(os.path.join(self.remote, 'dados'))
+		os.makedirs(self.local)
+
+		# Handler próprio de cada teste (contadores e opções não passam de um teste para outro)
+		self.handler = type('Handler', (RecordingHandler,), {'connections': 0, 'commands': [], 'lock': threading.Lock()})
+		authorizer = DummyAuthorizer()
+		authorizer.add_anonymous(self.remote)
+		self.handler.authorizer = authorizer
+
+		self.server = ThreadedFTPServer(('127.0.0.1', 0), self.handler)
+		self.parar = threading.Event()
+		self.thread = threading.Thread(target=self.serve, daemon=True)
+		self.thread.start()
+
+		self.manager = DownloadManager(port=self.server.address[1], max_connections=2, timeout=10)
+		self.addCleanup(self.stop)
+
+	# Função que atende o servidor até o fim do teste
+	def serve(self):
+		while not self.parar.is_set():
+			self.server.serve_forever(timeout=0.05, blocking=False, handle_exit=False)
+		self.server.close_all()
+
+	# Função para encerrar as conexões do gerenciador e o servidor
+	def stop(self):
+		self.manager.close()
+		self.parar.set()
+		self.thread.join(10)
+
+	# Função para criar um arquivo no diretório remoto, retornando o conteúdo
+	def remote_file(self, nome, tamanho):
+		conteudo = bytes(range(256)) * (tamanho // 256) + bytes(tamanho % 256)
+		with open(os.path.join(self.remote, 'dados', nome), 'wb') as f:
+			f.write(conteudo)
+		return conteudo
+
+	# Função para baixar um arquivo do diretório remoto
+	def download(self, nome, directory=None):
+		return self.manager.download('127.0.0.1', '/dados', nome, os.path.join(directory or self.local, nome))
+
+	# Função para baixar vários arquivos ao mesmo tempo, uma thread por arquivo, como as partes de um mês no pipeline
+	def download_parallel(self, nomes, directory=None):
+		with ThreadPoolExecutor(max_workers=len(nomes)) as executor:
+			return list(executor.map(lambda nome: self.download(nome, directory), nomes))
+
+	# Função que retorna os argumentos recebidos pelo servidor em um comando
+	def arguments(self, comando):
+		return [arg for cmd, arg in self.handler.commands if cmd == comando]
+
+	def test_resume_partial(self):
+		conteudo = self.remote_file('RDMG2408.dbc', 300000)
+		with open(os.path.join(self.local, 'RDMG2408.dbc' + partial_suffix), 'wb') as f:
+			f.write(conteudo[:123456])
+
+		mensagens = []
+		local_path = self.manager.download('127.0.0.1', '/dados', 'RDMG2408.dbc', os.path.join(self.local, 'RDMG2408.dbc'), mensagens.append)
+		with open(local_path, 'rb') as f:
+			self.assertEqual(f.read(), conteudo)
+		self.assertEqual(self.arguments('REST'), ['123456'])
+		self.assertEqual(len(mensagens), 1)
+
+	def test_complete_partial(self):
+		# ".part" já completo (interrompido antes da renomeação): renomeado sem baixar de novo
+		conteudo = self.remote_file('RDMG2408.dbc', 5000)
+		with open(os.path.join(self.local, 'RDMG2408.dbc' + partial_suffix), 'wb') as f:
+			f.write(conteudo)
+
+		with open(self.download('RDMG2408.dbc'), 'rb') as f:
+			self.assertEqual(f.read(), conteudo)
+		self.assertEqual(self.arguments('RETR'), [])
+
+	def test_size_fallback_mlsd(self):
+		self.handler.size_enabled = False
+		conteudo = self.remote_file('RDMG2408.dbc', 70000)
+		with open(os.path.join(self.local, 'RDMG2408.dbc' + partial_suffix), 'wb') as f:
+			f.write(conteudo[:1000])
+
+		with open(self.download('RDMG2408.dbc'), 'rb') as f:
+			self.assertEqual(f.read(), conteudo)
+		self.assertEqual(len(self.arguments('SIZE')), 1)
+		self.assertEqual(len(self.arguments('MLSD')), 1)
+		self.assertEqual(self.arguments('REST'), ['1000'])
+
+	def test_size_mismatch(self):
+		self.handler.size_offset = 10
+		self.remote_file('RDMG2408.dbc', 5000)
+
+		with self.assertRaises(IOError):
+			self.download('RDMG2408.dbc')
+		self.assertFalse(os.path.exists(os.path.join(self.local, 'RDMG2408.dbc')))
+		self.assertEqual(os.path.getsize(os.path.join(self.local, 'RDMG2408.dbc' + partial_suffix)), 5000)
+
+	def test_atomic_rename(self):
+		# Durante a transferência existe apenas o ".part"; o nome final aparece já com o arquivo completo
+		conteudo = self.remote_file('RDMG2408.dbc', 200000)
+		local_path = os.path.join(self.local, 'RDMG2408.dbc')
+		durante = []
+		self.handler.on_retr = staticmethod(lambda file: durante.append((os.path.exists(local_path), os.path.exists(local_path + partial_suffix))))
+
+		self.assertEqual(self.download('RDMG2408.dbc'), local_path)
+		self.assertEqual(durante, [(False, True)])
+		self.assertFalse(os.path.exists(local_path + partial_suffix))
+		with open(local_path, 'rb') as f:
+			self.assertEqual(f.read(), conteudo)
+
+	def test_session_reuse(self):
+		nomes = [f'PAMG2408{parte}.dbc' for parte in 'abcdef']
+		conteudos = {nome: self.remote_file(nome, 20000 + i * 1000) for i, nome in enumerate(nomes)}
+
+		caminhos = self.download_parallel(nomes)
+		for nome, caminho in zip(nomes, caminhos):
+			with open(caminho, 'rb') as f:
+				self.assertEqual(f.read(), conteudos[nome])
+
+		# Mais threads que conexões: no máximo max_connections conexões, reutilizadas nos downloads seguintes
+		conexoes = self.handler.connections
+		self.assertLessEqual(conexoes, 2)
+		self.assertEqual(len(self.arguments('USER')), conexoes)
+
+		outro = os.path.join(self.directory.name, 'outro')
+		os.makedirs(outro)
+		self.download_parallel(nomes[:3], outro)
+		self.assertEqual(self.handler.connections, conexoes)
+		self.assertEqual(sorted(self.manager.list_directory('127.0.0.1', '/dados')), nomes)
+		self.assertEqual(self.handler.connections, conexoes)
+
+if __name__ == '__main__':
+	unittest.main()
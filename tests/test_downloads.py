@@ -0,0 +1,75 @@
+import os
+import sys
+import ftplib
+import tempfile
+import unittest
+from unittest import mock
+
+# Diretório do projeto (os módulos do recsus são importados a partir dele)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_directory)
+
+import downloads
+from listing_cache import ListingCache, RemoteListing
+
+# Gerenciador de downloads que falha em qualquer acesso ao FTP, registrando as tentativas
+class OfflineManager:
+	def __init__(self, erro):
+		self.erro = erro
+		self.calls = 0
+
+	def list_directory(self, host, remote_directory):
+		self.calls += 1
+		raise self.erro
+
+# Testes da busca das partes de uma competência (pasta de downloads, manifesto e listagem do FTP)
+class MonthPartsTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.addCleanup(self.directory.cleanup)
+		self.downloads = os.path.join(self.directory.name, 'downloads')
+		os.makedirs(self.downloads)
+
+		listings = os.path.join(self.directory.name, 'listings')
+		self.listings = ListingCache(listings)
+		patches = [
+			mock.patch.object(downloads, 'listings_directory', listings),
+			mock.patch.object(downloads, 'listing_cache', self.listings)
+		]
+		for patch in patches:
+			patch.start()
+			self.addCleanup(patch.stop)
+
+	# Função que retorna as partes de PA MG 08/2024 com o gerenciador informado
+	def parts(self, manager, log=None):
+		with mock.patch.object(downloads, 'manager', manager):
+			return downloads.resolve_month_parts('SIA', 'MG', '2024', '08', log or (lambda mensagem: None), self.downloads)
+
+	def test_local_parts_skip_ftp(self):
+		for nome in ['PAMG2408a.dbc', 'PAMG2408b.dbf', 'PAMG2409a.dbc']:
+			open(os.path.join(self.downloads, nome), 'wb').close()
+
+		manager = OfflineManager(OSError('sem rede'))
+		self.assertEqual(self.parts(manager), ['a', 'b'])
+		self.assertEqual(manager.calls, 0)
+
+	def test_local_parts_saved_listing(self):
+		# Listagem salva (mesmo vencida) completa as partes ainda não baixadas, sem consultar o servidor
+		open(os.path.join(self.downloads, 'PAMG2408a.dbc'), 'wb').close()
+		self.listings.write(downloads.dados_ftp_host, downloads.dados_remote_directory.format(source='SIA'), RemoteListing(['PAMG2408a.dbc', 'PAMG2408b.dbc', 'PAMG2408c.dbc', 'PAMG2409.dbc'], 0))
+
+		manager = OfflineManager(OSError('sem rede'))
+		self.assertEqual(self.parts(manager), ['a', 'b', 'c'])
+		self.assertEqual(manager.calls, 0)
+
+	def test_ftp_errors(self):
+		# Sem partes locais: erros de rede e de protocolo do FTP (550) não interrompem a execução
+		for erro in [OSError('sem rede'), ftplib.error_perm('550 Diretório não encontrado'), EOFError()]:
+			manager = OfflineManager(erro)
+			mensagens = []
+			self.assertEqual(self.parts(manager, mensagens.append), [])
+			self.assertEqual(manager.calls, 1)
+			self.assertEqual(len(mensagens), 1)
+
+if __name__ == '__main__':
+	unittest.main()
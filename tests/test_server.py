@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import threading
+import unittest
+import http.client
+from unittest import mock
+
+# Diretório do projeto (os módulos do recsus são importados a partir dele)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_directory)
+
+import sigtap
+from server import ReportServer, parse_job
+
+# Testes da validação dos pedidos do serviço local (os pedidos recusados não entram na fila)
+class ServerRequestTest(unittest.TestCase):
+	def setUp(self):
+		patch = mock.patch.object(sigtap, 'memory_cache_size', sigtap.memory_cache_size)
+		patch.start()
+		self.addCleanup(patch.stop)
+
+		# Apenas o atendimento HTTP, sem as threads que executam os pedidos
+		self.server = ReportServer(port=0, workers=0, log=lambda mensagem: None)
+		thread = threading.Thread(target=self.server.httpd.serve_forever, daemon=True)
+		thread.start()
+		self.addCleanup(self.server.httpd.server_close)
+		self.addCleanup(self.server.shutdown)
+
+	# Função que envia um pedido (corpo já em JSON) e retorna o código HTTP e a resposta
+	def post(self, corpo):
+		conexao = http.client.HTTPConnection(*self.server.httpd.server_address[:2], timeout=10)
+		self.addCleanup(conexao.close)
+		conexao.request('POST', '/jobs', body=corpo, headers={'Content-Type': 'application/json'})
+		resposta = conexao.getresponse()
+		return resposta.status, json.loads(resposta.read())
+
+	def test_body_not_object(self):
+		for corpo in ['[]', '"x"', '1', 'null']:
+			status, resposta = self.post(corpo)
+			self.assertEqual(status, 400, corpo)
+			self.assertIn('error', resposta)
+		self.assertEqual(self.server.fila.qsize(), 0)
+
+	def test_invalid_fields(self):
+		pedidos = [
+			{'command': 'report', 'month': '08', 'year': '2024', 'cnes': '2111659', 'uf': '../MG'},
+			{'command': 'report', 'month': '08', 'year': '2024', 'cnes': '2111659', 'source': 'XYZ'},
+			{'command': 'report', 'month': '08', 'year': '2024', 'cnes': '2111659', 'source': ['SIH']},
+			{'command': 'report', 'month': '08', 'year': '24/..', 'cnes': '2111659'},
+			{'command': 'report', 'month': '08', 'year': '2024', 'cnes': '../2111659'},
+			{'command': 'batch', 'months': '08', 'years': '2024', 'cnes': '2111659', 'sources': 'SIH,FOO'},
+			{'command': 'totals', 'months': 8, 'years': '2024'}
+		]
+		for pedido in pedidos:
+			status, resposta = self.post(json.dumps(pedido))
+			self.assertEqual(status, 400, pedido)
+		self.assertEqual(self.server.fila.qsize(), 0)
+
+	def test_valid_job(self):
+		funcao, args, units = parse_job({'command': 'batch', 'months': '8,9', 'years': [2024], 'cnes': '2111659', 'sources': 'SIH,SIA', 'uf': 'SP'})
+		self.assertEqual(units, [('SIH', 'SP', '2024', '08'), ('SIH', 'SP', '2024', '09'), ('SIA', 'SP', '2024', '08'), ('SIA', 'SP', '2024', '09')])
+
+		status, resposta = self.post(json.dumps({'command': 'report', 'month': '08', 'year': '2024', 'cnes': '2111659'}))
+		self.assertEqual(status, 202)
+		self.assertEqual(resposta['status'], 'queued')
+
+if __name__ == '__main__':
+	unittest.main()
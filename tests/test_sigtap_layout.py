@@ -0,0 +1,86 @@
+import os
+import sys
+import zipfile
+import tempfile
+import unittest
+
+# Diretório do projeto (os módulos do recsus são importados a partir dele)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_directory)
+
+from sigtap import parse_sigtap_zip
+from test_tunep_parity import procedimento_layout, origem_layout, layout_text
+
+# Função para montar uma linha de tb_procedimento.txt no layout padrão (valores em centavos)
+def procedimento_line(codigo, nome, sh, sp):
+	return codigo + nome.ljust(250) + 'MI' + '0001' + '0003' + '0000' + '0000' + '9999' + f'{sh:010d}{0:010d}{sp:010d}' + '06' + '000000' + '0000' + '202408' + '\r\n'
+
+# Função para gravar um ZIP da Tabela Unificada com o conteúdo de cada arquivo
+def write_zip(caminho, membros):
+	with zipfile.ZipFile(caminho, 'w') as zip_ref:
+		for nome, conteudo in membros.items():
+			zip_ref.writestr(nome, conteudo.encode('ISO-8859-1'))
+	return caminho
+
+# Testes da leitura de tb_procedimento.txt e rl_procedimento_sia_sih.txt pelas posições dos arquivos de layout
+class SigtapLayoutTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	# Colunas em outras posições (nome mais curto e VL_SA removido): os valores seguem o layout do ZIP
+	def test_layout_positions(self):
+		layout = [(nome, 200 if nome == 'NO_PROCEDIMENTO' else tamanho, tipo) for nome, tamanho, tipo in procedimento_layout if nome != 'VL_SA']
+		linhas = [
+			'0301010072' + 'CONSULTA'.ljust(200) + 'MI' + '0001' + '0003' + '0000' + '0000' + '9999' + '0000001234' + '0000000566' + '06' + '000000' + '0000' + '202408' + '\r\n',
+			'0415010012' + 'CIRURGIA'.ljust(200) + 'MI' + '0001' + '0003' + '0000' + '0000' + '9999' + '0000010000' + '0000000000' + '06' + '000000' + '0000' + '202408' + '\r\n'
+		]
+
+		caminho = write_zip(os.path.join(self.directory.name, 'sigtap.zip'), {
+			'tb_procedimento.txt': ''.join(linhas),
+			'tb_procedimento_layout.txt': layout_text(layout),
+			'rl_procedimento_sia_sih.txt': '0415010012' + '0415010012' + '1' + '202408' + '\r\n',
+			'rl_procedimento_sia_sih_layout.txt': layout_text(origem_layout)
+		})
+
+		procedimentos, origens = parse_sigtap_zip(caminho)
+		self.assertEqual(list(procedimentos['code']), ['0301010072', '0415010012'])
+		self.assertEqual(list(procedimentos['name']), ['CONSULTA', 'CIRURGIA'])
+		self.assertEqual(list(procedimentos['value']), [1800, 10000])
+		self.assertEqual(list(origens['origem']), ['0415010012'])
+
+	# Layout sem uma das colunas usadas: erro, em vez de valores lidos de outra posição
+	def test_layout_missing_column(self):
+		caminho = write_zip(os.path.join(self.directory.name, 'sigtap.zip'), {
+			'tb_procedimento.txt': procedimento_line('0301010072', 'CONSULTA', 1234, 566),
+			'tb_procedimento_layout.txt': layout_text([campo for campo in procedimento_layout if campo[0] != 'VL_SP']),
+			'rl_procedimento_sia_sih.txt': '',
+			'rl_procedimento_sia_sih_layout.txt': layout_text(origem_layout)
+		})
+
+		with self.assertRaises(ValueError):
+			parse_sigtap_zip(caminho)
+
+	# Linha curta seguida de uma longa: o tamanho total é múltiplo da primeira linha e o número de quebras
+	# de linha coincide, mas os registros não estão alinhados e precisam ser lidos linha a linha
+	def test_misaligned_lines(self):
+		relacoes = [
+			'0301010072' + '0301010072' + '1' + '202408' + '\r\n',
+			'0415010012' + '0415010012' + '1' + '2024' + '\r\n',
+			'0415010020' + '0415010012' + '1' + '202408' + '  ' + '\r\n'
+		]
+		caminho = write_zip(os.path.join(self.directory.name, 'sigtap.zip'), {
+			'tb_procedimento.txt': procedimento_line('0301010072', 'CONSULTA', 1234, 566) + procedimento_line('0415010012', 'CIRURGIA', 10000, 0) + procedimento_line('0415010020', 'CIRURGIA 2', 0, 0),
+			'tb_procedimento_layout.txt': layout_text(procedimento_layout),
+			'rl_procedimento_sia_sih.txt': ''.join(relacoes),
+			'rl_procedimento_sia_sih_layout.txt': layout_text(origem_layout)
+		})
+
+		procedimentos, origens = parse_sigtap_zip(caminho)
+		self.assertEqual(list(origens['code']), ['0301010072', '0415010012', '0415010020'])
+		self.assertEqual(list(origens['origem']), ['0301010072', '0415010012', '0415010012'])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,293 @@
+import os
+import sys
+import random
+import zipfile
+import tempfile
+import unittest
+
+# Diretório do projeto (os módulos do recsus são importados a partir dele)
+project_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_directory)
+
+import numpy as np
+from sigtap import parse_sigtap_zip, load_tunep, join_tunep, build_index, index_to_frame, load_sigtap_index
+
+# Layouts (Coluna, Tamanho, Tipo) das tabelas da Tabela Unificada, como publicados no ZIP do DATASUS
+procedimento_layout = [
+	('CO_PROCEDIMENTO', 10, 'VARCHAR2'),
+	('NO_PROCEDIMENTO', 250, 'VARCHAR2'),
+	('TP_COMPLEXIDADE', 1, 'VARCHAR2'),
+	('TP_SEXO', 1, 'VARCHAR2'),
+	('QT_MAXIMA_EXECUCAO', 4, 'NUMBER'),
+	('QT_DIAS_PERMANENCIA', 4, 'NUMBER'),
+	('QT_PONTOS', 4, 'NUMBER'),
+	('VL_IDADE_MINIMA', 4, 'NUMBER'),
+	('VL_IDADE_MAXIMA', 4, 'NUMBER'),
+	('VL_SH', 10, 'NUMBER'),
+	('VL_SA', 10, 'NUMBER'),
+	('VL_SP', 10, 'NUMBER'),
+	('CO_FINANCIAMENTO', 2, 'VARCHAR2'),
+	('CO_RUBRICA', 6, 'VARCHAR2'),
+	('QT_TEMPO_PERMANENCIA', 4, 'NUMBER'),
+	('DT_COMPETENCIA', 6, 'CHAR')
+]
+origem_layout = [
+	('CO_PROCEDIMENTO', 10, 'VARCHAR2'),
+	('CO_PROCEDIMENTO_SIA_SIH', 10, 'VARCHAR2'),
+	('TP_PROCEDIMENTO', 1, 'VARCHAR2'),
+	('DT_COMPETENCIA', 6, 'CHAR')
+]
+
+# Campos TUNEP do cruzamento (nome usado na versão original -> coluna da tabela SIGTAP atual)
+campos_tunep = {
+	'sus': 'SIGTAP_ORIGEM',
+	'sus_media': 'SIGTAP_ORIGEM_MEDIA',
+	'tunep': 'TUNEP',
+	'tunep_media': 'TUNEP_MEDIA',
+	'dif_tunep_sus': 'DIF_TUNEP_SUS',
+	'dif_tunep_sus_media': 'DIF_TUNEP_SUS_MEDIA',
+	'dif_tunep_sigtap': 'DIF_TUNEP_SIGTAP',
+	'dif_tunep_sigtap_media': 'DIF_TUNEP_SIGTAP_MEDIA'
+}
+
+# Função para montar o arquivo de layout de uma tabela
+def layout_text(layout):
+	linhas = ['Coluna,Tamanho,Inicio,Fim,Tipo']
+	inicio = 1
+	for nome, tamanho, tipo in layout:
+		linhas.append(f'{nome},{tamanho},{inicio},{inicio + tamanho - 1},{tipo}')
+		inicio += tamanho
+	return '\r\n'.join(linhas) + '\r\n'
+
+# Função para gravar um ZIP da Tabela Unificada com os procedimentos (código, nome, SH, SA, SP em centavos)
+# e as relações (código, origem), na ordem informada
+def write_sigtap_zip(caminho, procedimentos, relacoes):
+	linhas = []
+	for codigo, nome, sh, sa, sp in procedimentos:
+		linhas.append(codigo + nome.ljust(250) + 'M' + 'I' + '0001' + '0003' + '0000' + '0000' + '9999' + f'{sh:010d}{sa:010d}{sp:010d}' + '06' + '000000' + '0000' + '202408' + '\r\n')
+	origens = [codigo + origem.ljust(10) + '1' + '202408' + '\r\n' for codigo, origem in relacoes]
+
+	with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+		zip_ref.writestr('tb_procedimento.txt', ''.join(linhas).encode('ISO-8859-1'))
+		zip_ref.writestr('tb_procedimento_layout.txt', layout_text(procedimento_layout))
+		zip_ref.writestr('rl_procedimento_sia_sih.txt', ''.join(origens).encode('ISO-8859-1'))
+		zip_ref.writestr('rl_procedimento_sia_sih_layout.txt', layout_text(origem_layout))
+	return caminho
+
+# Função para gravar uma TUNEP.csv com as linhas (código, valor SUS, valor TUNEP) informadas
+def write_tunep(caminho, linhas):
+	with open(caminho, 'w', encoding='ISO-8859-1') as f:
+		f.write('CÓDIGO;SUS;TUNEP\n')
+		for codigo, sus, tunep in linhas:
+			f.write(f"{codigo};{sus:,.2f};{tunep:,.2f}\n".replace(',', '_').replace('.', ',').replace('_', '.'))
+	return caminho
+
+# Função de referência: leitura e cruzamento feitos linha a linha e procedimento a procedimento,
+# como na primeira versão do recsus.py (valores em reais; campos sem valor ficam vazios)
+def legacy_sigtap(local_zip, local_tunep):
+	sigtap = {}
+	with zipfile.ZipFile(local_zip, 'r') as zip_ref:
+		for linha in zip_ref.read('tb_procedimento.txt').decode('ISO-8859-1').splitlines():
+			code = linha[0:10].strip()
+			name = linha[10:260].strip()
+			servico_hospitalar = int(linha[282:292].strip()) / 100
+			servico_profissional = int(linha[303:312].strip()) / 100
+			value = round(servico_hospitalar + servico_profissional, 2)
+			sigtap[code] = {'name': name, 'value': value, 'ivr': value * 0.5}
+
+		for linha in zip_ref.read('rl_procedimento_sia_sih.txt').decode('ISO-8859-1').splitlines():
+			code = linha[0:10].strip()
+			origem = linha[10:18].strip()
+			if code in sigtap:
+				sigtap[code]["origem"] = (sigtap[code].get("origem", "") + " " + origem).strip()
+
+	tunep = {}
+	with open(local_tunep, mode='r', encoding='ISO-8859-1') as file:
+		next(file)
+		for linha in file:
+			partes = linha.strip().split(';')
+			code = partes[0].strip()
+			tunep[code] = {
+				'code': code,
+				'sus': float(partes[1].replace('.', '').replace(',', '.')),
+				'tunep': float(partes[2].replace('.', '').replace(',', '.'))
+			}
+
+	for code, data in sigtap.items():
+		if "origem" in data and data["origem"]:
+			origens = data["origem"].split()
+			sumTunep = 0
+			sumSus = 0
+			count = 0
+			codTunep = ""
+			for origem in origens:
+				if origem in tunep:
+					count += 1
+					sumTunep += tunep[origem]["tunep"]
+					sumSus += tunep[origem]["sus"]
+					if codTunep != "":
+						codTunep += " - "
+					codTunep += tunep[origem]["code"]
+
+			sigtap[code]["tunep"] = ""
+			sigtap[code]["dif_tunep_sus"] = ""
+			sigtap[code]["tunep_media"] = ""
+			sigtap[code]["dif_tunep_sus_media"] = ""
+			sigtap[code]["cod_tunep"] = codTunep
+			sigtap[code]["dif_tunep_sigtap"] = ""
+			sigtap[code]["dif_tunep_sigtap_media"] = ""
+
+			if sumTunep > 0:
+				mediaSus = sumSus / count
+				mediaTunep = sumTunep / count
+
+				valor_dif_tunep = mediaTunep - mediaSus
+				if valor_dif_tunep < 0:
+					valor_dif_tunep = valor_dif_tunep * -1
+
+				if count > 1:
+					sigtap[code]["sus_media"] = mediaSus
+					sigtap[code]["tunep_media"] = mediaTunep
+					sigtap[code]["dif_tunep_sus_media"] = valor_dif_tunep
+					sigtap[code]["dif_tunep_sigtap_media"] = mediaTunep - sigtap[code]["value"]
+					if sigtap[code]["dif_tunep_sigtap_media"] < 0:
+						sigtap[code]["dif_tunep_sigtap_media"] = ""
+				else:
+					sigtap[code]["sus"] = mediaSus
+					sigtap[code]["tunep"] = mediaTunep
+					sigtap[code]["dif_tunep_sus"] = valor_dif_tunep
+					sigtap[code]["dif_tunep_sigtap"] = mediaTunep - sigtap[code]["value"]
+					if sigtap[code]["dif_tunep_sigtap"] < 0:
+						sigtap[code]["dif_tunep_sigtap"] = ""
+
+	return sigtap
+
+# Função que monta a tabela SIGTAP atual (leitura, cruzamento em arrays e ida e volta pelo índice), por código
+def current_sigtap(local_zip, local_tunep):
+	procedimentos, origens = parse_sigtap_zip(local_zip)
+	sigtap = join_tunep(procedimentos, origens, load_tunep(local_tunep))
+	return index_to_frame(build_index(sigtap, origens)).set_index('PROC_REA')
+
+class TunepParityTest(unittest.TestCase):
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.addCleanup(self.directory.cleanup)
+
+	# Função que compara todas as colunas da tabela atual com a referência (valores atuais em centavos)
+	def assert_parity(self, legacy, frame):
+		self.assertEqual(sorted(legacy), sorted(frame.index))
+		for code, data in legacy.items():
+			linha = frame.loc[code]
+			self.assertEqual(linha['NOME'], data['name'], code)
+			self.assertAlmostEqual(linha['SIGTAP'] / 100, data['value'], places=6, msg=code)
+			self.assertAlmostEqual(linha['IVR'] / 100, data['ivr'], places=6, msg=code)
+			self.assertEqual(linha['COD_TUNEP'], data.get('cod_tunep', ''), code)
+			for campo, coluna in campos_tunep.items():
+				esperado = data.get(campo, '')
+				if esperado == '':
+					self.assertTrue(np.isnan(linha[coluna]), f'{code} {coluna}')
+				else:
+					self.assertAlmostEqual(linha[coluna] / 100, esperado, places=6, msg=f'{code} {coluna}')
+
+	def test_cases(self):
+		procedimentos = [
+			('0101010010', 'UMA ORIGEM', 10000, 500, 2000),
+			('0101010020', 'UMA ORIGEM ABAIXO DO SIGTAP', 90000, 0, 10000),
+			('0101010030', 'VARIAS ORIGENS', 1000, 0, 1000),
+			('0101010040', 'SEM ORIGEM', 5000, 0, 0),
+			('0101010050', 'ORIGEM FORA DA TUNEP', 5000, 0, 0),
+			('0101010060', 'ORIGEM COM TUNEP ZERADA', 5000, 0, 0),
+			('0101010070', 'VARIAS ORIGENS ABAIXO DO SIGTAP', 900000, 0, 0)
+		]
+		relacoes = [
+			('0101010030', '33000003'),
+			('0101010010', '11000001'),
+			('0101010030', '99999999'),
+			('0101010020', '22000002'),
+			('0101010030', '31000002'),
+			('0101010050', '99999998'),
+			('0101010060', '44000004'),
+			('0101010070', '11000001'),
+			('0101010070', '22000002'),
+			('0109999999', '11000001')
+		]
+		tunep = [
+			('11000001', 100.00, 250.50),
+			('22000002', 300.00, 120.00),
+			('31000002', 40.10, 80.00),
+			('33000003', 10.00, 30.00),
+			('44000004', 15.00, 0.00)
+		]
+		local_zip = write_sigtap_zip(os.path.join(self.directory.name, 'sigtap.zip'), procedimentos, relacoes)
+		local_tunep = write_tunep(os.path.join(self.directory.name, 'TUNEP.csv'), tunep)
+
+		legacy = legacy_sigtap(local_zip, local_tunep)
+		frame = current_sigtap(local_zip, local_tunep)
+		self.assert_parity(legacy, frame)
+
+		# Uma origem: campos simples, médias vazias
+		linha = frame.loc['0101010010']
+		self.assertEqual(linha['TUNEP'], 25050)
+		self.assertEqual(linha['DIF_TUNEP_SUS'], 15050)
+		self.assertEqual(linha['DIF_TUNEP_SIGTAP'], 25050 - 12000)
+		self.assertTrue(np.isnan(linha['TUNEP_MEDIA']))
+
+		# TUNEP abaixo do SUS 2008 (diferença em valor absoluto) e do SIGTAP (diferença vazia)
+		linha = frame.loc['0101010020']
+		self.assertEqual(linha['DIF_TUNEP_SUS'], 18000)
+		self.assertTrue(np.isnan(linha['DIF_TUNEP_SIGTAP']))
+
+		# Várias origens: médias das origens encontradas, códigos na ordem do arquivo
+		linha = frame.loc['0101010030']
+		self.assertEqual(linha['COD_TUNEP'], '33000003 - 31000002')
+		self.assertAlmostEqual(linha['TUNEP_MEDIA'], 5500)
+		self.assertAlmostEqual(linha['SIGTAP_ORIGEM_MEDIA'], 2505)
+		self.assertTrue(np.isnan(linha['TUNEP']))
+		self.assertTrue(np.isnan(frame.loc['0101010070', 'DIF_TUNEP_SIGTAP_MEDIA']))
+
+		# Sem origem, origem fora da TUNEP e origem com TUNEP zerada: sem valores
+		for code in ('0101010040', '0101010050', '0101010060'):
+			self.assertTrue(frame.loc[code, campos_tunep.values()].isna().all(), code)
+		self.assertEqual(frame.loc['0101010050', 'COD_TUNEP'], '')
+		self.assertEqual(frame.loc['0101010060', 'COD_TUNEP'], '44000004')
+
+	# Tabela Unificada sem procedimentos: tabela vazia, com as mesmas colunas
+	def test_empty_table(self):
+		local_tunep = os.path.join(project_directory, 'sources', 'TUNEP.csv')
+		local_zip = write_sigtap_zip(os.path.join(self.directory.name, 'sigtap.zip'), [], [])
+		frame = current_sigtap(local_zip, local_tunep)
+		self.assertEqual(len(frame), 0)
+		self.assertIn('COD_TUNEP', frame.columns)
+
+		# Índice gravado e lido de novo do disco
+		directory = os.path.join(self.directory.name, 'index')
+		load_sigtap_index(local_zip, local_tunep, '202408', directory)
+		self.assertEqual(len(index_to_frame(load_sigtap_index(local_zip, local_tunep, '202408', directory))), 0)
+
+	def test_random_tunep(self):
+		# Procedimentos sintéticos com origens sorteadas da TUNEP.csv real (e algumas fora dela)
+		local_tunep = os.path.join(project_directory, 'sources', 'TUNEP.csv')
+		with open(local_tunep, 'r', encoding='ISO-8859-1') as f:
+			next(f)
+			origens_tunep = [linha.split(';')[0].strip() for linha in f if linha.strip()]
+
+		gerador = random.Random(0)
+		codigos = sorted({f'{gerador.randint(201010000, 905010000):010d}' for _ in range(3000)})
+		procedimentos = [(codigo, f'PROCEDIMENTO {codigo}', gerador.randint(0, 500000), gerador.randint(0, 50000), gerador.randint(0, 200000)) for codigo in codigos]
+		relacoes = []
+		for codigo in codigos:
+			for _ in range(gerador.choice([0, 0, 1, 1, 1, 2, 3])):
+				relacoes.append((codigo, gerador.choice(origens_tunep + ['99999999'])))
+		gerador.shuffle(relacoes)
+
+		local_zip = write_sigtap_zip(os.path.join(self.directory.name, 'sigtap.zip'), procedimentos, relacoes)
+		frame = current_sigtap(local_zip, local_tunep)
+		self.assert_parity(legacy_sigtap(local_zip, local_tunep), frame)
+
+		# Os dois tipos de linha (uma origem e médias) e diferenças vazias aparecem no teste
+		self.assertGreater(frame['TUNEP'].notna().sum(), 0)
+		self.assertGreater(frame['TUNEP_MEDIA'].notna().sum(), 0)
+		self.assertGreater((frame['TUNEP'].notna() & frame['DIF_TUNEP_SIGTAP'].isna()).sum(), 0)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,58 @@
+import os
+import pandas as pd
+import pipeline
+import profiling
+from pipeline import print_log, ensure_directories, get_fact_store, is_month_stored
+from parallel import aggregate_stored_units
+from report import totals_schema, totals_headers, write_report
+from schema import to_reais
+
+# Função que gera os totais por CNES (procedimentos distintos, frequência e 'VAL_TOT') de vários meses, lidos do
+# armazém de fatos: acumulado do período (ou por competência, com by_month) e comparação entre hospitais
+# Sem lista de CNES, todos os hospitais da UF são incluídos; os meses ainda não gravados são lidos uma vez e gravados
+def run_totals(months, years, sources, uf_value='MG', cnes_values=None, by_month=False, log=print_log, workers=1, output_format='xlsx'):
+	ensure_directories()
+
+	units = [(source_value, uf_value, year_value, month_value) for source_value in sources for year_value in years for month_value in months]
+
+	# Apenas os meses ainda não gravados são processados (e gravados); os demais são consultados direto no armazém
+	pendentes = [(source_value, uf_value, year_value, month_value) for source_value, uf_value, year_value, month_value in units if not is_month_stored(month_value, year_value, source_value, uf_value, log)]
+	processadas = aggregate_stored_units(pendentes, None, workers, log)
+	disponiveis = [unit for unit in units if unit not in pendentes or unit in processadas]
+
+	partes = []
+	for source_value in sources:
+		competencias = [f'{year_value}{month_value}' for unit_source, unit_uf, year_value, month_value in disponiveis if unit_source == source_value]
+		if not competencias:
+			continue
+
+		with profiling.stage('fact_store', source=source_value, uf=uf_value):
+			totais = get_fact_store().totals(source_value, uf_value, competencias, cnes_values, by_month)
+		totais.insert(0, 'BD_SUS', source_value)
+		totais['VAL_TOT'] = to_reais(totais['VAL_TOT'].astype(float))
+		if by_month:
+			totais['DATA'] = totais.pop('COMPETENCIA').map(lambda competencia: f'{competencia[4:]}/{competencia[:4]}')
+		partes.append(totais)
+
+	if not partes:
+		raise FileNotFoundError(f"Nenhum arquivo encontrado para {uf_value}.")
+
+	colunas = [coluna for coluna, largura, formato in totals_schema if by_month or coluna != 'DATA']
+	df = pd.concat(partes, ignore_index=True)[colunas]
+	log(f"{df['CNES'].nunique()} hospitais encontrados em {uf_value}.")
+
+	df.columns = totals_headers(colunas)
+	schema = [item for item in totals_schema if item[0] in colunas]
+
+	log("Exportando dados para Planilha do Excel..." if output_format == 'xlsx' else f"Exportando dados para {output_format.upper()}...")
+
+	timestamp = pipeline.output_suffix()
+	with profiling.stage('export', format=output_format):
+		caminhos = write_report(os.path.join(pipeline.output_directory, f'{uf_value}-totais-{timestamp}'), {'Totais': df}, output_format, {'Totais': schema})
+
+	for caminho_planilha in caminhos:
+		log(f"Planilha exportada com sucesso em \"{caminho_planilha}\".")
+
+	pipeline.enforce_disk_budget(log)
+
+	return caminhos